@@ -0,0 +1,183 @@
+# listas/acumulados.py
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, IntegerField, Max, Min, Sum, Value
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import DetalleOrdenCompraCliente, LineaOrden, Orden, VentaDiaria, MarcaAguaAcumulado
+
+_IMPORTE = DecimalField(max_digits=16, decimal_places=2)
+
+# dimensión de ?agrupar= -> campos de VentaDiaria
+DIMENSIONES = {
+    'fecha': ['fecha'],
+    'articulo': ['articulo_id', 'articulo__codigo', 'articulo__nombre'],
+    'linea': ['articulo__linea_id'],
+    'grupo': ['articulo__grupo_id'],
+    'sucursal': ['sucursal_id'],
+    'fuente': ['fuente'],
+}
+
+
+def _marca(fuente):
+    """Marca de agua de la fuente, bloqueada hasta el final de la transacción (un proceso a la vez)."""
+    MarcaAguaAcumulado.objects.get_or_create(fuente=fuente)
+    return MarcaAguaAcumulado.objects.select_for_update().get(fuente=fuente)
+
+
+class AcumuladosVentasService:
+    """
+    Mantiene VentaDiaria a partir de tablas que solo reciben inserciones, procesando cada vez
+    únicamente lo nuevo desde la marca de agua de la fuente:
+    - 'orden': LineaOrden de órdenes confirmadas, por Orden.confirmada_en. Solo se acumula hasta
+      ahora - PRECIOS_ACUMULADOS_MARGEN_SEGUNDOS para no saltarse confirmaciones aún sin commit.
+    - 'compra_cliente': DetalleOrdenCompraCliente por id, en bloques de TAMANO_BLOQUE ids, con el
+      mismo margen aplicado a su creado_en (no a `fecha`, que fija quien inserta).
+    Una orden anulada después de acumularse no se descuenta (se corrige con reconstruir).
+    """
+
+    TAMANO_BLOQUE = 50000
+
+    @staticmethod
+    def _fusionar(fuente, filas):
+        """Suma filas {dia, articulo_id, sucursal, unidades, importe, lineas} a VentaDiaria."""
+        filas = list(filas)
+        if not filas:
+            return 0
+        existentes = {
+            (v.fecha, v.articulo_id, v.sucursal_id): v for v in VentaDiaria.objects.filter(
+                fuente=fuente,
+                fecha__in={f['dia'] for f in filas},
+                articulo_id__in={f['articulo_id'] for f in filas},
+            )
+        }
+        nuevas, cambiadas = [], []
+        for f in filas:
+            venta = existentes.get((f['dia'], f['articulo_id'], f['sucursal']))
+            if venta is None:
+                nuevas.append(VentaDiaria(fuente=fuente, fecha=f['dia'], articulo_id=f['articulo_id'],
+                                          sucursal_id=f['sucursal'], unidades=f['unidades'],
+                                          importe=f['importe'], lineas=f['lineas']))
+                continue
+            venta.unidades += f['unidades']
+            venta.importe += f['importe']
+            venta.lineas += f['lineas']
+            cambiadas.append(venta)
+        VentaDiaria.objects.bulk_create(nuevas, batch_size=2000)
+        VentaDiaria.objects.bulk_update(cambiadas, ['unidades', 'importe', 'lineas'], batch_size=2000)
+        return len(filas)
+
+    @staticmethod
+    def _agregar(qs, fecha, sucursal):
+        return qs.values(
+            'articulo_id', dia=TruncDate(fecha), sucursal=sucursal,
+        ).annotate(
+            unidades=Sum('cantidad'),
+            importe=Sum(F('cantidad') * F('precio_unitario'), output_field=_IMPORTE),
+            lineas=Count('id'),
+        ).order_by()
+
+    @staticmethod
+    def acumular_ordenes(hasta=None):
+        """Acumula las órdenes confirmadas desde la marca hasta `hasta`. Devuelve filas fusionadas."""
+        margen = getattr(settings, 'PRECIOS_ACUMULADOS_MARGEN_SEGUNDOS', 60)
+        hasta = hasta or timezone.now() - timedelta(seconds=margen)
+        with transaction.atomic():
+            marca = _marca('orden')
+            if marca.ultima_fecha and marca.ultima_fecha >= hasta:
+                return 0
+            lineas = LineaOrden.objects.filter(orden__estado='confirmada', orden__confirmada_en__lte=hasta)
+            if marca.ultima_fecha:
+                lineas = lineas.filter(orden__confirmada_en__gt=marca.ultima_fecha)
+            filas = AcumuladosVentasService._fusionar(
+                'orden', AcumuladosVentasService._agregar(lineas, 'orden__confirmada_en', F('orden__sucursal_id'))
+            )
+            marca.ultima_fecha = hasta
+            marca.save()
+        return filas
+
+    @staticmethod
+    def acumular_compras_cliente(hasta=None):
+        """
+        Acumula DetalleOrdenCompraCliente con id posterior a la marca, por bloques. Devuelve filas
+        fusionadas. Los ids se asignan al insertar pero se confirman en cualquier orden: solo se
+        llega hasta el mayor id con creado_en anterior a `hasta`, por defecto
+        ahora - PRECIOS_ACUMULADOS_MARGEN_SEGUNDOS, para no saltarse un id menor aún sin commit.
+        """
+        margen = getattr(settings, 'PRECIOS_ACUMULADOS_MARGEN_SEGUNDOS', 60)
+        hasta = hasta or timezone.now() - timedelta(seconds=margen)
+        desde = MarcaAguaAcumulado.objects.filter(fuente='compra_cliente').values_list('ultimo_id', flat=True).first()
+        hasta_id = DetalleOrdenCompraCliente.objects.filter(
+            id__gt=desde or 0, creado_en__lte=hasta,
+        ).aggregate(m=Max('id'))['m'] or 0
+        filas = 0
+        while True:
+            with transaction.atomic():
+                marca = _marca('compra_cliente')
+                desde = marca.ultimo_id or 0
+                if desde >= hasta_id:
+                    return filas
+                tope = min(desde + AcumuladosVentasService.TAMANO_BLOQUE, hasta_id)
+                detalle = DetalleOrdenCompraCliente.objects.filter(id__gt=desde, id__lte=tope)
+                filas += AcumuladosVentasService._fusionar(
+                    'compra_cliente', AcumuladosVentasService._agregar(detalle, 'fecha', Value(None, output_field=IntegerField()))
+                )
+                marca.ultimo_id = tope
+                marca.save()
+
+    @staticmethod
+    def acumular():
+        return {
+            'orden': AcumuladosVentasService.acumular_ordenes(),
+            'compra_cliente': AcumuladosVentasService.acumular_compras_cliente(),
+        }
+
+    @staticmethod
+    def reconstruir(fuente, dias=7, informar=None):
+        """
+        Borra los acumulados de la fuente y los recalcula desde el principio: las órdenes por
+        ventanas de `dias` días de confirmación, el detalle de compras por bloques de ids.
+        """
+        with transaction.atomic():
+            VentaDiaria.objects.filter(fuente=fuente).delete()
+            MarcaAguaAcumulado.objects.filter(fuente=fuente).delete()
+        if fuente == 'compra_cliente':
+            return AcumuladosVentasService.acumular_compras_cliente()
+
+        margen = getattr(settings, 'PRECIOS_ACUMULADOS_MARGEN_SEGUNDOS', 60)
+        limite = timezone.now() - timedelta(seconds=margen)
+        primera = Orden.objects.filter(estado='confirmada').aggregate(m=Min('confirmada_en'))['m']
+        filas = 0
+        if primera is None:
+            return filas
+        hasta = primera
+        while hasta < limite:
+            hasta = min(hasta + timedelta(days=dias), limite)
+            filas += AcumuladosVentasService.acumular_ordenes(hasta)
+            if informar:
+                informar(hasta, filas)
+        return filas
+
+    @staticmethod
+    def consultar(agrupar=('articulo',), desde=None, hasta=None, articulo_id=None, linea_id=None,
+                  grupo_id=None, sucursal_id=None, fuente=None):
+        """Unidades, importe, líneas y precio medio realizado agrupados por las dimensiones pedidas."""
+        qs = VentaDiaria.objects.all()
+        filtros = {
+            'fecha__gte': desde, 'fecha__lte': hasta, 'articulo_id': articulo_id,
+            'articulo__linea_id': linea_id, 'articulo__grupo_id': grupo_id,
+            'sucursal_id': sucursal_id, 'fuente': fuente,
+        }
+        qs = qs.filter(**{campo: valor for campo, valor in filtros.items() if valor is not None})
+        campos = [c for dimension in agrupar for c in DIMENSIONES[dimension]]
+        filas = qs.values(*campos).annotate(
+            unidades=Sum('unidades'), importe=Sum('importe'), lineas=Sum('lineas'),
+        ).order_by(*campos)
+        for fila in filas:
+            fila['importe'] = Decimal(fila['importe']).quantize(Decimal('0.01'))
+            fila['precio_promedio'] = (
+                (fila['importe'] / fila['unidades']).quantize(Decimal('0.01')) if fila['unidades'] else None
+            )
+            yield fila
@@ -0,0 +1,170 @@
+# listas/ajustes.py
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import (
+    BooleanField, Case, Count, DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, TextField, Value, When
+)
+from django.db.models.functions import Ceil, Floor, Greatest, Round
+from django.db.models.lookups import LessThan
+from django.utils import timezone
+from .models import Articulo, PrecioArticulo
+from .services import PrecioMaterializadoService
+from .historial import HistorialService
+from .bajo_costo import DeteccionBajoCostoService
+from . import versiones
+
+_DINERO = DecimalField(max_digits=12, decimal_places=2)
+
+_CIEN = Value(Decimal('100'), output_field=_DINERO)
+
+
+def _al_centavo(funcion):
+    """Ceil/Floor sobre los centavos del precio (el Round previo absorbe el error de coma flotante)."""
+    return lambda e: funcion(Round(ExpressionWrapper(e * _CIEN, output_field=_DINERO), 6)) / _CIEN
+
+
+REDONDEOS = {
+    'centavo': lambda e: Round(e, 2),
+    'unidad': lambda e: Round(e, 0),
+    'arriba': _al_centavo(Ceil),
+    'abajo': _al_centavo(Floor),
+}
+MODOS_BAJO_COSTO = ('rechazar', 'marcar')
+MOTIVO_MARCADO = 'Ajuste masivo por debajo del costo: pendiente de autorización'
+
+
+class AjustePreciosService:
+    """
+    Sube o baja los precios de una lista (toda, o filtrada por línea, grupo o artículos) en
+    un único UPDATE. Los precios que quedarían por debajo de Articulo.ultimo_costo sin
+    autorizado_bajo_costo se dejan como están ('rechazar') o se ajustan anotando el motivo y
+    pendiente_autorizacion ('marcar'), en la misma sentencia. Con simular=True solo devuelve
+    los conteos y una muestra.
+    """
+
+    MUESTRA = 20
+    TAMANO_LOTE = 2000
+
+    @staticmethod
+    def alcance(lista, linea=None, grupo=None, articulo_ids=None):
+        qs = PrecioArticulo.objects.filter(lista=lista)
+        if linea is not None:
+            qs = qs.filter(articulo__linea=linea)
+        if grupo is not None:
+            qs = qs.filter(articulo__grupo=grupo)
+        if articulo_ids is not None:
+            qs = qs.filter(articulo_id__in=articulo_ids)
+        return qs
+
+    @staticmethod
+    def precio_nuevo(porcentaje=None, monto=None, redondeo='centavo'):
+        """Expresión SQL del nuevo precio_base (nunca negativo)."""
+        if (porcentaje is None) == (monto is None):
+            raise ValueError('Indique porcentaje o monto (uno de los dos)')
+        if redondeo not in REDONDEOS:
+            raise ValueError(f'Redondeo no soportado: {redondeo}')
+        if porcentaje is not None:
+            factor = Decimal('1') + Decimal(porcentaje) / Decimal('100')
+            nuevo = F('precio_base') * Value(factor, output_field=_DINERO)
+        else:
+            nuevo = F('precio_base') + Value(Decimal(monto), output_field=_DINERO)
+        nuevo = REDONDEOS[redondeo](ExpressionWrapper(nuevo, output_field=_DINERO))
+        return Greatest(ExpressionWrapper(nuevo, output_field=_DINERO), Value(Decimal('0.00')), output_field=_DINERO)
+
+    @staticmethod
+    def _resumen(alcance, queda_bajo, rechazar):
+        conteo = alcance.aggregate(seleccionados=Count('id'), bajo_costo=Count('id', filter=queda_bajo))
+        return {
+            **conteo,
+            'ajustados': conteo['seleccionados'] - (conteo['bajo_costo'] if rechazar else 0),
+            'rechazados': conteo['bajo_costo'] if rechazar else 0,
+            'marcados': 0 if rechazar else conteo['bajo_costo'],
+        }
+
+    @staticmethod
+    def ajustar(lista, porcentaje=None, monto=None, redondeo='centavo', bajo_costo='rechazar',
+                linea=None, grupo=None, articulo_ids=None, simular=False, registrar=True):
+        """
+        Devuelve {'seleccionados', 'bajo_costo', 'ajustados', 'rechazados', 'marcados'} y, si
+        simular, 'muestra' con [{'articulo_id', 'codigo', 'precio_actual', 'precio_nuevo',
+        'ultimo_costo', 'bajo_costo'}]. Con registrar=False no versiona ni rematerializa
+        (queda a cargo de quien llama, p.ej. la clonación de listas).
+        """
+        if bajo_costo not in MODOS_BAJO_COSTO:
+            raise ValueError(f'Modo bajo_costo no soportado: {bajo_costo}')
+        nuevo = AjustePreciosService.precio_nuevo(porcentaje, monto, redondeo)
+        alcance = AjustePreciosService.alcance(lista, linea, grupo, articulo_ids)
+
+        # lecturas: el costo por JOIN; en el UPDATE, por subconsulta (no admite JOIN)
+        queda_bajo = Q(autorizado_bajo_costo=False) & LessThan(nuevo, F('articulo__ultimo_costo'))
+        rechazar = bajo_costo == 'rechazar'
+
+        if simular:
+            resumen = AjustePreciosService._resumen(alcance, queda_bajo, rechazar)
+            muestra = alcance.annotate(
+                precio_nuevo=nuevo,
+                queda_bajo=Case(When(queda_bajo, then=Value(True)), default=Value(False)),
+            ).order_by('-queda_bajo', 'id').values(
+                'articulo_id', 'articulo__codigo', 'precio_base', 'precio_nuevo',
+                'articulo__ultimo_costo', 'queda_bajo',
+            )[:AjustePreciosService.MUESTRA]
+            resumen['muestra'] = [{
+                'articulo_id': m['articulo_id'],
+                'codigo': m['articulo__codigo'],
+                'precio_actual': m['precio_base'],
+                'precio_nuevo': Decimal(m['precio_nuevo']).quantize(Decimal('0.01')),
+                'ultimo_costo': m['articulo__ultimo_costo'],
+                'bajo_costo': bool(m['queda_bajo']),
+            } for m in muestra]
+            return resumen
+
+        costo = Subquery(Articulo.objects.filter(pk=OuterRef('articulo_id')).values('ultimo_costo')[:1])
+        cambios = {'precio_base': nuevo, 'actualizado_en': timezone.now()}
+        if rechazar:
+            # lo que se ajusta queda autorizado o por encima del costo: ya no está pendiente
+            cambios['pendiente_autorizacion'] = Value(False)
+        else:
+            marcado = Q(autorizado_bajo_costo=False) & LessThan(nuevo, costo)
+            cambios['pendiente_autorizacion'] = Case(
+                When(marcado, then=Value(True)), default=Value(False), output_field=BooleanField(),
+            )
+            cambios['motivo_bajo_costo'] = Case(
+                When(marcado, then=Value(MOTIVO_MARCADO)),
+                default=F('motivo_bajo_costo'), output_field=TextField(),
+            )
+
+        with transaction.atomic():
+            # precios y costos del alcance quedan bloqueados: los conteos y los ids salen de esta
+            # lectura y el UPDATE (por pk) toca exactamente esas filas
+            filas = list(alcance.select_for_update(of=('self', 'articulo')).annotate(
+                queda_bajo=Case(When(queda_bajo, then=Value(True)), default=Value(False)),
+            ).values_list('pk', 'queda_bajo'))
+            bajo = sum(1 for _, b in filas if b)
+            ids = [pk for pk, b in filas if not (b and rechazar)]
+            resumen = {
+                'seleccionados': len(filas),
+                'bajo_costo': bajo,
+                'ajustados': 0,
+                'rechazados': bajo if rechazar else 0,
+                'marcados': 0 if rechazar else bajo,
+            }
+            for i in range(0, len(ids), AjustePreciosService.TAMANO_LOTE):
+                lote = ids[i:i + AjustePreciosService.TAMANO_LOTE]
+                resumen['ajustados'] += PrecioArticulo.objects.filter(pk__in=lote).update(**cambios)
+            versiones.incrementar(versiones.precios_de_lista(lista.pk))
+            if registrar and ids:
+                # update() no dispara señales: historial, materializados y hallazgos, tras el commit
+                momento = cambios['actualizado_en']
+                transaction.on_commit(lambda: AjustePreciosService.registrar(lista.pk, ids, momento))
+        return resumen
+
+    @staticmethod
+    def registrar(lista_id, ids, momento):
+        """Versiona, rematerializa y revisa el bajo costo de los PrecioArticulo ajustados, por lotes."""
+        for i in range(0, len(ids), AjustePreciosService.TAMANO_LOTE):
+            with transaction.atomic():
+                ajustados = list(PrecioArticulo.objects.filter(pk__in=ids[i:i + AjustePreciosService.TAMANO_LOTE]))
+                articulo_ids = [p.articulo_id for p in ajustados]
+                HistorialService.registrar_precios(ajustados, momento)
+                PrecioMaterializadoService.refrescar(lista_id, articulo_ids)
+                DeteccionBajoCostoService.revisar(articulo_ids, lista_id=lista_id)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ListasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'listas'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,51 @@
+# listas/aritmetica.py
+"""
+Aritmética de punto fijo para el motor de precios: importes en centavos (int) y
+porcentajes en puntos básicos (int, 12.35% -> 1235). Todos los redondeos son
+ROUND_HALF_UP a centavos, igual que Decimal.quantize(Decimal('0.01'), ROUND_HALF_UP).
+Decimal solo se usa al entrar (a_centavos, a_puntos_base) y al salir (a_decimal).
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+PUNTOS_BASE = 10000  # 100% expresado en puntos básicos
+_CENTAVO = Decimal('0.01')
+
+
+def dividir_redondeando(numerador, divisor):
+    """numerador / divisor redondeado al entero más próximo, empates lejos de cero (divisor > 0)."""
+    if numerador >= 0:
+        return (numerador + divisor // 2) // divisor
+    return -((-numerador + divisor // 2) // divisor)
+
+
+def a_centavos(valor):
+    """Decimal/int/str -> centavos (int), redondeando ROUND_HALF_UP."""
+    if isinstance(valor, int):
+        return valor * 100
+    return int(Decimal(valor).quantize(_CENTAVO, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def a_puntos_base(porcentaje):
+    """Porcentaje (12.35) -> puntos básicos (1235), redondeando ROUND_HALF_UP."""
+    if not porcentaje:
+        return 0
+    return int(Decimal(porcentaje).quantize(_CENTAVO, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def a_decimal(centavos):
+    """Centavos (int) -> Decimal con 2 decimales."""
+    return Decimal(centavos).scaleb(-2)
+
+
+def descuento(centavos, puntos_base):
+    """Importe del descuento (centavos) de aplicar puntos_base sobre centavos."""
+    return dividir_redondeando(centavos * puntos_base, PUNTOS_BASE)
+
+
+def minimo_permitido(costo_centavos, puntos_base):
+    """
+    Costo menos el porcentaje reconocido por el proveedor, redondeado a centavos. Se redondea
+    el resultado (costo * (1 - pct)), no el descuento: restar un descuento ya redondeado falla
+    en los empates (1.00 al 0.50% daría 0.99 en vez de 1.00).
+    """
+    return dividir_redondeando(costo_centavos * (PUNTOS_BASE - puntos_base), PUNTOS_BASE)
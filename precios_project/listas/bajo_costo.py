@@ -0,0 +1,81 @@
+# listas/bajo_costo.py
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Articulo, PrecioArticulo, HallazgoBajoCosto
+from . import versiones
+
+
+class DeteccionBajoCostoService:
+    """
+    Mantiene HallazgoBajoCosto de forma incremental: al cambiar el costo de unos artículos o
+    unos precios se revisan solo esas filas (una consulta por el índice de articulo_id de
+    PrecioArticulo), se borran los hallazgos que ya no aplican y se registran los nuevos.
+    """
+
+    TAMANO_LOTE = 2000
+
+    @staticmethod
+    def revisar(articulo_ids=None, lista_id=None):
+        """
+        Revisa los precios de articulo_ids (en todas las listas o solo en lista_id), por bloques
+        de TAMANO_LOTE artículos. Sin articulo_ids revisa toda la lista, o todo el catálogo si
+        tampoco hay lista_id (solo para la carga inicial). Devuelve cuántos hallazgos quedan
+        abiertos en lo revisado.
+        """
+        if articulo_ids is None:
+            precios = PrecioArticulo.objects.all()
+            if lista_id is not None:
+                precios = precios.filter(lista_id=lista_id)
+            articulo_ids = precios.values_list('articulo_id', flat=True).distinct().order_by('articulo_id')
+        articulo_ids = list(articulo_ids)
+        abiertos = 0
+        for i in range(0, len(articulo_ids), DeteccionBajoCostoService.TAMANO_LOTE):
+            abiertos += DeteccionBajoCostoService._revisar_bloque(
+                articulo_ids[i:i + DeteccionBajoCostoService.TAMANO_LOTE], lista_id
+            )
+        return abiertos
+
+    @staticmethod
+    def _revisar_bloque(articulo_ids, lista_id=None):
+        alcance = PrecioArticulo.objects.filter(articulo_id__in=articulo_ids)
+        hallazgos = HallazgoBajoCosto.objects.filter(articulo_id__in=articulo_ids)
+        if lista_id is not None:
+            alcance = alcance.filter(lista_id=lista_id)
+            hallazgos = hallazgos.filter(lista_id=lista_id)
+
+        bajo_costo = alcance.filter(
+            autorizado_bajo_costo=False, precio_base__lt=F('articulo__ultimo_costo')
+        ).values_list('id', 'lista_id', 'articulo_id', 'precio_base', 'articulo__ultimo_costo')
+        ahora = timezone.now()
+        nuevos = [
+            HallazgoBajoCosto(precio_id=pk, lista_id=lista, articulo_id=articulo,
+                              precio_base=precio, ultimo_costo=costo, detectado_en=ahora)
+            for pk, lista, articulo, precio, costo in bajo_costo
+        ]
+        with transaction.atomic():
+            hallazgos.exclude(precio_id__in=[h.precio_id for h in nuevos]).delete()
+            # detectado_en conserva la primera detección
+            HallazgoBajoCosto.objects.bulk_create(
+                nuevos, update_conflicts=True, unique_fields=['precio'],
+                update_fields=['precio_base', 'ultimo_costo'],
+            )
+        return len(nuevos)
+
+    @staticmethod
+    @transaction.atomic
+    def actualizar_costos(costos):
+        """
+        Actualización masiva de Articulo.ultimo_costo ({articulo_id: costo}) con bulk_update;
+        solo notifica costo_actualizado (historial, materialización y hallazgos) por los que cambian.
+        """
+        from .signals import costo_actualizado  # signals.py importa este módulo
+        articulos = list(Articulo.objects.filter(pk__in=list(costos)).only('pk', 'ultimo_costo'))
+        cambiados = [a for a in articulos if a.ultimo_costo != costos[a.pk]]
+        for a in cambiados:
+            a.ultimo_costo = costos[a.pk]
+        Articulo.objects.bulk_update(cambiados, ['ultimo_costo'], batch_size=DeteccionBajoCostoService.TAMANO_LOTE)
+        if cambiados:
+            versiones.incrementar(['articulos'])
+            costo_actualizado.send(sender=Articulo, articulo_ids=[a.pk for a in cambiados])
+        return len(cambiados)
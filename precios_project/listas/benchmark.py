@@ -0,0 +1,223 @@
+# listas/benchmark.py
+import json
+import random
+import subprocess
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from django.db import transaction
+from django.utils import timezone
+from core.choices import CANAL_CHOICES, TIPO_REGLA_CHOICES
+from .models import (
+    Empresa, Sucursal, LineaArticulo, GrupoArticulo, Articulo, ListaPrecio,
+    PrecioArticulo, ReglaPrecio, CombinacionProducto
+)
+from .metricas import MedicionSQL
+from .historial import HistorialService
+from .bajo_costo import DeteccionBajoCostoService
+from . import contadores, versiones
+
+CANALES = [c for c, _ in CANAL_CHOICES]
+TIPOS_REGLA = [t for t, _ in TIPO_REGLA_CHOICES]
+TAMANO_LOTE = 5000
+
+
+def _dinero(rnd, minimo, maximo):
+    return Decimal(rnd.randint(int(minimo * 100), int(maximo * 100))).scaleb(-2)
+
+
+@transaction.atomic
+def generar_datos(empresas=2, sucursales=3, articulos=10000, periodos=3, reglas=8,
+                  combinaciones=20, semilla=1, prefijo='BENCH'):
+    """
+    Crea un catálogo sintético con bulk_create: líneas, grupos y artículos compartidos y,
+    por cada sucursal, `periodos` listas consecutivas (la central vigente hoy) con precio
+    para todos los artículos, reglas de todos los tipos y combinaciones. Los periodos se
+    solapan entre sucursales, nunca dentro de la misma (ListaPrecio.clean lo impide).
+    """
+    rnd = random.Random(semilla)
+    hoy = timezone.now().date()
+
+    lineas = LineaArticulo.objects.bulk_create(
+        [LineaArticulo(nombre=f'{prefijo} Línea {i}') for i in range(max(1, articulos // 2000))]
+    )
+    grupos = GrupoArticulo.objects.bulk_create([
+        GrupoArticulo(nombre=f'{prefijo} Grupo {i}', linea=lineas[i % len(lineas)])
+        for i in range(max(1, articulos // 200))
+    ])
+    arts = []
+    for i in range(articulos):
+        grupo = rnd.choice(grupos)
+        arts.append(Articulo(
+            codigo=f'{prefijo}-{semilla}-{i:07d}', nombre=f'Artículo sintético {i}',
+            linea_id=grupo.linea_id, grupo=grupo, ultimo_costo=_dinero(rnd, 1, 500),
+        ))
+    arts = Articulo.objects.bulk_create(arts, batch_size=TAMANO_LOTE)
+    HistorialService.registrar_costos([a.pk for a in arts])
+
+    listas = []
+    for e in range(empresas):
+        empresa = Empresa.objects.create(nombre=f'{prefijo} Empresa {e}')
+        for s in range(sucursales):
+            sucursal = Sucursal.objects.create(empresa=empresa, nombre=f'{prefijo} Sucursal {e}.{s}')
+            desfase = rnd.randint(0, 20)
+            for p in range(periodos):
+                inicio = hoy + timedelta(days=(p - periodos // 2) * 90 - desfase)
+                listas.append(ListaPrecio(
+                    empresa=empresa, sucursal=sucursal, nombre=f'{prefijo} Lista {e}.{s}.{p}',
+                    tipo=rnd.choice(['normal', 'promocion', 'mayoreo']), canal=rnd.choice(CANALES),
+                    fecha_inicio=inicio, fecha_fin=inicio + timedelta(days=89), estado='vigente',
+                ))
+    listas = ListaPrecio.objects.bulk_create(listas)
+
+    for lista in listas:
+        precios = []
+        for a in arts:
+            margen = Decimal(rnd.randint(90, 180)) / 100
+            precios.append(PrecioArticulo(
+                lista=lista, articulo=a, precio_base=(a.ultimo_costo * margen).quantize(Decimal('0.01')),
+                autorizado_bajo_costo=margen < 1 and rnd.random() < 0.5,
+            ))
+        PrecioArticulo.objects.bulk_create(precios, batch_size=TAMANO_LOTE)
+        HistorialService.registrar_precios(precios)
+
+        nuevas = []
+        for prioridad in range(1, reglas + 1):
+            tipo = TIPOS_REGLA[prioridad % len(TIPOS_REGLA)]
+            regla = ReglaPrecio(lista=lista, tipo=tipo, prioridad=prioridad,
+                                porcentaje_descuento=_dinero(rnd, 1, 15))
+            if tipo == 'canal':
+                regla.canal = rnd.choice(CANALES)
+            elif tipo == 'escala_unidades':
+                regla.min_unidades = rnd.randint(2, 10)
+                regla.max_unidades = regla.min_unidades + rnd.randint(0, 50)
+            elif tipo in ('escala_monto', 'monto_pedido'):
+                regla.min_monto = _dinero(rnd, 50, 500)
+            alcance = rnd.random()
+            if alcance < 0.2:
+                regla.grupo = rnd.choice(grupos)
+            elif alcance < 0.3:
+                regla.linea = rnd.choice(lineas)
+            nuevas.append(regla)
+        ReglaPrecio.objects.bulk_create(nuevas)
+
+        combos = CombinacionProducto.objects.bulk_create([
+            CombinacionProducto(lista=lista, nombre=f'Combo {i}', porcentaje_descuento=_dinero(rnd, 5, 20))
+            for i in range(combinaciones)
+        ])
+        Miembro = CombinacionProducto.articulos.through
+        Miembro.objects.bulk_create([
+            Miembro(combinacionproducto_id=combo.id, articulo_id=a.id)
+            for combo in combos for a in rnd.sample(arts, min(len(arts), rnd.randint(2, 4)))
+        ])
+
+    # bulk_create no dispara las señales que mantienen el dashboard ni los hallazgos bajo costo
+    contadores.reconciliar()
+    DeteccionBajoCostoService.revisar()
+    versiones.incrementar([*versiones.RECURSOS.values(), *(f'precios-articulo:{l.pk}' for l in listas)])
+    return {'articulos': len(arts), 'listas': len(listas), 'precios': len(arts) * len(listas)}
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+
+def medir(func, casos, preparar=None, calentar=False):
+    """
+    Ejecuta func(*caso) por cada caso; devuelve ops/s, p50/p99 (ms) y consultas por llamada.
+    `preparar` se llama antes de cada caso (p.ej. para vaciar cachés) fuera de la medición;
+    con calentar=True se hace una pasada previa sin medir.
+    """
+    if calentar:
+        for caso in casos:
+            func(*caso)
+    tiempos = []
+    consultas = 0
+    for caso in casos:
+        if preparar:
+            preparar()
+        with MedicionSQL() as medicion:
+            func(*caso)
+        tiempos.append(medicion.tiempo_total * 1000)
+        consultas += medicion.consultas
+    total = sum(tiempos) / 1000
+    n = len(tiempos)
+    return {
+        'llamadas': n,
+        'ops_por_seg': round(n / total, 1) if total else None,
+        'p50_ms': round(percentil(tiempos, 50), 4) if n else None,
+        'p99_ms': round(percentil(tiempos, 99), 4) if n else None,
+        'consultas_por_llamada': round(consultas / n, 2) if n else None,
+    }
+
+
+def carga_http(url, cuerpos, cabeceras=None, concurrencia=50):
+    """
+    Envía cada cuerpo (dict) como POST JSON a `url` con `concurrencia` peticiones simultáneas.
+    Devuelve peticiones/s, p50/p99 de latencia (ms) y cuántas no respondieron 2xx.
+    """
+    cabeceras = {'Content-Type': 'application/json', **(cabeceras or {})}
+
+    def enviar(cuerpo):
+        peticion = urllib.request.Request(url, data=json.dumps(cuerpo).encode(), headers=cabeceras, method='POST')
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(peticion, timeout=60) as respuesta:
+                respuesta.read()
+                ok = 200 <= respuesta.status < 300
+        except (urllib.error.URLError, OSError):
+            ok = False
+        return (time.perf_counter() - inicio) * 1000, ok
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        resultados = list(pool.map(enviar, cuerpos))
+    total = time.perf_counter() - inicio
+    tiempos = [t for t, _ in resultados]
+    return {
+        'peticiones': len(resultados),
+        'concurrencia': concurrencia,
+        'errores': sum(1 for _, ok in resultados if not ok),
+        'peticiones_por_seg': round(len(resultados) / total, 1) if total else None,
+        'p50_ms': round(percentil(tiempos, 50), 2) if tiempos else None,
+        'p99_ms': round(percentil(tiempos, 99), 2) if tiempos else None,
+    }
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, anterior):
+    """Variación porcentual de ops/s y p99 de cada escenario respecto de otro resultado."""
+    cambios = {}
+    for nombre, res in actual['resultados'].items():
+        previo = anterior.get('resultados', {}).get(nombre)
+        if not previo:
+            continue
+        cambios[nombre] = {
+            clave: round((res[clave] - previo[clave]) * 100 / previo[clave], 1)
+            for clave in ('ops_por_seg', 'p99_ms', 'consultas_por_llamada')
+            if res.get(clave) is not None and previo.get(clave)
+        }
+    return cambios
+
+
+def guardar(resultado, ruta):
+    Path(ruta).write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
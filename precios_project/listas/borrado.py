@@ -0,0 +1,46 @@
+# listas/borrado.py
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
+from .models import PrecioArticulo, PrecioFinalMaterializado, HistorialPrecio, HallazgoBajoCosto
+from . import contadores, versiones
+
+
+class BorradoPreciosService:
+    """
+    Borrado en bloque de PrecioArticulo, para quien lo pide explícitamente (las vistas que borran
+    listas). Los receptores post_delete obligan a Django a cargar cada fila y enviar sus señales;
+    aquí lo que harían (materializado, historial, contador y versión del recurso) se resuelve con
+    una sentencia por tabla y las filas se borran sin cargarlas ni enviar señales: un receptor
+    nuevo de PrecioArticulo debe tener aquí su equivalente. queryset.delete() no cambia.
+    """
+
+    @staticmethod
+    def borrar(precios):
+        """Borra los PrecioArticulo del queryset. Devuelve cuántos borró."""
+        using = precios.db
+        with transaction.atomic(using=using):
+            por_lista = dict(precios.order_by().values_list('lista_id').annotate(n=Count('pk')))
+            if not por_lista:
+                return 0
+            mismo_precio = Exists(precios.filter(lista_id=OuterRef('lista_id'), articulo_id=OuterRef('articulo_id')))
+            PrecioFinalMaterializado.objects.using(using).filter(mismo_precio).delete()
+            HistorialPrecio.objects.using(using).filter(mismo_precio, vigente_hasta__isnull=True).update(
+                vigente_hasta=timezone.now()
+            )
+            HallazgoBajoCosto.objects.using(using).filter(precio__in=precios.values('pk')).delete()
+            total = sum(por_lista.values())
+            contadores.ajustar({
+                clave: -(precios.filter(**filtro).count() if filtro else total)
+                for clave, filtro in contadores.contadores_de(PrecioArticulo).items()
+            })
+            versiones.incrementar([r for lista_id in por_lista for r in versiones.precios_de_lista(lista_id)])
+            # ya sin dependientes ni receptores pendientes: un DELETE directo, como el fast delete de Django
+            return precios.order_by()._raw_delete(using)
+
+    @staticmethod
+    def borrar_listas(listas):
+        """Borra las ListaPrecio del queryset con sus precios por conjuntos; el resto en cascada."""
+        with transaction.atomic(using=listas.db):
+            BorradoPreciosService.borrar(PrecioArticulo.objects.using(listas.db).filter(lista__in=listas.values('pk')))
+            return listas.delete()
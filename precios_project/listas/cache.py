@@ -0,0 +1,66 @@
+# listas/cache.py
+import threading
+import time
+from collections import OrderedDict
+
+_FALTA = object()
+
+
+class CacheLRU:
+    """
+    Caché en memoria con tamaño máximo, desalojo LRU y contadores de aciertos/fallos.
+    Con `segundos`, cada entrada caduca ese tiempo después de guardarse.
+    """
+
+    def __init__(self, tamano_maximo=1024, segundos=None):
+        self.tamano_maximo = tamano_maximo
+        self.segundos = segundos
+        self.aciertos = 0
+        self.fallos = 0
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, default=_FALTA):
+        with self._lock:
+            valor, expira = self._datos.get(clave, (_FALTA, None))
+            if valor is not _FALTA and expira is not None and expira <= time.monotonic():
+                del self._datos[clave]
+                valor = _FALTA
+            if valor is _FALTA:
+                self.fallos += 1
+                return default
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave, valor):
+        expira = time.monotonic() + self.segundos if self.segundos is not None else None
+        with self._lock:
+            self._datos[clave] = (valor, expira)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.tamano_maximo:
+                self._datos.popitem(last=False)
+
+    def descartar_si(self, predicado):
+        """Elimina las entradas cuyo (clave, valor) cumple el predicado."""
+        with self._lock:
+            for clave in [c for c, (v, _) in self._datos.items() if predicado(c, v)]:
+                del self._datos[clave]
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def info(self):
+        with self._lock:
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tamano': len(self._datos),
+                'tamano_maximo': self.tamano_maximo,
+                'segundos': self.segundos,
+            }
+
+    def __contains__(self, clave):
+        valor, expira = self._datos.get(clave, (_FALTA, None))
+        return valor is not _FALTA and (expira is None or expira > time.monotonic())
@@ -0,0 +1,97 @@
+# listas/clonacion.py
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import ListaPrecio, PrecioArticulo, ReglaPrecio, CombinacionProducto, solape_como_validacion
+from .services import PrecioMaterializadoService
+from .historial import HistorialService
+from .ajustes import AjustePreciosService
+from .bajo_costo import DeteccionBajoCostoService
+from . import contadores, versiones
+
+# campos copiados tal cual (además de la FK a la lista)
+CAMPOS_PRECIO = ['articulo', 'precio_base', 'autorizado_bajo_costo', 'motivo_bajo_costo', 'pendiente_autorizacion']
+CAMPOS_REGLA = ['tipo', 'prioridad', 'activo', 'canal', 'min_unidades', 'max_unidades',
+                'min_monto', 'max_monto', 'porcentaje_descuento', 'articulo_id', 'grupo_id', 'linea_id']
+CAMPOS_COMBINACION = ['nombre', 'porcentaje_descuento', 'precio_fijo', 'minimo_por_articulo', 'tipo_aplicacion',
+                      'activo']
+
+
+class ClonacionListaService:
+    """
+    Duplica una lista con todos sus precios, reglas y combinaciones para un nuevo periodo.
+    Los precios se copian con un único INSERT … SELECT; reglas, combinaciones y sus
+    artículos con bulk_create. Opcionalmente aplica un AjustePreciosService sobre la copia.
+    """
+
+    @staticmethod
+    def _copiar_precios(origen_id, destino_id, momento):
+        """INSERT … SELECT de los PrecioArticulo de una lista a otra. Devuelve cuántos copió."""
+        meta = PrecioArticulo._meta
+        q = connection.ops.quote_name
+        columnas = [q(meta.get_field(c).column) for c in CAMPOS_PRECIO]
+        lista, actualizado_en = q(meta.get_field('lista').column), q(meta.get_field('actualizado_en').column)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {q(meta.db_table)} ({lista}, {', '.join(columnas)}, {actualizado_en}) "
+                f"SELECT %s, {', '.join(columnas)}, %s FROM {q(meta.db_table)} WHERE {lista} = %s",
+                [destino_id, connection.ops.adapt_datetimefield_value(momento), origen_id],
+            )
+            return cursor.rowcount
+
+    @staticmethod
+    @transaction.atomic
+    def clonar(origen, fecha_inicio, fecha_fin, nombre=None, estado='borrador', creado_por=None,
+               porcentaje=None, monto=None, redondeo='centavo', bajo_costo='rechazar'):
+        """
+        Crea la lista nueva (lanza ValidationError si se solapa con otra de la sucursal) y
+        devuelve (lista, resumen) con cuántos precios, reglas y combinaciones copió.
+        """
+        nueva = ListaPrecio(
+            empresa_id=origen.empresa_id, sucursal_id=origen.sucursal_id, nombre=nombre or origen.nombre,
+            tipo=origen.tipo, canal=origen.canal, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin,
+            estado=estado, creado_por=creado_por,
+        )
+        nueva.full_clean()
+        with solape_como_validacion():
+            nueva.save()
+
+        momento = timezone.now()
+        resumen = {'precios': ClonacionListaService._copiar_precios(origen.pk, nueva.pk, momento)}
+
+        reglas = ReglaPrecio.objects.bulk_create([
+            ReglaPrecio(lista=nueva, **valores)
+            for valores in ReglaPrecio.objects.filter(lista=origen).values(*CAMPOS_REGLA)
+        ])
+        resumen['reglas'] = len(reglas)
+
+        originales = list(CombinacionProducto.objects.filter(lista=origen).order_by('pk').values('pk', *CAMPOS_COMBINACION))
+        copias = CombinacionProducto.objects.bulk_create([
+            CombinacionProducto(lista=nueva, **{c: valores[c] for c in CAMPOS_COMBINACION})
+            for valores in originales
+        ])
+        nuevo_id = {o['pk']: c.pk for o, c in zip(originales, copias)}
+        Miembro = CombinacionProducto.articulos.through
+        Miembro.objects.bulk_create([
+            Miembro(combinacionproducto_id=nuevo_id[combo_id], articulo_id=articulo_id)
+            for combo_id, articulo_id in Miembro.objects.filter(
+                combinacionproducto__lista=origen
+            ).values_list('combinacionproducto_id', 'articulo_id').iterator()
+        ])
+        resumen['combinaciones'] = len(copias)
+
+        if porcentaje is not None or monto is not None:
+            resumen['ajuste'] = AjustePreciosService.ajustar(
+                nueva, porcentaje=porcentaje, monto=monto, redondeo=redondeo, bajo_costo=bajo_costo,
+                registrar=False,
+            )
+        # bulk_create y SQL directo no disparan señales: historial y materialización de toda la lista
+        HistorialService.registrar_lista(nueva.pk, momento)
+        PrecioMaterializadoService.refrescar(nueva.pk)
+        DeteccionBajoCostoService.revisar(lista_id=nueva.pk)
+        versiones.incrementar(versiones.precios_de_lista(nueva.pk))
+        contadores.ajustar({
+            'total_precios_articulo': resumen['precios'],
+            'total_reglas': sum(1 for r in reglas if r.activo),
+            'total_combinaciones': resumen['combinaciones'],
+        })
+        return nueva, resumen
@@ -0,0 +1,85 @@
+# listas/contadores.py
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import (
+    Empresa, Sucursal, Articulo, ListaPrecio, PrecioArticulo, ReglaPrecio,
+    CombinacionProducto, Orden, ContadorDashboard
+)
+
+# clave -> (modelo, filtro); el filtro solo usa campos propios del modelo
+CONTADORES = {
+    'total_listas': (ListaPrecio, {}),
+    'listas_vigentes': (ListaPrecio, {'estado': 'vigente'}),
+    'total_reglas': (ReglaPrecio, {'activo': True}),
+    'total_combinaciones': (CombinacionProducto, {}),
+    'total_precios_articulo': (PrecioArticulo, {}),
+    'total_empresas': (Empresa, {}),
+    'total_sucursales': (Sucursal, {}),
+    'total_articulos': (Articulo, {}),
+    'pending_orders': (Orden, {'estado': 'borrador'}),
+}
+
+
+def contadores_de(modelo):
+    return {clave: filtro for clave, (m, filtro) in CONTADORES.items() if m is modelo}
+
+
+def campos_filtrados(modelo):
+    """Campos de los que depende algún contador del modelo (los que exigen leer el estado previo)."""
+    return sorted({campo for filtro in contadores_de(modelo).values() for campo in filtro})
+
+
+def cumple(valores, filtro):
+    return all(valores.get(campo) == valor for campo, valor in filtro.items())
+
+
+def contar(clave):
+    modelo, filtro = CONTADORES[clave]
+    return modelo.objects.filter(**filtro).count()
+
+
+def ajustar(cambios):
+    """
+    Suma los deltas {clave: delta} al confirmarse la transacción que los origina: la fila del
+    contador se bloquea solo lo que dura su UPDATE, no toda la transacción, y las escrituras que
+    comparten contador (todas las órdenes y 'pending_orders') no se serializan. Si el proceso cae
+    entre el commit y el ajuste, `manage.py reconciliar_contadores` corrige la deriva.
+    """
+    cambios = {clave: delta for clave, delta in cambios.items() if delta}
+    if cambios:
+        transaction.on_commit(lambda: _sumar(cambios))
+
+
+def _sumar(cambios):
+    for clave, delta in cambios.items():
+        if ContadorDashboard.objects.filter(clave=clave).update(valor=F('valor') + delta):
+            continue
+        # primera vez: el conteo ya incluye el cambio en curso
+        try:
+            with transaction.atomic():
+                ContadorDashboard.objects.create(clave=clave, valor=contar(clave))
+        except IntegrityError:
+            ContadorDashboard.objects.filter(clave=clave).update(valor=F('valor') + delta)
+
+
+def reconciliar(claves=None):
+    """Recuenta los contadores y devuelve {clave: (guardado, real)} de los que habían derivado."""
+    claves = list(claves or CONTADORES)
+    guardados = dict(ContadorDashboard.objects.filter(clave__in=claves).values_list('clave', 'valor'))
+    deriva = {}
+    for clave in claves:
+        real = contar(clave)
+        if guardados.get(clave) != real:
+            deriva[clave] = (guardados.get(clave), real)
+            ContadorDashboard.objects.update_or_create(clave=clave, defaults={'valor': real})
+    return deriva
+
+
+def leer():
+    """Todos los contadores en una consulta; los que aún no existen se calculan una vez."""
+    valores = dict(ContadorDashboard.objects.values_list('clave', 'valor'))
+    faltantes = [clave for clave in CONTADORES if clave not in valores]
+    if faltantes:
+        reconciliar(faltantes)
+        valores.update(ContadorDashboard.objects.filter(clave__in=faltantes).values_list('clave', 'valor'))
+    return valores
@@ -0,0 +1,92 @@
+# listas/exportacion.py
+import csv
+import json
+from itertools import islice
+from django.db.models import DecimalField, OuterRef, Subquery
+from .models import PrecioArticulo, PrecioFinalMaterializado
+from .reglas import obtener_reglas
+from .services import PrecioService
+
+COLUMNAS = ['codigo', 'nombre', 'ultimo_costo', 'precio_base', 'precio_final', 'autorizado_bajo_costo']
+_IMPORTES = slice(2, 5)  # ultimo_costo, precio_base, precio_final
+
+
+def _formatear(fila):
+    """Importes como texto con 2 decimales (None queda igual), sea cual sea el backend."""
+    fila = list(fila)
+    fila[_IMPORTES] = [None if v is None else f'{v:.2f}' for v in fila[_IMPORTES]]
+    return fila
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en lugar de escribirla."""
+
+    def write(self, valor):
+        return valor
+
+
+class ExportacionPreciosService:
+    """
+    Exporta los precios de una lista fila a fila (CSV o JSONL) sin cargarlos en memoria.
+    precio_final es el precio materializado sin contexto (canal '', cantidad 1, sin carrito);
+    los artículos aún sin materializar se calculan por lotes con las mismas reglas.
+    """
+
+    TAMANO_LOTE = 2000
+    FORMATOS = {
+        'csv': 'text/csv; charset=utf-8',
+        'jsonl': 'application/x-ndjson; charset=utf-8',
+    }
+
+    @staticmethod
+    def filas(lista, tamano_lote=None):
+        tamano_lote = tamano_lote or ExportacionPreciosService.TAMANO_LOTE
+        precio_final = PrecioFinalMaterializado.objects.filter(
+            lista_id=OuterRef('lista_id'), articulo_id=OuterRef('articulo_id'), canal=''
+        ).values('precio_final')[:1]
+        filas = PrecioArticulo.objects.filter(lista=lista).annotate(
+            precio_final=Subquery(precio_final, output_field=DecimalField(max_digits=12, decimal_places=2))
+        ).order_by('id').values_list(
+            'articulo_id', 'articulo__codigo', 'articulo__nombre', 'articulo__ultimo_costo',
+            'precio_base', 'precio_final', 'autorizado_bajo_costo',
+        ).iterator(chunk_size=tamano_lote)
+        while lote := list(islice(filas, tamano_lote)):
+            calculados = ExportacionPreciosService._calcular(lista, [f[0] for f in lote if f[5] is None])
+            for articulo_id, *fila in lote:
+                if articulo_id in calculados:
+                    fila[4] = calculados[articulo_id]
+                yield tuple(fila)
+
+    @staticmethod
+    def _calcular(lista, articulo_ids):
+        """{articulo_id: precio_final} sin contexto de los artículos que faltan en el materializado."""
+        if not articulo_ids:
+            return {}
+        reglas = obtener_reglas(lista)
+        return {
+            pa.articulo_id: PrecioService._evaluar(
+                PrecioService._resultado_vacio(), lista, pa, pa.articulo, None, 1, None, None, reglas=reglas
+            )['precio_final']
+            for pa in PrecioArticulo.objects.filter(lista=lista, articulo_id__in=articulo_ids).select_related('articulo')
+        }
+
+    @staticmethod
+    def lineas_csv(lista):
+        escritor = csv.writer(_Eco())
+        yield escritor.writerow(COLUMNAS)
+        for fila in ExportacionPreciosService.filas(lista):
+            yield escritor.writerow(_formatear(fila))
+
+    @staticmethod
+    def lineas_jsonl(lista):
+        for fila in ExportacionPreciosService.filas(lista):
+            registro = dict(zip(COLUMNAS, _formatear(fila)))
+            yield json.dumps(registro, ensure_ascii=False) + '\n'
+
+    @staticmethod
+    def lineas(lista, formato='csv'):
+        if formato not in ExportacionPreciosService.FORMATOS:
+            raise ValueError(f'Formato no soportado: {formato}')
+        if formato == 'jsonl':
+            return ExportacionPreciosService.lineas_jsonl(lista)
+        return ExportacionPreciosService.lineas_csv(lista)
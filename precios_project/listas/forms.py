@@ -74,7 +74,7 @@ class PrecioArticuloForm(forms.ModelForm):
     def clean_precio_base(self):
         precio = self.cleaned_data.get('precio_base')
         articulo = self.cleaned_data.get('articulo')
-        autorizado = self.cleaned_data.get('autorizado_bajo_costo')
+        autorizado = self.cleaned_data.get('autorizado_bajo_costo') or self.instance.pendiente_autorizacion
 
         if precio is not None and articulo and not autorizado:
             if precio < articulo.ultimo_costo:
@@ -207,19 +207,13 @@ LineaOrdenFormSet = inlineformset_factory(
 )
 
 class CombinacionProductoForm(forms.ModelForm):
-    # Campo extra opcional (no se guarda en la BD)
-    precio_fijo = forms.DecimalField(
-        required=False,
-        min_value=0,
-        decimal_places=2,
-        widget=forms.NumberInput(attrs={'step': '0.01'})
-    )
-
     class Meta:
         model = CombinacionProducto
-        fields = ['lista', 'nombre', 'articulos']  # solo campos válidos del modelo
+        fields = ['lista', 'nombre', 'tipo_aplicacion', 'porcentaje_descuento', 'precio_fijo',
+                  'minimo_por_articulo', 'articulos', 'activo']
         widgets = {
             'articulos': forms.SelectMultiple(attrs={'size': 10}),
+            'precio_fijo': forms.NumberInput(attrs={'step': '0.01', 'min': '0'}),
         }
 
     def clean_nombre(self):
@@ -0,0 +1,209 @@
+# listas/historial.py
+import copy
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from .models import Articulo, PrecioArticulo, HistorialPrecio, HistorialCosto
+
+CAMPOS_PRECIO = ('precio_base', 'autorizado_bajo_costo', 'motivo_bajo_costo')
+
+
+def fin_del_dia(fecha):
+    """Primer instante del día siguiente: el precio 'del día D' es el vigente justo antes."""
+    return timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min))
+
+
+def _vigente_en(momento):
+    return Q(vigente_desde__lt=momento) & (Q(vigente_hasta__isnull=True) | Q(vigente_hasta__gte=momento))
+
+
+class HistorialService:
+    """
+    Historial de precios y costos: escritura por lotes (una lectura de las versiones
+    abiertas, un UPDATE que las cierra y un bulk_create) y consulta por fecha.
+    """
+
+    TAMANO_LOTE = 2000
+
+    @staticmethod
+    def registrar_precios(precios, momento=None):
+        """
+        Abre una versión para cada PrecioArticulo cuyo precio, autorización o motivo difiere
+        de su versión abierta. Devuelve cuántas versiones escribió.
+        """
+        momento = momento or timezone.now()
+        por_lista = defaultdict(dict)
+        for p in precios:
+            por_lista[p.lista_id][p.articulo_id] = p
+
+        escritas = 0
+        for lista_id, por_articulo in por_lista.items():
+            ids = list(por_articulo)
+            for i in range(0, len(ids), HistorialService.TAMANO_LOTE):
+                lote = ids[i:i + HistorialService.TAMANO_LOTE]
+                abiertas = {
+                    h['articulo_id']: h for h in HistorialPrecio.objects.filter(
+                        lista_id=lista_id, articulo_id__in=lote, vigente_hasta__isnull=True
+                    ).values('id', 'articulo_id', *CAMPOS_PRECIO)
+                }
+                cerrar, nuevas = [], []
+                for articulo_id in lote:
+                    p = por_articulo[articulo_id]
+                    abierta = abiertas.get(articulo_id)
+                    if abierta and all(abierta[c] == getattr(p, c) for c in CAMPOS_PRECIO):
+                        continue
+                    if abierta:
+                        cerrar.append(abierta['id'])
+                    nuevas.append(HistorialPrecio(
+                        lista_id=lista_id, articulo_id=articulo_id, precio_base=p.precio_base,
+                        autorizado_bajo_costo=p.autorizado_bajo_costo, motivo_bajo_costo=p.motivo_bajo_costo,
+                        vigente_desde=momento,
+                    ))
+                if cerrar:
+                    HistorialPrecio.objects.filter(pk__in=cerrar).update(vigente_hasta=momento)
+                HistorialPrecio.objects.bulk_create(nuevas)
+                escritas += len(nuevas)
+        return escritas
+
+    @staticmethod
+    def registrar_lista(lista_id, momento=None):
+        """
+        Primera versión de todos los precios de una lista recién poblada (sin historial previo),
+        con un INSERT … SELECT. Devuelve cuántas versiones escribió.
+        """
+        momento = momento or timezone.now()
+        historial, precios = HistorialPrecio._meta, PrecioArticulo._meta
+        q = connection.ops.quote_name
+        columnas = ['lista', 'articulo', *CAMPOS_PRECIO]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {q(historial.db_table)} "
+                f"({', '.join(q(historial.get_field(c).column) for c in columnas)}, {q('vigente_desde')}) "
+                f"SELECT {', '.join(q(precios.get_field(c).column) for c in columnas)}, %s "
+                f"FROM {q(precios.db_table)} WHERE {q(precios.get_field('lista').column)} = %s",
+                [connection.ops.adapt_datetimefield_value(momento), lista_id],
+            )
+            return cursor.rowcount
+
+    @staticmethod
+    def cerrar_precio(lista_id, articulo_id, momento=None):
+        """El artículo deja de tener precio en la lista (PrecioArticulo borrado)."""
+        HistorialPrecio.objects.filter(
+            lista_id=lista_id, articulo_id=articulo_id, vigente_hasta__isnull=True
+        ).update(vigente_hasta=momento or timezone.now())
+
+    @staticmethod
+    def registrar_costos(articulo_ids, momento=None):
+        """Abre una versión de costo para cada artículo cuyo ultimo_costo cambió."""
+        momento = momento or timezone.now()
+        articulo_ids = list(articulo_ids)
+        escritas = 0
+        for i in range(0, len(articulo_ids), HistorialService.TAMANO_LOTE):
+            lote = articulo_ids[i:i + HistorialService.TAMANO_LOTE]
+            costos = dict(Articulo.objects.filter(pk__in=lote).values_list('pk', 'ultimo_costo'))
+            abiertas = {
+                articulo_id: (pk, costo) for pk, articulo_id, costo in HistorialCosto.objects.filter(
+                    articulo_id__in=lote, vigente_hasta__isnull=True
+                ).values_list('id', 'articulo_id', 'ultimo_costo')
+            }
+            cerrar, nuevas = [], []
+            for articulo_id, costo in costos.items():
+                abierta = abiertas.get(articulo_id)
+                if abierta and abierta[1] == costo:
+                    continue
+                if abierta:
+                    cerrar.append(abierta[0])
+                nuevas.append(HistorialCosto(articulo_id=articulo_id, ultimo_costo=costo, vigente_desde=momento))
+            if cerrar:
+                HistorialCosto.objects.filter(pk__in=cerrar).update(vigente_hasta=momento)
+            HistorialCosto.objects.bulk_create(nuevas)
+            escritas += len(nuevas)
+        return escritas
+
+    @staticmethod
+    def precio_en(lista, articulo, fecha):
+        """
+        PrecioArticulo con los valores vigentes al cierre de `fecha`, o None si ya no tenía
+        precio. Una búsqueda en el índice (lista, articulo, -vigente_desde). Si la fecha es
+        anterior a todo el historial (sembrado desde la última modificación), vale la primera
+        versión conocida y, sin historial, el precio actual.
+        """
+        fin = fin_del_dia(fecha)
+        version = HistorialPrecio.objects.filter(
+            lista=lista, articulo=articulo, vigente_desde__lt=fin
+        ).order_by('-vigente_desde').first()
+        if version is None:
+            version = HistorialPrecio.objects.filter(
+                lista=lista, articulo=articulo
+            ).order_by('vigente_desde').first()
+            if version is None:
+                return PrecioArticulo.objects.filter(lista=lista, articulo=articulo).first()
+        elif version.vigente_hasta and version.vigente_hasta < fin:
+            return None
+        return PrecioArticulo(
+            lista=lista, articulo=articulo,
+            **{campo: getattr(version, campo) for campo in CAMPOS_PRECIO}
+        )
+
+    @staticmethod
+    def precios_en(lista, articulo_ids, fecha):
+        """
+        {articulo_id: PrecioArticulo sin guardar} vigentes al cierre de `fecha`, con el mismo
+        respaldo que precio_en para los artículos cuyo historial empieza después.
+        """
+        fin = fin_del_dia(fecha)
+        filas = HistorialPrecio.objects.filter(
+            _vigente_en(fin), lista=lista, articulo_id__in=articulo_ids
+        ).values('articulo_id', *CAMPOS_PRECIO)
+        precios = {f['articulo_id']: f for f in filas}
+        faltan = set(articulo_ids) - set(precios) - set(HistorialPrecio.objects.filter(
+            lista=lista, articulo_id__in=articulo_ids, vigente_desde__lt=fin
+        ).values_list('articulo_id', flat=True))  # con versión anterior cerrada: sin precio
+        if faltan:
+            for f in HistorialPrecio.objects.filter(
+                lista=lista, articulo_id__in=faltan
+            ).order_by('-vigente_desde').values('articulo_id', *CAMPOS_PRECIO):
+                precios[f['articulo_id']] = f  # la última asignada es la primera versión
+            faltan -= set(precios)
+        if faltan:
+            precios.update({f['articulo_id']: f for f in PrecioArticulo.objects.filter(
+                lista=lista, articulo_id__in=faltan
+            ).values('articulo_id', *CAMPOS_PRECIO)})
+        return {
+            articulo_id: PrecioArticulo(lista=lista, articulo_id=articulo_id, **{c: f[c] for c in CAMPOS_PRECIO})
+            for articulo_id, f in precios.items()
+        }
+
+    @staticmethod
+    def costos_en(articulo_ids, fecha):
+        """
+        {articulo_id: ultimo_costo} vigente al cierre de `fecha`, o el de la primera versión si
+        la fecha es anterior al historial (solo los que tienen historial).
+        """
+        costos = dict(HistorialCosto.objects.filter(
+            _vigente_en(fin_del_dia(fecha)), articulo_id__in=articulo_ids
+        ).values_list('articulo_id', 'ultimo_costo'))
+        faltan = set(articulo_ids) - set(costos)
+        if faltan:
+            costos.update(HistorialCosto.objects.filter(
+                articulo_id__in=faltan
+            ).order_by('-vigente_desde').values_list('articulo_id', 'ultimo_costo'))
+        return costos
+
+    @staticmethod
+    def articulo_en(articulo, fecha):
+        """
+        Copia del artículo con el costo que tenía al cierre de `fecha`: el de la primera versión
+        si la fecha es anterior al historial, el actual si no hay historial.
+        """
+        costos = HistorialCosto.objects.filter(articulo=articulo).values_list('ultimo_costo', flat=True)
+        costo = costos.filter(vigente_desde__lt=fin_del_dia(fecha)).order_by('-vigente_desde').first()
+        if costo is None:
+            costo = costos.order_by('vigente_desde').first()
+        if costo is None:
+            return articulo
+        pasado = copy.copy(articulo)
+        pasado.ultimo_costo = costo
+        return pasado
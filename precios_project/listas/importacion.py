@@ -0,0 +1,122 @@
+# listas/importacion.py
+import csv
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import transaction
+from .models import Articulo, PrecioArticulo
+from .services import PrecioMaterializadoService
+from .historial import HistorialService
+from .bajo_costo import DeteccionBajoCostoService
+from . import contadores, versiones
+
+VERDADEROS = {'1', 'true', 'si', 'sí', 's', 'x', 'yes'}
+_MAXIMO_PRECIO = Decimal('9999999999.99')  # max_digits=12, decimal_places=2
+
+
+class ImportacionPreciosService:
+    """
+    Importa PrecioArticulo de un CSV por código de artículo, por bloques de TAMANO_LOTE filas:
+    resuelve los códigos del bloque en una consulta, valida el costo de todo el bloque y hace
+    upsert con bulk_create(update_conflicts=True). Columnas: codigo, precio_base y, opcionales,
+    autorizado_bajo_costo y motivo_bajo_costo. La memoria usada no depende del tamaño del archivo.
+    """
+
+    TAMANO_LOTE = 2000
+    MAXIMO_ERRORES = 1000  # errores devueltos en el resumen; `reportar` recibe todos
+    CAMPOS_ACTUALIZADOS = ['precio_base', 'autorizado_bajo_costo', 'motivo_bajo_costo', 'pendiente_autorizacion',
+                           'actualizado_en']
+
+    @staticmethod
+    def _leer_fila(fila):
+        """Devuelve (codigo, precio, autorizado, motivo) o lanza ValueError con el motivo."""
+        codigo = (fila.get('codigo') or '').strip()
+        if not codigo:
+            raise ValueError('Falta el código del artículo')
+        try:
+            precio = Decimal((fila.get('precio_base') or '').strip().replace(',', '.'))
+        except InvalidOperation:
+            raise ValueError('precio_base no es un número válido')
+        if not precio.is_finite() or precio < 0 or precio > _MAXIMO_PRECIO:
+            raise ValueError('precio_base fuera de rango')
+        if precio != precio.quantize(Decimal('0.01')):
+            raise ValueError('precio_base admite como máximo 2 decimales')
+        autorizado = (fila.get('autorizado_bajo_costo') or '').strip().lower() in VERDADEROS
+        motivo = (fila.get('motivo_bajo_costo') or '').strip() or None
+        return codigo, precio, autorizado, motivo
+
+    @staticmethod
+    def importar_csv(lista, archivo, delimitador=',', tamano_lote=None, reportar=None):
+        """
+        `archivo` es cualquier iterable de líneas de texto. Cada bloque se guarda en su propia
+        transacción; las filas con error se omiten y se informan como {'fila', 'codigo', 'error'}.
+        """
+        tamano_lote = tamano_lote or ImportacionPreciosService.TAMANO_LOTE
+        lector = csv.DictReader(archivo, delimiter=delimitador)
+        faltantes = {'codigo', 'precio_base'} - set(lector.fieldnames or ())
+        if faltantes:
+            raise ValueError(f"Faltan columnas: {', '.join(sorted(faltantes))}")
+
+        resumen = {'filas': 0, 'importadas': 0, 'con_error': 0, 'errores': []}
+
+        def error(numero, codigo, mensaje):
+            entrada = {'fila': numero, 'codigo': codigo, 'error': mensaje}
+            resumen['con_error'] += 1
+            if len(resumen['errores']) < ImportacionPreciosService.MAXIMO_ERRORES:
+                resumen['errores'].append(entrada)
+            if reportar:
+                reportar(entrada)
+
+        # la fila 1 es la cabecera
+        filas = enumerate(lector, start=2)
+        while True:
+            bloque = list(islice(filas, tamano_lote))
+            if not bloque:
+                break
+            resumen['filas'] += len(bloque)
+
+            leidas = []
+            for numero, fila in bloque:
+                try:
+                    leidas.append((numero, *ImportacionPreciosService._leer_fila(fila)))
+                except ValueError as e:
+                    error(numero, (fila.get('codigo') or '').strip(), str(e))
+
+            articulos = {
+                codigo: (pk, costo) for codigo, pk, costo in Articulo.objects.filter(
+                    codigo__in={f[1] for f in leidas}
+                ).values_list('codigo', 'pk', 'ultimo_costo')
+            }
+
+            # si un código se repite en el bloque gana la última fila, como en un upsert fila a fila
+            precios = {}
+            for numero, codigo, precio, autorizado, motivo in leidas:
+                if codigo not in articulos:
+                    error(numero, codigo, 'No existe un artículo con ese código')
+                    continue
+                articulo_id, costo = articulos[codigo]
+                if precio < costo and not autorizado:
+                    error(numero, codigo,
+                          'El precio base no puede ser inferior al último costo registrado sin autorización.')
+                    continue
+                # lo importado queda sobre el costo o autorizado: nunca pendiente de autorización
+                precios[articulo_id] = PrecioArticulo(
+                    lista=lista, articulo_id=articulo_id, precio_base=precio,
+                    autorizado_bajo_costo=autorizado, motivo_bajo_costo=motivo, pendiente_autorizacion=False,
+                )
+
+            if precios:
+                with transaction.atomic():
+                    existentes = PrecioArticulo.objects.filter(lista=lista, articulo_id__in=list(precios)).count()
+                    PrecioArticulo.objects.bulk_create(
+                        precios.values(), update_conflicts=True,
+                        unique_fields=['lista', 'articulo'],
+                        update_fields=ImportacionPreciosService.CAMPOS_ACTUALIZADOS,
+                    )
+                    # bulk_create no dispara señales: se rematerializa el bloque, se versiona y se ajusta el contador
+                    PrecioMaterializadoService.refrescar(lista.pk, list(precios))
+                    HistorialService.registrar_precios(precios.values())
+                    DeteccionBajoCostoService.revisar(list(precios), lista_id=lista.pk)
+                    contadores.ajustar({'total_precios_articulo': len(precios) - existentes})
+                    versiones.incrementar(versiones.precios_de_lista(lista.pk))
+                resumen['importadas'] += len(precios)
+        return resumen
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from listas.acumulados import AcumuladosVentasService
+
+
+class Command(BaseCommand):
+    help = ('Acumula en VentaDiaria las ventas nuevas desde la última marca de agua (para cron); '
+            'con --reconstruir borra y recalcula todo el histórico de las fuentes indicadas.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconstruir', action='store_true', help='Recalcular el histórico desde cero')
+        parser.add_argument('--fuente', choices=['orden', 'compra_cliente'], action='append',
+                            help='Fuente a procesar (repetible; por defecto ambas)')
+        parser.add_argument('--dias', type=int, default=7, help='Días por ventana al reconstruir órdenes')
+
+    def handle(self, *args, **options):
+        fuentes = options['fuente'] or ['orden', 'compra_cliente']
+        for fuente in fuentes:
+            if options['reconstruir']:
+                filas = AcumuladosVentasService.reconstruir(
+                    fuente, dias=options['dias'],
+                    informar=lambda hasta, filas: self.stdout.write(f'  {fuente}: hasta {hasta:%Y-%m-%d} ({filas} filas)'),
+                )
+            elif fuente == 'orden':
+                filas = AcumuladosVentasService.acumular_ordenes()
+            else:
+                filas = AcumuladosVentasService.acumular_compras_cliente()
+            self.stdout.write(f'{fuente}: {filas} filas acumuladas')
+        self.stdout.write(self.style.SUCCESS('Acumulados de ventas al día.'))
@@ -0,0 +1,91 @@
+import json
+import random
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from listas import benchmark
+from listas.models import PrecioArticulo
+from listas.reglas import invalidar_reglas
+from listas.services import PrecioService
+
+CANALES = benchmark.CANALES + [None]
+
+
+def _sin_cache():
+    PrecioService.invalidar_listas_vigentes()
+    invalidar_reglas()
+
+
+class Command(BaseCommand):
+    help = ('Mide obtener_lista_vigente, aplicar_reglas y calcular_precio (ops/s, p50/p99 y consultas '
+            'por llamada) sobre precios de listas vigentes y guarda el resultado en JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--llamadas', type=int, default=1000, help='Llamadas por escenario')
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--salida', help='Ruta del JSON de resultados')
+        parser.add_argument('--comparar', help='JSON de una ejecución anterior para mostrar la variación')
+
+    def _casos(self, n, rnd):
+        hoy = timezone.now().date()
+        precios = list(
+            PrecioArticulo.objects.filter(
+                lista__estado='vigente', lista__fecha_inicio__lte=hoy, lista__fecha_fin__gte=hoy
+            ).select_related('lista__empresa', 'lista__sucursal', 'articulo').order_by('?')[:min(n, 5000)]
+        )
+        if not precios:
+            raise CommandError('No hay precios en listas vigentes; ejecute generar_datos_prueba.')
+        articulos = [p.articulo for p in precios]
+        casos = []
+        for _ in range(n):
+            p = rnd.choice(precios)
+            casos.append({
+                'precio': p,
+                'canal': rnd.choice(CANALES),
+                'cantidad': rnd.choice([1, 1, 1, rnd.randint(2, 40)]),
+                'monto': rnd.choice([None, Decimal(rnd.randint(0, 200000)).scaleb(-2)]),
+                'carrito': [{'articulo_id': a.id, 'cantidad': 1} for a in rnd.sample(articulos, min(len(articulos), rnd.randint(0, 5)))],
+            })
+        return casos
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['semilla'])
+        casos = self._casos(options['llamadas'], rnd)
+
+        vigente = [(c['precio'].lista.empresa, c['precio'].lista.sucursal, c['canal']) for c in casos]
+        reglas = [
+            (c['precio'].lista, c['precio'].articulo, c['canal'], c['cantidad'], c['monto'] or Decimal('0'), c['carrito'])
+            for c in casos
+        ]
+        simple = [(c['precio'].lista.empresa, c['precio'].lista.sucursal, c['precio'].articulo, c['canal'])
+                  for c in casos]
+        contexto = [
+            (c['precio'].lista.empresa, c['precio'].lista.sucursal, c['precio'].articulo, c['canal'],
+             c['cantidad'], c['monto'], None, c['carrito'])
+            for c in casos
+        ]
+
+        _sin_cache()
+        resultados = {
+            'obtener_lista_vigente_frio': benchmark.medir(PrecioService.obtener_lista_vigente, vigente, _sin_cache),
+            'obtener_lista_vigente': benchmark.medir(PrecioService.obtener_lista_vigente, vigente, calentar=True),
+            'aplicar_reglas': benchmark.medir(PrecioService.aplicar_reglas, reglas, calentar=True),
+            'calcular_precio_frio': benchmark.medir(PrecioService.calcular_precio, simple, _sin_cache),
+            'calcular_precio': benchmark.medir(PrecioService.calcular_precio, simple, calentar=True),
+            'calcular_precio_contexto': benchmark.medir(PrecioService.calcular_precio, contexto, calentar=True),
+        }
+        salida = {
+            'commit': benchmark.commit_actual(),
+            'fecha': timezone.now().isoformat(),
+            'llamadas': options['llamadas'],
+            'semilla': options['semilla'],
+            'resultados': resultados,
+        }
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as f:
+                salida['variacion_pct'] = benchmark.comparar(salida, json.load(f))
+
+        if options['salida']:
+            benchmark.guardar(salida, options['salida'])
+            self.stdout.write(f"Resultados guardados en {options['salida']}")
+        self.stdout.write(json.dumps(salida, indent=2, ensure_ascii=False))
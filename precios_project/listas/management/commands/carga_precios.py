@@ -0,0 +1,49 @@
+import json
+import random
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from listas import benchmark
+from listas.models import PrecioArticulo
+
+
+class Command(BaseCommand):
+    help = ('Compara bajo carga concurrente el endpoint síncrono de precios con el async contra un '
+            'servidor en marcha, p.ej. "gunicorn precios_project.wsgi --threads 8" frente a '
+            '"uvicorn precios_project.asgi:application --workers 1".')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url-sync', default='http://127.0.0.1:8000/listas/api/precio/calcular/')
+        parser.add_argument('--url-async', default='http://127.0.0.1:8000/listas/api/precio/calcular-async/')
+        parser.add_argument('--token', required=True, help='Token de la API (rest_framework.authtoken)')
+        parser.add_argument('--peticiones', type=int, default=2000)
+        parser.add_argument('--concurrencia', type=int, default=100)
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--salida', help='Ruta del JSON de resultados')
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['semilla'])
+        hoy = timezone.now().date()
+        muestra = list(PrecioArticulo.objects.filter(
+            lista__estado='vigente', lista__fecha_inicio__lte=hoy, lista__fecha_fin__gte=hoy
+        ).values_list('lista__empresa_id', 'lista__sucursal_id', 'articulo_id')[:5000])
+        if not muestra:
+            raise CommandError('No hay precios en listas vigentes; ejecute generar_datos_prueba.')
+
+        cuerpos = []
+        for _ in range(options['peticiones']):
+            empresa_id, sucursal_id, articulo_id = rnd.choice(muestra)
+            cuerpos.append({'empresa_id': empresa_id, 'sucursal_id': sucursal_id, 'articulo_id': articulo_id,
+                            'canal': rnd.choice(benchmark.CANALES)})
+        cabeceras = {'Authorization': f"Token {options['token']}"}
+
+        salida = {
+            'commit': benchmark.commit_actual(),
+            'fecha': timezone.now().isoformat(),
+            'resultados': {
+                nombre: benchmark.carga_http(options[f'url_{nombre}'], cuerpos, cabeceras, options['concurrencia'])
+                for nombre in ('sync', 'async')
+            },
+        }
+        if options['salida']:
+            benchmark.guardar(salida, options['salida'])
+        self.stdout.write(json.dumps(salida, indent=2, ensure_ascii=False))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from listas.exportacion import ExportacionPreciosService
+from listas.models import ListaPrecio
+
+
+class Command(BaseCommand):
+    help = 'Exporta los precios de una lista (código, nombre, costo, precio base y final) en CSV o JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('lista_id', type=int)
+        parser.add_argument('--formato', choices=sorted(ExportacionPreciosService.FORMATOS), default='csv')
+        parser.add_argument('--salida', help='Ruta del archivo (por defecto la salida estándar)')
+
+    def handle(self, *args, **options):
+        try:
+            lista = ListaPrecio.objects.get(pk=options['lista_id'])
+        except ListaPrecio.DoesNotExist:
+            raise CommandError(f"No existe la lista {options['lista_id']}")
+
+        lineas = ExportacionPreciosService.lineas(lista, options['formato'])
+        if options['salida']:
+            with open(options['salida'], 'w', newline='', encoding='utf-8') as f:
+                f.writelines(lineas)
+        else:
+            for linea in lineas:
+                self.stdout.write(linea, ending='')
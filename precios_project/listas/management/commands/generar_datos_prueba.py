@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from listas.benchmark import generar_datos
+from listas.models import ListaPrecio
+from listas.services import PrecioMaterializadoService
+
+
+class Command(BaseCommand):
+    help = 'Genera un conjunto de datos sintético (empresas, sucursales, artículos, listas, reglas y combinaciones).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresas', type=int, default=2)
+        parser.add_argument('--sucursales', type=int, default=3, help='Sucursales por empresa')
+        parser.add_argument('--articulos', type=int, default=10000)
+        parser.add_argument('--periodos', type=int, default=3, help='Listas consecutivas por sucursal')
+        parser.add_argument('--reglas', type=int, default=8, help='Reglas por lista')
+        parser.add_argument('--combinaciones', type=int, default=20, help='Combinaciones por lista')
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--prefijo', default='BENCH')
+        parser.add_argument('--materializar', action='store_true',
+                            help='Calcula PrecioFinalMaterializado de las listas creadas (bulk_create no dispara señales)')
+
+    def handle(self, *args, **options):
+        totales = generar_datos(
+            empresas=options['empresas'], sucursales=options['sucursales'],
+            articulos=options['articulos'], periodos=options['periodos'],
+            reglas=options['reglas'], combinaciones=options['combinaciones'],
+            semilla=options['semilla'], prefijo=options['prefijo'],
+        )
+        self.stdout.write(
+            f"{totales['articulos']} artículos, {totales['listas']} listas, {totales['precios']} precios creados"
+        )
+        if options['materializar']:
+            listas = ListaPrecio.objects.filter(nombre__startswith=f"{options['prefijo']} Lista ")
+            for lista_id in listas.values_list('pk', flat=True):
+                PrecioMaterializadoService.refrescar(lista_id)
+            self.stdout.write('Precios materializados.')
+        self.stdout.write(self.style.SUCCESS('Datos de prueba generados.'))
@@ -0,0 +1,45 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from listas.importacion import ImportacionPreciosService
+from listas.models import ListaPrecio
+
+
+class Command(BaseCommand):
+    help = 'Importa precios de una lista desde un CSV (codigo, precio_base[, autorizado_bajo_costo, motivo_bajo_costo]).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('lista_id', type=int)
+        parser.add_argument('archivo', help='Ruta del CSV (UTF-8, con cabecera)')
+        parser.add_argument('--delimitador', default=',')
+        parser.add_argument('--lote', type=int, default=ImportacionPreciosService.TAMANO_LOTE)
+        parser.add_argument('--errores', help='Ruta de un CSV donde escribir todas las filas rechazadas')
+
+    def handle(self, *args, **options):
+        try:
+            lista = ListaPrecio.objects.get(pk=options['lista_id'])
+        except ListaPrecio.DoesNotExist:
+            raise CommandError(f"No existe la lista {options['lista_id']}")
+
+        salida_errores = open(options['errores'], 'w', newline='', encoding='utf-8') if options['errores'] else None
+        try:
+            reportar = None
+            if salida_errores:
+                escritor = csv.DictWriter(salida_errores, fieldnames=['fila', 'codigo', 'error'])
+                escritor.writeheader()
+                reportar = escritor.writerow
+            with open(options['archivo'], newline='', encoding='utf-8-sig') as archivo:
+                resumen = ImportacionPreciosService.importar_csv(
+                    lista, archivo, options['delimitador'], options['lote'], reportar
+                )
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            if salida_errores:
+                salida_errores.close()
+
+        self.stdout.write(
+            f"{resumen['filas']} filas leídas, {resumen['importadas']} importadas, {resumen['con_error']} con error"
+        )
+        for entrada in resumen['errores'][:20]:
+            self.stdout.write(f"  fila {entrada['fila']} ({entrada['codigo']}): {entrada['error']}")
+        self.stdout.write(self.style.SUCCESS('Importación completa.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from listas.models import ListaPrecio
+from listas.services import PrecioMaterializadoService
+
+
+class Command(BaseCommand):
+    help = 'Recalcula PrecioFinalMaterializado para todas las listas o las indicadas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('lista_ids', nargs='*', type=int, help='IDs de ListaPrecio (por defecto todas)')
+
+    def handle(self, *args, **options):
+        lista_ids = options['lista_ids'] or list(ListaPrecio.objects.values_list('pk', flat=True))
+        for lista_id in lista_ids:
+            filas = PrecioMaterializadoService.refrescar(lista_id)
+            self.stdout.write(f'Lista {lista_id}: {filas} filas materializadas')
+        self.stdout.write(self.style.SUCCESS('Materialización completa.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from listas import contadores
+
+
+class Command(BaseCommand):
+    help = 'Recuenta los contadores del dashboard y corrige la deriva (p.ej. tras cargas con bulk_create o update()).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('claves', nargs='*', help=f"Contadores a recontar (por defecto todos: {', '.join(contadores.CONTADORES)})")
+
+    def handle(self, *args, **options):
+        deriva = contadores.reconciliar(options['claves'] or None)
+        for clave, (guardado, real) in deriva.items():
+            self.stdout.write(f'{clave}: {guardado} -> {real}')
+        self.stdout.write(self.style.SUCCESS(f'{len(deriva)} contadores corregidos.'))
@@ -0,0 +1,196 @@
+# listas/metricas.py
+import functools
+import json
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+from django.conf import settings
+from django.db import connections
+
+
+class MedicionSQL:
+    """Cuenta y cronometra las consultas ejecutadas mientras está activa (en todas las conexiones)."""
+
+    def __init__(self, guardar_sql=False):
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.guardar_sql = guardar_sql
+        self.sentencias = Counter()
+        self._pila = None
+        self._inicio = None
+        self.tiempo_total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo_db += time.perf_counter() - inicio
+            self.consultas += 1
+            if self.guardar_sql:
+                self.sentencias[sql] += 1
+
+    def __enter__(self):
+        self._pila = ExitStack()
+        for conexion in connections.all():
+            self._pila.enter_context(conexion.execute_wrapper(self))
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tiempo_total = time.perf_counter() - self._inicio
+        self._pila.close()
+        return False
+
+    def repetidas(self, limite=5):
+        """Sentencias SQL más repetidas: [(sql, veces), ...]."""
+        return [(sql, n) for sql, n in self.sentencias.most_common(limite) if n > 1]
+
+
+class RegistroMetricas:
+    """Agregado en memoria del proceso: llamadas, consultas, tiempo de BD y tiempo total por clave."""
+
+    def __init__(self):
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, clave, medicion):
+        with self._lock:
+            d = self._datos.setdefault(clave, {
+                'llamadas': 0, 'consultas': 0, 'tiempo_db_ms': 0.0,
+                'tiempo_total_ms': 0.0, 'tiempo_max_ms': 0.0,
+            })
+            total_ms = medicion.tiempo_total * 1000
+            d['llamadas'] += 1
+            d['consultas'] += medicion.consultas
+            d['tiempo_db_ms'] += medicion.tiempo_db * 1000
+            d['tiempo_total_ms'] += total_ms
+            d['tiempo_max_ms'] = max(d['tiempo_max_ms'], total_ms)
+
+    def resumen(self):
+        with self._lock:
+            datos = {clave: dict(valores) for clave, valores in self._datos.items()}
+        for valores in datos.values():
+            n = valores['llamadas']
+            valores['consultas_promedio'] = round(valores['consultas'] / n, 2)
+            valores['tiempo_promedio_ms'] = round(valores['tiempo_total_ms'] / n, 3)
+            valores['tiempo_db_ms'] = round(valores['tiempo_db_ms'], 3)
+            valores['tiempo_total_ms'] = round(valores['tiempo_total_ms'], 3)
+            valores['tiempo_max_ms'] = round(valores['tiempo_max_ms'], 3)
+        return dict(sorted(datos.items(), key=lambda kv: -kv[1]['tiempo_total_ms']))
+
+    def reiniciar(self):
+        with self._lock:
+            self._datos.clear()
+
+
+registro = RegistroMetricas()
+
+VISTA_SIN_RESOLVER = '<sin_resolver>'
+
+
+def medir(nombre):
+    """Decorador para métodos de servicio: registra consultas y tiempos bajo 'servicio:<nombre>'."""
+    def decorador(func):
+        if iscoroutinefunction(func):
+            # las consultas async se ejecutan en otro hilo: solo se registra el tiempo total
+            @functools.wraps(func)
+            async def envoltura_async(*args, **kwargs):
+                if not getattr(settings, 'PRECIOS_METRICAS_ACTIVAS', False):
+                    return await func(*args, **kwargs)
+                medicion = MedicionSQL()
+                inicio = time.perf_counter()
+                resultado = await func(*args, **kwargs)
+                medicion.tiempo_total = time.perf_counter() - inicio
+                registro.registrar(f'servicio:{nombre}', medicion)
+                return resultado
+            return envoltura_async
+
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            if not getattr(settings, 'PRECIOS_METRICAS_ACTIVAS', False):
+                return func(*args, **kwargs)
+            with MedicionSQL() as medicion:
+                resultado = func(*args, **kwargs)
+            registro.registrar(f'servicio:{nombre}', medicion)
+            return resultado
+        return envoltura
+    return decorador
+
+
+_lock_log = threading.Lock()
+
+
+def _escribir_lenta(ruta, entrada):
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with _lock_log, ruta.open('a', encoding='utf-8') as f:
+        f.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+
+
+class MetricasMiddleware:
+    """
+    Con PRECIOS_METRICAS_ACTIVAS mide cada petición (consultas, tiempo de BD y tiempo total) y
+    la agrega por nombre de URL. PRECIOS_METRICAS_CABECERAS añade las cifras a la respuesta; las
+    peticiones que superan PRECIOS_METRICAS_UMBRAL_MS se escriben en PRECIOS_METRICAS_LOG (JSONL),
+    con su SQL más repetido solo si PRECIOS_METRICAS_GUARDAR_SQL.
+    En vistas async solo se mide el tiempo total (sus consultas corren en otro hilo).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, 'PRECIOS_METRICAS_ACTIVAS', False):
+            return self.get_response(request)
+
+        log = getattr(settings, 'PRECIOS_METRICAS_LOG', None)
+        guardar_sql = bool(log) and getattr(settings, 'PRECIOS_METRICAS_GUARDAR_SQL', False)
+        with MedicionSQL(guardar_sql=guardar_sql) as medicion:
+            response = self.get_response(request)
+        return self._registrar(request, response, medicion, log)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'PRECIOS_METRICAS_ACTIVAS', False):
+            return await self.get_response(request)
+
+        medicion = MedicionSQL()
+        inicio = time.perf_counter()
+        response = await self.get_response(request)
+        medicion.tiempo_total = time.perf_counter() - inicio
+        return self._registrar(request, response, medicion, getattr(settings, 'PRECIOS_METRICAS_LOG', None))
+
+    def _registrar(self, request, response, medicion, log):
+        match = getattr(request, 'resolver_match', None)
+        # rutas sin resolver (404, escaneos) comparten una clave: el registro no crece sin límite
+        nombre = (match.view_name if match else None) or VISTA_SIN_RESOLVER
+        registro.registrar(f'vista:{nombre}', medicion)
+
+        total_ms = medicion.tiempo_total * 1000
+        if getattr(settings, 'PRECIOS_METRICAS_CABECERAS', False):
+            response['X-Consultas-SQL'] = str(medicion.consultas)
+            response['X-Tiempo-DB-ms'] = f'{medicion.tiempo_db * 1000:.2f}'
+            response['X-Tiempo-Total-ms'] = f'{total_ms:.2f}'
+
+        if log and total_ms >= getattr(settings, 'PRECIOS_METRICAS_UMBRAL_MS', 500):
+            _escribir_lenta(log, {
+                'ts': time.time(),
+                'metodo': request.method,
+                'ruta': request.get_full_path(),
+                'vista': nombre,
+                'estado': response.status_code,
+                'consultas': medicion.consultas,
+                'tiempo_db_ms': round(medicion.tiempo_db * 1000, 2),
+                'tiempo_total_ms': round(total_ms, 2),
+                'sql_repetido': [{'sql': sql, 'veces': n} for sql, n in medicion.repetidas()],
+            })
+        return response
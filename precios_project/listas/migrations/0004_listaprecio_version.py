@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-16 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listas', '0003_orden_lineaorden'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listaprecio',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
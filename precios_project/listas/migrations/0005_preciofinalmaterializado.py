@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-16 20:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listas', '0004_listaprecio_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecioFinalMaterializado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('canal', models.CharField(blank=True, default='', max_length=50)),
+                ('precio_base', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('precio_final', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('descuento_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('autorizado_bajo_costo', models.BooleanField(default=False)),
+                ('razon_bajo_costo', models.TextField(blank=True, null=True)),
+                ('reglas_aplicadas', models.JSONField(default=list)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('articulo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='precios_materializados', to='listas.articulo')),
+                ('lista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='precios_materializados', to='listas.listaprecio')),
+            ],
+            options={
+                'unique_together': {('lista', 'articulo', 'canal')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+RESTRICCION = 'listas_listaprecio_vigencia_sin_solape'
+
+
+def crear_restriccion(apps, schema_editor):
+    # SQLite y otros motores siguen validando el solapamiento en ListaPrecio.clean()
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        f'ALTER TABLE listas_listaprecio ADD CONSTRAINT {RESTRICCION} '
+        f"EXCLUDE USING gist (empresa_id WITH =, sucursal_id WITH =, "
+        f"daterange(fecha_inicio, fecha_fin, '[]') WITH &&)"
+    )
+
+
+def eliminar_restriccion(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'ALTER TABLE listas_listaprecio DROP CONSTRAINT IF EXISTS {RESTRICCION}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listas', '0005_preciofinalmaterializado'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_restriccion, eliminar_restriccion),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-16 21:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listas', '0006_listaprecio_vigencia_sin_solape'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorDashboard',
+            fields=[
+                ('clave', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-16 21:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def sembrar_historial(apps, schema_editor):
+    """Primera versión de cada precio (desde su última modificación) y de cada costo (desde hoy)."""
+    PrecioArticulo = apps.get_model('listas', 'PrecioArticulo')
+    Articulo = apps.get_model('listas', 'Articulo')
+    HistorialPrecio = apps.get_model('listas', 'HistorialPrecio')
+    HistorialCosto = apps.get_model('listas', 'HistorialCosto')
+    ahora = timezone.now()
+    HistorialPrecio.objects.bulk_create((
+        HistorialPrecio(
+            lista_id=p.lista_id, articulo_id=p.articulo_id, precio_base=p.precio_base,
+            autorizado_bajo_costo=p.autorizado_bajo_costo, motivo_bajo_costo=p.motivo_bajo_costo,
+            vigente_desde=p.actualizado_en,
+        ) for p in PrecioArticulo.objects.iterator(chunk_size=2000)
+    ), batch_size=2000)
+    HistorialCosto.objects.bulk_create((
+        HistorialCosto(articulo_id=pk, ultimo_costo=costo, vigente_desde=ahora)
+        for pk, costo in Articulo.objects.values_list('pk', 'ultimo_costo').iterator(chunk_size=2000)
+    ), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listas', '0007_contadordashboard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistorialCosto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultimo_costo', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('vigente_desde', models.DateTimeField()),
+                ('vigente_hasta', models.DateTimeField(blank=True, null=True)),
+                ('articulo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial_costos', to='listas.articulo')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['articulo', '-vigente_desde'], name='historialcosto_punto')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HistorialPrecio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio_base', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('autorizado_bajo_costo', models.BooleanField(default=False)),
+                ('motivo_bajo_costo', models.TextField(blank=True, null=True)),
+                ('vigente_desde', models.DateTimeField()),
+                ('vigente_hasta', models.DateTimeField(blank=True, null=True)),
+                ('articulo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial_precios', to='listas.articulo')),
+                ('lista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial_precios', to='listas.listaprecio')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['lista', 'articulo', '-vigente_desde'], name='historialprecio_punto')],
+            },
+        ),
+        migrations.RunPython(sembrar_historial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-16 21:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def detectar_existentes(apps, schema_editor):
+    """Carga inicial: los precios que ya están por debajo del costo sin autorización."""
+    PrecioArticulo = apps.get_model('listas', 'PrecioArticulo')
+    HallazgoBajoCosto = apps.get_model('listas', 'HallazgoBajoCosto')
+    ahora = timezone.now()
+    HallazgoBajoCosto.objects.bulk_create((
+        HallazgoBajoCosto(precio_id=pk, lista_id=lista, articulo_id=articulo,
+                          precio_base=precio, ultimo_costo=costo, detectado_en=ahora)
+        for pk, lista, articulo, precio, costo in PrecioArticulo.objects.filter(
+            autorizado_bajo_costo=False, precio_base__lt=F('articulo__ultimo_costo')
+        ).values_list('id', 'lista_id', 'articulo_id', 'precio_base', 'articulo__ultimo_costo').iterator(chunk_size=2000)
+    ), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listas', '0008_historial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HallazgoBajoCosto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio_base', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('ultimo_costo', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('detectado_en', models.DateTimeField()),
+                ('articulo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hallazgos_bajo_costo', to='listas.articulo')),
+                ('lista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hallazgos_bajo_costo', to='listas.listaprecio')),
+                ('precio', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='hallazgo_bajo_costo', to='listas.precioarticulo')),
+            ],
+        ),
+        migrations.RunPython(detectar_existentes, migrations.RunPython.noop),
+    ]
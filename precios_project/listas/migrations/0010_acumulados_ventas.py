@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-16 21:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fechar_confirmadas(apps, schema_editor):
+    """Las órdenes ya confirmadas toman su fecha de creación como fecha de confirmación."""
+    Orden = apps.get_model('listas', 'Orden')
+    Orden.objects.filter(estado='confirmada', confirmada_en__isnull=True).update(confirmada_en=F('fecha'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listas', '0009_hallazgobajocosto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaAguaAcumulado',
+            fields=[
+                ('fuente', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('ultimo_id', models.BigIntegerField(blank=True, null=True)),
+                ('ultima_fecha', models.DateTimeField(blank=True, null=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='orden',
+            name='confirmada_en',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('fuente', models.CharField(choices=[('orden', 'Órdenes confirmadas'), ('compra_cliente', 'Detalle de órdenes de compra de clientes')], max_length=20)),
+                ('unidades', models.BigIntegerField(default=0)),
+                ('importe', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('lineas', models.PositiveIntegerField(default=0)),
+                ('articulo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='listas.articulo')),
+                ('sucursal', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='listas.sucursal')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['articulo', 'fecha'], name='ventadiaria_articulo_fecha'), models.Index(fields=['fecha'], name='ventadiaria_fecha')],
+            },
+        ),
+        migrations.RunPython(fechar_confirmadas, migrations.RunPython.noop),
+    ]
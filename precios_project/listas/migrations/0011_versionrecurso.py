@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-16 21:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listas', '0010_acumulados_ventas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionRecurso',
+            fields=[
+                ('recurso', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('modificado_en', models.DateTimeField()),
+            ],
+        ),
+    ]
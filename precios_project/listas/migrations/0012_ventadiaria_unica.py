@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listas', '0011_versionrecurso'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='ventadiaria',
+            constraint=models.UniqueConstraint(condition=models.Q(('sucursal__isnull', False)), fields=('fuente', 'fecha', 'articulo', 'sucursal'), name='ventadiaria_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='ventadiaria',
+            constraint=models.UniqueConstraint(condition=models.Q(('sucursal__isnull', True)), fields=('fuente', 'fecha', 'articulo'), name='ventadiaria_unica_sin_sucursal'),
+        ),
+    ]
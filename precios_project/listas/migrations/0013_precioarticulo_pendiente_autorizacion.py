@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listas', '0012_ventadiaria_unica'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='precioarticulo',
+            name='pendiente_autorizacion',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:40
+
+from django.db import migrations, models
+
+
+def mover_precio_fijo(apps, schema_editor):
+    # hasta ahora el importe de 'precio_fijo' se guardaba en porcentaje_descuento
+    CombinacionProducto = apps.get_model('listas', 'CombinacionProducto')
+    CombinacionProducto.objects.filter(tipo_aplicacion='precio_fijo').update(
+        precio_fijo=models.F('porcentaje_descuento'), porcentaje_descuento=0
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listas', '0013_precioarticulo_pendiente_autorizacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='combinacionproducto',
+            name='precio_fijo',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        # irreversible: un precio_fijo de 1000 o más no cabe en porcentaje_descuento (5,2) y los
+        # combos de precio fijo no guardan ya un porcentaje que restaurar
+        migrations.RunPython(mover_precio_fijo),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listas', '0014_combinacionproducto_precio_fijo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detalleordencompracliente',
+            name='creado_en',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
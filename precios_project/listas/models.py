@@ -1,4 +1,5 @@
-from django.db import models
+from contextlib import contextmanager
+from django.db import models, connections, router, transaction, IntegrityError
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.contrib.auth import get_user_model
@@ -54,11 +55,65 @@ class DetalleOrdenCompraCliente(models.Model):
     cantidad = models.PositiveIntegerField()
     precio_unitario = models.DecimalField(max_digits=12, decimal_places=2)
     fecha = models.DateTimeField(default=timezone.now)
+    # instante de inserción (auto_now_add ignora el valor que traiga quien crea la fila): marca de
+    # agua de los acumulados, que no puede fiarse de `fecha`
+    creado_en = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.orden_id} - {self.articulo.codigo}"
 
 
+# Restricción de exclusión GiST creada por la migración 0006 (solo PostgreSQL)
+RESTRICCION_SOLAPE = 'listas_listaprecio_vigencia_sin_solape'
+MENSAJE_SOLAPE = "Existe otra lista con vigencia que se solapa para la misma empresa/sucursal."
+
+
+def _es_postgresql(using):
+    return connections[using].vendor == 'postgresql'
+
+
+@contextmanager
+def solape_como_validacion(using=None):
+    """
+    Guarda una ListaPrecio informando como ValidationError(MENSAJE_SOLAPE) el solapamiento que
+    en PostgreSQL rechaza RESTRICCION_SOLAPE; el savepoint deja usable la transacción exterior.
+    """
+    try:
+        with transaction.atomic(using=using or router.db_for_write(ListaPrecio)):
+            yield
+    except IntegrityError as e:
+        if RESTRICCION_SOLAPE in str(e):
+            raise ValidationError(MENSAJE_SOLAPE) from e
+        raise
+
+
+class RangoVigencia(models.Func):
+    """daterange(fecha_inicio, fecha_fin, '[]'): la misma expresión que indexa la restricción GiST."""
+    function = 'daterange'
+    template = "%(function)s(%(expressions)s, '[]')"
+
+    def __init__(self, **extra):
+        super().__init__(models.F('fecha_inicio'), models.F('fecha_fin'), **extra)
+
+
+class VigenciaContiene(models.Func):
+    """rango @> fecha, utilizable directamente en filter()."""
+    arg_joiner = ' @> '
+    template = '(%(expressions)s)'
+    output_field = models.BooleanField()
+
+    def __init__(self, fecha):
+        super().__init__(RangoVigencia(), models.Value(fecha, output_field=models.DateField()))
+
+
+class ListaPrecioQuerySet(models.QuerySet):
+    def vigentes_en(self, fecha):
+        """Listas cuya vigencia incluye la fecha; en PostgreSQL usa el índice GiST del rango."""
+        if _es_postgresql(self.db):
+            return self.filter(VigenciaContiene(fecha))
+        return self.filter(fecha_inicio__lte=fecha, fecha_fin__gte=fecha)
+
+
 class ListaPrecio(models.Model):
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='listas')
     sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, related_name='listas')
@@ -70,6 +125,10 @@ class ListaPrecio(models.Model):
     estado = models.CharField(max_length=30, choices=ESTADO_CHOICES, default='borrador')
     creado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     creado_en = models.DateTimeField(auto_now_add=True)
+    # se incrementa con F('version') + 1 cada vez que cambian sus reglas o combinaciones
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = ListaPrecioQuerySet.as_manager()
 
     class Meta:
         ordering = ['-fecha_inicio']
@@ -78,13 +137,16 @@ class ListaPrecio(models.Model):
     def clean(self):
         if self.fecha_fin < self.fecha_inicio:
             raise ValidationError("La fecha_fin no puede ser anterior a fecha_inicio.")
+        # en PostgreSQL el solapamiento lo impide RESTRICCION_SOLAPE al guardar (ver save)
+        if _es_postgresql(router.db_for_write(ListaPrecio, instance=self)):
+            return
         overlapping = ListaPrecio.objects.filter(
-            empresa=self.empresa, sucursal=self.sucursal
+            empresa_id=self.empresa_id, sucursal_id=self.sucursal_id
         ).exclude(pk=self.pk).filter(
             fecha_inicio__lte=self.fecha_fin, fecha_fin__gte=self.fecha_inicio
         )
         if overlapping.exists():
-            raise ValidationError("Existe otra lista con vigencia que se solapa para la misma empresa/sucursal.")
+            raise ValidationError(MENSAJE_SOLAPE)
 
     def __str__(self):
         return f"{self.nombre} ({self.empresa} - {self.sucursal})"
@@ -96,17 +158,100 @@ class PrecioArticulo(models.Model):
     precio_base = models.DecimalField(max_digits=12, decimal_places=2)
     autorizado_bajo_costo = models.BooleanField(default=False)
     motivo_bajo_costo = models.TextField(blank=True, null=True)
+    # bajo costo sin autorizar por un ajuste masivo en modo 'marcar': a la espera de autorización
+    pendiente_autorizacion = models.BooleanField(default=False, db_index=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('lista', 'articulo')
 
     def clean(self):
-        if self.precio_base is not None and self.articulo and not self.autorizado_bajo_costo:
+        # un precio pendiente de autorización ya fue aceptado por debajo del costo: se puede
+        # seguir editando hasta que se autorice (registrar_descuento_proveedor) o se corrija
+        if self.autorizado_bajo_costo or self.pendiente_autorizacion:
+            return
+        if self.precio_base is not None and self.articulo:
             if self.precio_base < self.articulo.ultimo_costo:
                 raise ValidationError("El precio base no puede ser inferior al último costo registrado sin autorización.")
 
 
+class HistorialPrecio(models.Model):
+    """
+    Versiones de PrecioArticulo (solo se añaden filas). Cada versión vale en
+    [vigente_desde, vigente_hasta); vigente_hasta NULL es la versión actual.
+    """
+    lista = models.ForeignKey(ListaPrecio, on_delete=models.CASCADE, related_name='historial_precios')
+    articulo = models.ForeignKey(Articulo, on_delete=models.CASCADE, related_name='historial_precios')
+    precio_base = models.DecimalField(max_digits=12, decimal_places=2)
+    autorizado_bajo_costo = models.BooleanField(default=False)
+    motivo_bajo_costo = models.TextField(blank=True, null=True)
+    vigente_desde = models.DateTimeField()
+    vigente_hasta = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['lista', 'articulo', '-vigente_desde'], name='historialprecio_punto'),
+        ]
+
+    def __str__(self):
+        return f"{self.articulo_id} @ {self.lista_id}: {self.precio_base} desde {self.vigente_desde}"
+
+
+class HistorialCosto(models.Model):
+    """Versiones de Articulo.ultimo_costo, con el mismo esquema de vigencia que HistorialPrecio."""
+    articulo = models.ForeignKey(Articulo, on_delete=models.CASCADE, related_name='historial_costos')
+    ultimo_costo = models.DecimalField(max_digits=12, decimal_places=2)
+    vigente_desde = models.DateTimeField()
+    vigente_hasta = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['articulo', '-vigente_desde'], name='historialcosto_punto'),
+        ]
+
+    def __str__(self):
+        return f"{self.articulo_id}: {self.ultimo_costo} desde {self.vigente_desde}"
+
+
+class PrecioFinalMaterializado(models.Model):
+    """
+    Precio final precalculado sin carrito, cantidad=1 y monto_pedido=0 por (lista, artículo, canal).
+    canal='' cubre los canales sin regla de canal propia. Se refresca desde listas/signals.py.
+    """
+    lista = models.ForeignKey(ListaPrecio, on_delete=models.CASCADE, related_name='precios_materializados')
+    articulo = models.ForeignKey(Articulo, on_delete=models.CASCADE, related_name='precios_materializados')
+    canal = models.CharField(max_length=50, blank=True, default='')
+    precio_base = models.DecimalField(max_digits=12, decimal_places=2)
+    precio_final = models.DecimalField(max_digits=12, decimal_places=2)
+    descuento_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    autorizado_bajo_costo = models.BooleanField(default=False)
+    razon_bajo_costo = models.TextField(blank=True, null=True)
+    reglas_aplicadas = models.JSONField(default=list)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('lista', 'articulo', 'canal')
+
+    def __str__(self):
+        return f"{self.articulo_id} @ {self.lista_id} [{self.canal or '*'}]: {self.precio_final}"
+
+
+class HallazgoBajoCosto(models.Model):
+    """
+    PrecioArticulo que quedó por debajo de Articulo.ultimo_costo sin autorización. Se mantiene
+    de forma incremental (listas/bajo_costo.py) al cambiar un costo o un precio.
+    """
+    precio = models.OneToOneField(PrecioArticulo, on_delete=models.CASCADE, related_name='hallazgo_bajo_costo')
+    lista = models.ForeignKey(ListaPrecio, on_delete=models.CASCADE, related_name='hallazgos_bajo_costo')
+    articulo = models.ForeignKey(Articulo, on_delete=models.CASCADE, related_name='hallazgos_bajo_costo')
+    precio_base = models.DecimalField(max_digits=12, decimal_places=2)
+    ultimo_costo = models.DecimalField(max_digits=12, decimal_places=2)
+    detectado_en = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.articulo_id} @ {self.lista_id}: {self.precio_base} < {self.ultimo_costo}"
+
+
 class ReglaPrecio(models.Model):
     lista = models.ForeignKey(ListaPrecio, on_delete=models.CASCADE, related_name='reglas')
     tipo = models.CharField(max_length=50, choices=TIPO_REGLA_CHOICES)
@@ -149,12 +294,15 @@ class CombinacionProducto(models.Model):
     nombre = models.CharField(max_length=200)
     articulos = models.ManyToManyField(Articulo, related_name='combinaciones')
     porcentaje_descuento = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    # importe por artículo cuando tipo_aplicacion es 'precio_fijo' (porcentaje_descuento no se usa)
+    precio_fijo = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
     minimo_por_articulo = models.PositiveIntegerField(default=1, help_text="Cantidad mínima por cada artículo de la combinación")
     tipo_aplicacion = models.CharField(max_length=20, choices=TIPO_APLICACION_CHOICES, default='descuento_pct')
     activo = models.BooleanField(default=True)
 
     def clean(self):
-        pass
+        if self.tipo_aplicacion == 'precio_fijo' and self.precio_fijo is None:
+            raise ValidationError({'precio_fijo': "Indique el precio fijo por artículo."})
 
     def __str__(self):
         return f"{self.nombre} ({self.lista.nombre})"
@@ -172,11 +320,46 @@ class Orden(models.Model):
     total_bruto = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     estado = models.CharField(max_length=20, choices=ESTADOS, default='borrador')
     fecha = models.DateTimeField(auto_now_add=True)
+    # marca de agua de los acumulados de ventas (listas/acumulados.py)
+    confirmada_en = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    def save(self, *args, **kwargs):
+        if self.estado == 'confirmada' and self.confirmada_en is None:
+            self.confirmada_en = timezone.now()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'confirmada_en'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Orden {self.id} ({self.get_estado_display()})"
 
 
+class ContadorDashboard(models.Model):
+    """
+    Métricas del dashboard mantenidas por señales (listas/contadores.py) para no contar
+    tablas completas en cada carga; `manage.py reconciliar_contadores` corrige la deriva.
+    """
+    clave = models.CharField(max_length=50, primary_key=True)
+    valor = models.BigIntegerField(default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.clave}={self.valor}"
+
+
+class VersionRecurso(models.Model):
+    """
+    Versión de un recurso de la API (p.ej. 'articulos' o 'precios-articulo:<lista_id>') que se
+    incrementa con cada cambio; de ella salen ETag y Last-Modified (listas/versiones.py).
+    """
+    recurso = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    modificado_en = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.recurso} v{self.version}"
+
+
 class LineaOrden(models.Model):
     orden = models.ForeignKey(Orden, on_delete=models.CASCADE, related_name='lineas')
     articulo = models.ForeignKey(Articulo, on_delete=models.CASCADE)
@@ -184,4 +367,51 @@ class LineaOrden(models.Model):
     precio_unitario = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
     def subtotal(self):
-        return self.cantidad * self.precio_unitario
\ No newline at end of file
+        return self.cantidad * self.precio_unitario
+
+
+class VentaDiaria(models.Model):
+    """
+    Ventas acumuladas por día, artículo, sucursal y tabla de origen. Se mantiene de forma
+    incremental desde LineaOrden (órdenes confirmadas) y DetalleOrdenCompraCliente (sin sucursal).
+    """
+    FUENTES = (
+        ('orden', 'Órdenes confirmadas'),
+        ('compra_cliente', 'Detalle de órdenes de compra de clientes'),
+    )
+
+    fecha = models.DateField()
+    articulo = models.ForeignKey(Articulo, on_delete=models.CASCADE, related_name='ventas_diarias')
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, null=True, blank=True, related_name='ventas_diarias')
+    fuente = models.CharField(max_length=20, choices=FUENTES)
+    unidades = models.BigIntegerField(default=0)
+    importe = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    lineas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['articulo', 'fecha'], name='ventadiaria_articulo_fecha'),
+            models.Index(fields=['fecha'], name='ventadiaria_fecha'),
+        ]
+        # una fila por clave: un error de acumulado no puede duplicar ventas. 'compra_cliente' no
+        # tiene sucursal y NULL no choca en un UNIQUE, de ahí la segunda restricción parcial
+        constraints = [
+            models.UniqueConstraint(fields=['fuente', 'fecha', 'articulo', 'sucursal'],
+                                    condition=models.Q(sucursal__isnull=False), name='ventadiaria_unica'),
+            models.UniqueConstraint(fields=['fuente', 'fecha', 'articulo'],
+                                    condition=models.Q(sucursal__isnull=True), name='ventadiaria_unica_sin_sucursal'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.articulo_id} [{self.fuente}]: {self.unidades} u."
+
+
+class MarcaAguaAcumulado(models.Model):
+    """Hasta dónde se acumuló cada tabla de origen: último id o último instante procesado."""
+    fuente = models.CharField(max_length=20, primary_key=True)
+    ultimo_id = models.BigIntegerField(blank=True, null=True)
+    ultima_fecha = models.DateTimeField(blank=True, null=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.fuente}: {self.ultimo_id or self.ultima_fecha}"
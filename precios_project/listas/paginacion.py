@@ -0,0 +1,15 @@
+# listas/paginacion.py
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class PaginacionCursor(CursorPagination):
+    """
+    Paginación por cursor (keyset) sobre la clave primaria: cada página es un
+    `WHERE id > cursor ORDER BY id LIMIT n`, sin OFFSET, y las filas insertadas mientras
+    se recorre la colección no desplazan ni duplican resultados.
+    """
+    ordering = 'id'
+    page_size = getattr(settings, 'PRECIOS_PAGINA_TAMANO', 100)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'PRECIOS_PAGINA_MAXIMA', 1000)
@@ -0,0 +1,254 @@
+# listas/reglas.py
+import heapq
+import threading
+from collections import defaultdict
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .cache import CacheLRU
+from .models import ReglaPrecio, CombinacionProducto
+from .aritmetica import a_centavos, a_decimal, a_puntos_base
+
+
+def _aplica_canal(regla, canal, cantidad, monto_pedido):
+    return bool(regla.canal and canal and regla.canal == canal)
+
+
+def _aplica_escala_unidades(regla, canal, cantidad, monto_pedido):
+    if regla.min_unidades and regla.max_unidades:
+        return regla.min_unidades <= cantidad <= regla.max_unidades
+    return bool(regla.min_unidades and cantidad >= regla.min_unidades)
+
+
+def _aplica_escala_monto(regla, canal, cantidad, monto_pedido):
+    if regla.min_monto and regla.max_monto:
+        return regla.min_monto <= monto_pedido <= regla.max_monto
+    return bool(regla.min_monto and monto_pedido >= regla.min_monto)
+
+
+def _aplica_monto_pedido(regla, canal, cantidad, monto_pedido):
+    return bool(regla.min_monto and monto_pedido >= regla.min_monto)
+
+
+def _aplica_siempre(regla, canal, cantidad, monto_pedido):
+    return True
+
+
+def _no_aplica(regla, canal, cantidad, monto_pedido):
+    return False
+
+
+# 'combinacion' se resuelve contra el carrito en PrecioService.aplicar_reglas
+EVALUADORES = {
+    'canal': _aplica_canal,
+    'escala_unidades': _aplica_escala_unidades,
+    'escala_monto': _aplica_escala_monto,
+    'monto_pedido': _aplica_monto_pedido,
+    'descuento_proveedor': _aplica_siempre,
+}
+
+
+class ReglaCompilada:
+    """Copia inmutable de una ReglaPrecio con su evaluador ya resuelto."""
+
+    __slots__ = (
+        'id', 'tipo', 'prioridad', 'canal', 'min_unidades', 'max_unidades',
+        'min_monto', 'max_monto', 'porcentaje_descuento', 'evaluador',
+        'articulo_id', 'grupo_id', 'linea_id', 'puntos_base',
+    )
+
+    def __init__(self, regla):
+        self.id = regla.id
+        self.tipo = regla.tipo
+        self.prioridad = regla.prioridad
+        self.canal = regla.canal
+        self.min_unidades = regla.min_unidades
+        self.max_unidades = regla.max_unidades
+        self.min_monto = regla.min_monto
+        self.max_monto = regla.max_monto
+        self.porcentaje_descuento = regla.porcentaje_descuento
+        self.puntos_base = a_puntos_base(regla.porcentaje_descuento)
+        self.evaluador = EVALUADORES.get(regla.tipo, _no_aplica)
+        self.articulo_id = regla.articulo_id
+        self.grupo_id = regla.grupo_id
+        self.linea_id = regla.linea_id
+
+    @property
+    def alcance(self):
+        """Clave del índice: el filtro más específico de la regla, o None si es de toda la lista."""
+        if self.articulo_id:
+            return ('articulo', self.articulo_id)
+        if self.grupo_id:
+            return ('grupo', self.grupo_id)
+        if self.linea_id:
+            return ('linea', self.linea_id)
+        return None
+
+    def alcanza(self, articulo):
+        """True si el artículo cumple todos los filtros articulo/grupo/linea de la regla."""
+        return (
+            (not self.articulo_id or self.articulo_id == articulo.id)
+            and (not self.grupo_id or self.grupo_id == articulo.grupo_id)
+            and (not self.linea_id or self.linea_id == articulo.linea_id)
+        )
+
+    def aplica(self, canal, cantidad, monto_pedido):
+        return self.evaluador(self, canal, cantidad, monto_pedido)
+
+    def como_dict(self, regla=None):
+        return {
+            'regla_id': self.id,
+            'tipo': self.tipo,
+            'descripcion': f'Regla {self.tipo} prio {self.prioridad}',
+            'porcentaje_descuento': str(self.porcentaje_descuento or '0'),
+            'accion': 'descuento_pct',
+            'valor': str(self.porcentaje_descuento or '0'),
+            'combo_id': None
+        }
+
+
+class ComboCompilado:
+    """Combinación activa con los ids de sus artículos ya cargados."""
+
+    __slots__ = (
+        'id', 'nombre', 'articulos', 'porcentaje_descuento', 'tipo_aplicacion',
+        'puntos_base', 'precio_fijo_centavos',
+    )
+    tipo = 'combinacion'
+
+    def __init__(self, combo):
+        self.id = combo.id
+        self.nombre = combo.nombre
+        self.articulos = frozenset(a.id for a in combo.articulos.all())
+        self.porcentaje_descuento = combo.porcentaje_descuento
+        self.tipo_aplicacion = combo.tipo_aplicacion
+        self.puntos_base = a_puntos_base(combo.porcentaje_descuento)
+        self.precio_fijo_centavos = (
+            a_centavos(combo.precio_fijo or 0) if combo.tipo_aplicacion == 'precio_fijo' else None
+        )
+
+    def como_dict(self, regla):
+        return {
+            'regla_id': regla.id,
+            'tipo': 'combinacion',
+            'descripcion': f'Combinación #{self.id} - {self.nombre or "sin nombre"}',
+            'porcentaje_descuento': str(self.porcentaje_descuento or '0'),
+            'accion': self.tipo_aplicacion,
+            'valor': str(a_decimal(self.precio_fijo_centavos) if self.precio_fijo_centavos is not None
+                         else self.porcentaje_descuento or '0'),
+            'combo_id': self.id
+        }
+
+
+def _orden(regla):
+    return (regla.prioridad, regla.id)
+
+
+class ReglasCompiladas:
+    """
+    Reglas activas de una lista, ordenadas por prioridad y agrupadas por tipo y alcance.
+    Se construyen una vez por (lista, version) y se reutilizan en cada cálculo.
+    """
+
+    def __init__(self, lista_id, version, reglas, combos):
+        self.lista_id = lista_id
+        self.version = version
+        self.reglas = tuple(sorted(reglas, key=_orden))
+        self.combos = tuple(sorted(combos, key=lambda c: c.id))
+        # índice invertido articulo_id -> combinaciones que lo contienen
+        por_articulo = defaultdict(list)
+        for combo in self.combos:
+            for articulo_id in combo.articulos:
+                por_articulo[articulo_id].append(combo)
+        self.combos_por_articulo = {aid: tuple(combos) for aid, combos in por_articulo.items()}
+        por_tipo = defaultdict(list)
+        for regla in self.reglas:
+            por_tipo[regla.tipo].append(regla)
+        self.por_tipo = {tipo: tuple(reglas) for tipo, reglas in por_tipo.items()}
+        # alcance -> reglas; None agrupa las reglas de toda la lista
+        por_alcance = defaultdict(list)
+        for regla in self.reglas:
+            por_alcance[regla.alcance].append(regla)
+        self.generales = tuple(por_alcance.pop(None, ()))
+        self.por_alcance = {alcance: tuple(reglas) for alcance, reglas in por_alcance.items()}
+        # (articulo, grupo, linea) -> candidatas; acotado porque vive tanto como las reglas compiladas
+        self._candidatas = CacheLRU(getattr(settings, 'PRECIOS_CACHE_CANDIDATAS_TAMANO', 4096))
+        self.canales = frozenset(r.canal for r in self.de_tipo('canal') if r.canal)
+
+    def candidatas(self, articulo):
+        """Reglas que pueden aplicar al artículo, en orden de prioridad."""
+        if not self.por_alcance:
+            return self.reglas
+        clave = (articulo.id, articulo.grupo_id, articulo.linea_id)
+        reglas = self._candidatas.obtener(clave, None)
+        if reglas is None:
+            especificas = [
+                [r for r in self.por_alcance.get(alcance, ()) if r.alcanza(articulo)]
+                for alcance in (('articulo', articulo.id), ('grupo', articulo.grupo_id), ('linea', articulo.linea_id))
+            ]
+            reglas = tuple(heapq.merge(self.generales, *especificas, key=_orden))
+            self._candidatas.guardar(clave, reglas)
+        return reglas
+
+    def de_tipo(self, tipo, articulo=None):
+        if articulo is None or not self.por_alcance:
+            return self.por_tipo.get(tipo, ())
+        return tuple(r for r in self.candidatas(articulo) if r.tipo == tipo)
+
+    def clave_canal(self, canal):
+        """Canal con el que se materializa el precio: '' si ninguna regla distingue ese canal."""
+        return canal if canal in self.canales else ''
+
+    def independiente_del_contexto(self, cantidad, monto_pedido, carrito_articulos=None):
+        """True si el resultado coincide con el de cantidad=1, monto_pedido=0 y sin carrito."""
+        if carrito_articulos and self.de_tipo('combinacion'):
+            return False
+        if cantidad != 1 and self.de_tipo('escala_unidades'):
+            return False
+        if monto_pedido and (self.de_tipo('escala_monto') or self.de_tipo('monto_pedido')):
+            return False
+        return True
+
+    def combos_de(self, articulo_id):
+        return self.combos_por_articulo.get(articulo_id, ())
+
+
+_compiladas = {}
+_lock = threading.Lock()
+
+
+def compilar_reglas(lista_id, version):
+    """Carga reglas y combinaciones activas de la lista (2-3 consultas)."""
+    reglas = [ReglaCompilada(r) for r in ReglaPrecio.objects.filter(lista_id=lista_id, activo=True)]
+    combos = []
+    if any(r.tipo == 'combinacion' for r in reglas):
+        qs = CombinacionProducto.objects.filter(lista_id=lista_id, activo=True).prefetch_related('articulos')
+        combos = [ComboCompilado(c) for c in qs]
+    return ReglasCompiladas(lista_id, version, reglas, combos)
+
+
+def obtener_reglas(lista):
+    """Devuelve las reglas compiladas de la lista; solo consulta la BD si cambió su versión."""
+    compiladas = _compiladas.get(lista.pk)
+    if compiladas is not None and compiladas.version == lista.version:
+        return compiladas
+    compiladas = compilar_reglas(lista.pk, lista.version)
+    with _lock:
+        _compiladas[lista.pk] = compiladas
+    return compiladas
+
+
+async def aobtener_reglas(lista):
+    """Versión async de obtener_reglas: sin salto de hilo si ya están compiladas."""
+    compiladas = _compiladas.get(lista.pk)
+    if compiladas is not None and compiladas.version == lista.version:
+        return compiladas
+    return await sync_to_async(obtener_reglas)(lista)
+
+
+def invalidar_reglas(lista_id=None):
+    """Descarta las reglas compiladas de una lista (o de todas)."""
+    with _lock:
+        if lista_id is None:
+            _compiladas.clear()
+        else:
+            _compiladas.pop(lista_id, None)
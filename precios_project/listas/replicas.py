@@ -0,0 +1,199 @@
+# listas/replicas.py
+import functools
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# estado de la petición en curso: {'primaria': bool, 'escribio': bool}. Es un dict mutable para
+# que lo que marque un hilo de sync_to_async lo vea también la corrutina que lo lanzó.
+_estado = ContextVar('precios_estado_replica', default=None)
+
+METODOS_LECTURA = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replicas():
+    """Alias de réplica configurados (PRECIOS_DB_REPLICAS) que existen en DATABASES."""
+    return [alias for alias in getattr(settings, 'PRECIOS_DB_REPLICAS', ()) if alias in settings.DATABASES]
+
+
+def en_primaria():
+    estado = _estado.get()
+    # sin petición en curso (comandos, tareas programadas) se lee de la primaria salvo bajo replica()
+    if estado is None or estado['primaria'] or estado['escribio']:
+        return True
+    # dentro de una transacción se lee de la misma conexión que escribe
+    return connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+def marcar_escritura():
+    """La petición en curso escribió: sus lecturas y las del cliente durante el margen van a la primaria."""
+    estado = _estado.get()
+    if estado is not None:
+        estado['escribio'] = True
+
+
+@contextmanager
+def primaria():
+    """Todas las lecturas del bloque van a la base primaria."""
+    estado = _estado.get()
+    if estado is None:
+        token = _estado.set({'primaria': True, 'escribio': False})
+        try:
+            yield
+        finally:
+            _estado.reset(token)
+        return
+    anterior = estado['primaria']
+    estado['primaria'] = True
+    try:
+        yield
+    finally:
+        estado['primaria'] = anterior
+
+
+@contextmanager
+def replica():
+    """Fuera de una petición, permite leer de las réplicas dentro del bloque (p.ej. exportaciones)."""
+    if _estado.get() is not None:
+        yield
+        return
+    token = _estado.set({'primaria': False, 'escribio': False})
+    try:
+        yield
+    finally:
+        _estado.reset(token)
+
+
+def usar_replica(vista):
+    """
+    Marca una vista (o el método/acción de una vista de clase) como de solo lectura aunque se
+    llame por POST, como las de cálculo de precios: ReplicaMiddleware no la fija a la primaria.
+    Si aun así escribe, las lecturas posteriores de la petición vuelven a la primaria.
+    """
+    vista.usar_replica = True
+    return vista
+
+
+def _es_solo_lectura(vista, metodo):
+    if getattr(vista, 'usar_replica', False):
+        return True
+    # APIView/View (.cls, .view_class) y acciones de ViewSet (.actions: método -> acción)
+    clase = getattr(vista, 'cls', None) or getattr(vista, 'view_class', None)
+    if clase is None:
+        return False
+    metodo = metodo.lower()
+    manejador = getattr(clase, (getattr(vista, 'actions', None) or {}).get(metodo, metodo), None)
+    return getattr(manejador, 'usar_replica', False)
+
+
+def usar_primaria(vista):
+    """Decorador de vistas que leen y escriben a la vez (p.ej. confirmar_orden)."""
+    if iscoroutinefunction(vista):
+        @functools.wraps(vista)
+        async def envoltura_async(*args, **kwargs):
+            with primaria():
+                return await vista(*args, **kwargs)
+        return envoltura_async
+
+    @functools.wraps(vista)
+    def envoltura(*args, **kwargs):
+        with primaria():
+            return vista(*args, **kwargs)
+    return envoltura
+
+
+class ReplicaRouter:
+    """
+    Lecturas a una réplica de PRECIOS_DB_REPLICAS (al azar, para repartir carga) y escrituras
+    a la primaria. Se lee de la primaria dentro de una transacción, bajo primaria()/usar_primaria
+    y, con ReplicaMiddleware, en la petición que escribió y las que le siguen durante
+    PRECIOS_DB_PRIMARIA_SEGUNDOS. Fuera de una petición (comandos, cron) se lee de la primaria
+    salvo bajo replica(). Sin réplicas configuradas no cambia nada.
+    """
+
+    def db_for_read(self, model, **hints):
+        instancia = hints.get('instance')
+        if instancia is not None and instancia._state.db:
+            return instancia._state.db
+        disponibles = replicas()
+        if not disponibles or en_primaria():
+            return DEFAULT_DB_ALIAS
+        return random.choice(disponibles)
+
+    def db_for_write(self, model, **hints):
+        # también se consulta sin escribir (p.ej. validaciones de unicidad): la escritura la
+        # marcan las señales y versiones.incrementar con marcar_escritura()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # las réplicas son copias de la primaria
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Fija a la primaria las peticiones que no son de lectura (salvo las vistas marcadas con
+    usar_replica) y las que traen la cookie PRECIOS_DB_COOKIE; si la petición escribió, deja esa cookie durante
+    PRECIOS_DB_PRIMARIA_SEGUNDOS para que el mismo cliente lea lo que acaba de escribir
+    aunque la réplica vaya con retraso.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _iniciar(self, request):
+        cookie = getattr(settings, 'PRECIOS_DB_COOKIE', 'precios_primaria')
+        estado = {
+            'primaria': request.method not in METODOS_LECTURA or cookie in request.COOKIES,
+            'escribio': False,
+        }
+        request._estado_replica = estado
+        return estado, _estado.set(estado)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        estado = getattr(request, '_estado_replica', None)
+        cookie = getattr(settings, 'PRECIOS_DB_COOKIE', 'precios_primaria')
+        if (estado is not None and request.method not in METODOS_LECTURA
+                and cookie not in request.COOKIES and _es_solo_lectura(view_func, request.method)):
+            estado['primaria'] = False
+        return None
+
+    def _terminar(self, estado, token, response):
+        _estado.reset(token)
+        if estado['escribio']:
+            response.set_cookie(
+                getattr(settings, 'PRECIOS_DB_COOKIE', 'precios_primaria'), '1',
+                max_age=getattr(settings, 'PRECIOS_DB_PRIMARIA_SEGUNDOS', 5),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        estado, token = self._iniciar(request)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            _estado.reset(token)
+            raise
+        return self._terminar(estado, token, response)
+
+    async def __acall__(self, request):
+        estado, token = self._iniciar(request)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            _estado.reset(token)
+            raise
+        return self._terminar(estado, token, response)
@@ -1,7 +1,8 @@
 # listas/serializers.py
 from rest_framework import serializers
+from django.core.exceptions import ValidationError as DjangoValidationError
 from decimal import Decimal
-from .models import Empresa, Sucursal, Articulo, LineaArticulo, GrupoArticulo, ListaPrecio, PrecioArticulo, ReglaPrecio, CombinacionProducto
+from .models import Empresa, Sucursal, Articulo, LineaArticulo, GrupoArticulo, ListaPrecio, PrecioArticulo, ReglaPrecio, CombinacionProducto, HallazgoBajoCosto, solape_como_validacion
 
 class PrecioConsultaSerializer(serializers.Serializer):
     empresa_id = serializers.IntegerField()
@@ -12,6 +13,93 @@ class PrecioConsultaSerializer(serializers.Serializer):
     monto_pedido = serializers.DecimalField(required=False, max_digits=12, decimal_places=2, default=Decimal('0.00'))
     fecha = serializers.DateField(required=False, allow_null=True)
 
+class LineaLoteSerializer(serializers.Serializer):
+    articulo_id = serializers.IntegerField()
+    cantidad = serializers.IntegerField(required=False, default=1, min_value=1)
+
+class PrecioLoteConsultaSerializer(serializers.Serializer):
+    empresa_id = serializers.IntegerField()
+    sucursal_id = serializers.IntegerField()
+    canal = serializers.CharField(required=False, allow_blank=True, default=None)
+    monto_pedido = serializers.DecimalField(required=False, max_digits=12, decimal_places=2, allow_null=True, default=None)
+    fecha = serializers.DateField(required=False, allow_null=True)
+    lineas = LineaLoteSerializer(many=True, allow_empty=False)
+
+class AjusteReglaSerializer(serializers.Serializer):
+    regla_id = serializers.IntegerField()
+    porcentaje_descuento = serializers.DecimalField(required=False, max_digits=5, decimal_places=2)
+    activo = serializers.BooleanField(required=False)
+
+class SimulacionConsultaSerializer(serializers.Serializer):
+    canal = serializers.CharField(required=False, allow_blank=True, default=None)
+    cantidad = serializers.IntegerField(required=False, default=1, min_value=1)
+    monto_pedido = serializers.DecimalField(required=False, max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    ajustes = AjusteReglaSerializer(many=True, required=False, default=list)
+    detalle = serializers.BooleanField(required=False, default=False)
+
+class ImportacionPreciosSerializer(serializers.Serializer):
+    lista_id = serializers.PrimaryKeyRelatedField(queryset=ListaPrecio.objects.all(), source='lista')
+    archivo = serializers.FileField()
+    delimitador = serializers.ChoiceField(choices=[',', ';', '|', '\t'], required=False, default=',')
+
+class AjustePreciosSerializer(serializers.Serializer):
+    porcentaje = serializers.DecimalField(required=False, max_digits=7, decimal_places=2, min_value=Decimal('-100'))
+    monto = serializers.DecimalField(required=False, max_digits=12, decimal_places=2)
+    redondeo = serializers.ChoiceField(choices=['centavo', 'unidad', 'arriba', 'abajo'], required=False, default='centavo')
+    bajo_costo = serializers.ChoiceField(choices=['rechazar', 'marcar'], required=False, default='rechazar')
+    linea_id = serializers.PrimaryKeyRelatedField(queryset=LineaArticulo.objects.all(), source='linea', required=False)
+    grupo_id = serializers.PrimaryKeyRelatedField(queryset=GrupoArticulo.objects.all(), source='grupo', required=False)
+    articulo_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    simular = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, data):
+        if ('porcentaje' in data) == ('monto' in data):
+            raise serializers.ValidationError('Indique porcentaje o monto (uno de los dos).')
+        return data
+
+class ClonacionListaSerializer(serializers.Serializer):
+    nombre = serializers.CharField(required=False, max_length=200)
+    fecha_inicio = serializers.DateField()
+    fecha_fin = serializers.DateField()
+    estado = serializers.ChoiceField(choices=[c for c, _ in ListaPrecio._meta.get_field('estado').choices],
+                                     required=False, default='borrador')
+    porcentaje = serializers.DecimalField(required=False, max_digits=7, decimal_places=2, min_value=Decimal('-100'))
+    monto = serializers.DecimalField(required=False, max_digits=12, decimal_places=2)
+    redondeo = serializers.ChoiceField(choices=['centavo', 'unidad', 'arriba', 'abajo'], required=False, default='centavo')
+    bajo_costo = serializers.ChoiceField(choices=['rechazar', 'marcar'], required=False, default='rechazar')
+
+    def validate(self, data):
+        if 'porcentaje' in data and 'monto' in data:
+            raise serializers.ValidationError('Indique porcentaje o monto, no ambos.')
+        return data
+
+class CostoArticuloSerializer(serializers.Serializer):
+    articulo_id = serializers.IntegerField()
+    ultimo_costo = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0'))
+
+class HallazgoBajoCostoSerializer(serializers.ModelSerializer):
+    codigo = serializers.CharField(source='articulo.codigo', read_only=True)
+    articulo_nombre = serializers.CharField(source='articulo.nombre', read_only=True)
+    lista_nombre = serializers.CharField(source='lista.nombre', read_only=True)
+
+    class Meta:
+        model = HallazgoBajoCosto
+        fields = ['id', 'precio_id', 'lista_id', 'lista_nombre', 'articulo_id', 'codigo', 'articulo_nombre',
+                  'precio_base', 'ultimo_costo', 'detectado_en']
+
+class VentasConsultaSerializer(serializers.Serializer):
+    agrupar = serializers.ListField(
+        child=serializers.ChoiceField(choices=['fecha', 'articulo', 'linea', 'grupo', 'sucursal', 'fuente']),
+        required=False, default=['articulo'],
+    )
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+    articulo_id = serializers.IntegerField(required=False)
+    linea_id = serializers.IntegerField(required=False)
+    grupo_id = serializers.IntegerField(required=False)
+    sucursal_id = serializers.IntegerField(required=False)
+    fuente = serializers.ChoiceField(choices=['orden', 'compra_cliente'], required=False)
+
 class ReglaAplicadaSerializer(serializers.Serializer):
     regla_id = serializers.IntegerField()
     tipo = serializers.CharField()
@@ -27,37 +115,119 @@ class PrecioResultadoSerializer(serializers.Serializer):
     autorizado_bajo_costo = serializers.BooleanField()
     razon_bajo_costo = serializers.CharField(allow_null=True, allow_blank=True, required=False)
 
+class LineaLoteResultadoSerializer(PrecioResultadoSerializer):
+    articulo_id = serializers.IntegerField()
+    cantidad = serializers.IntegerField()
+    subtotal = serializers.DecimalField(max_digits=14, decimal_places=2, allow_null=True)
+    lista_usada = None
+
+class TotalesLoteSerializer(serializers.Serializer):
+    total_bruto = serializers.DecimalField(max_digits=14, decimal_places=2)
+    descuento_total = serializers.DecimalField(max_digits=14, decimal_places=2)
+    total = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+class PrecioLoteResultadoSerializer(serializers.Serializer):
+    lista_usada = serializers.DictField(child=serializers.CharField(), allow_null=True)
+    lineas = LineaLoteResultadoSerializer(many=True)
+    totales = TotalesLoteSerializer()
+
+# --- Representación plana / expandible ---
+def parametro_lista(request, nombre):
+    """?nombre=a,b,c -> ['a', 'b', 'c'] (None si el parámetro no viene)."""
+    valor = request.query_params.get(nombre) if request is not None else None
+    if valor is None:
+        return None
+    return [v.strip() for v in valor.split(',') if v.strip()]
+
+
+class ExpandibleMixin:
+    """
+    Las relaciones se devuelven como ids (<campo>_id) salvo que se pidan con ?expand=,
+    que admite rutas (?expand=lista.sucursal.empresa). ?fields= limita los campos de
+    la respuesta en lecturas. `expandibles` es {campo: (serializer, relación del modelo)}.
+    """
+    expandibles = {}
+
+    def __init__(self, *args, expand=None, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if expand is None:
+            expand = parametro_lista(request, 'expand') or []
+            if request is not None and request.method in ('GET', 'HEAD'):
+                fields = parametro_lista(request, 'fields')
+
+        directos = {ruta.split('.', 1)[0] for ruta in expand}
+        for nombre, (serializer, _) in self.expandibles.items():
+            if nombre in directos:
+                hijos = [ruta.split('.', 1)[1] for ruta in expand if ruta.startswith(nombre + '.')]
+                self.fields[nombre] = serializer(read_only=True, expand=hijos, context=self.context)
+            else:
+                self.fields.pop(nombre, None)
+
+        if fields:
+            for nombre in set(self.fields) - set(fields):
+                self.fields.pop(nombre)
+
+    @classmethod
+    def relaciones(cls, expand):
+        """Rutas de select_related que necesita la expansión pedida."""
+        rutas = set()
+        for ruta in expand or ():
+            serializer, partes = cls, []
+            for nombre in ruta.split('.'):
+                if nombre not in getattr(serializer, 'expandibles', {}):
+                    break
+                serializer, relacion = serializer.expandibles[nombre]
+                partes.append(relacion)
+                rutas.add('__'.join(partes))
+        return sorted(rutas)
+
+    @classmethod
+    def modelos(cls, expand):
+        """Modelos de cada serializer que incluye la expansión pedida, también en rutas anidadas."""
+        modelos = set()
+        for ruta in expand or ():
+            serializer = cls
+            for nombre in ruta.split('.'):
+                if nombre not in getattr(serializer, 'expandibles', {}):
+                    break
+                serializer = serializer.expandibles[nombre][0]
+                modelos.add(serializer.Meta.model)
+        return modelos
+
+
 # --- Entidades básicas ---
-class EmpresaSerializer(serializers.ModelSerializer):
+class EmpresaSerializer(ExpandibleMixin, serializers.ModelSerializer):
     class Meta:
         model = Empresa
         fields = ['id', 'nombre', 'ruc']
 
-class SucursalSerializer(serializers.ModelSerializer):
-    empresa = EmpresaSerializer(read_only=True)
-    empresa_id = serializers.PrimaryKeyRelatedField(queryset=Empresa.objects.all(), source='empresa', write_only=True)
+class SucursalSerializer(ExpandibleMixin, serializers.ModelSerializer):
+    empresa_id = serializers.PrimaryKeyRelatedField(queryset=Empresa.objects.all(), source='empresa')
+    expandibles = {'empresa': (EmpresaSerializer, 'empresa')}
+
     class Meta:
         model = Sucursal
         fields = ['id', 'nombre', 'direccion', 'empresa', 'empresa_id']
 
-class ArticuloSerializer(serializers.ModelSerializer):
+class ArticuloSerializer(ExpandibleMixin, serializers.ModelSerializer):
     class Meta:
         model = Articulo
         fields = ['id', 'codigo', 'nombre', 'ultimo_costo', 'linea', 'grupo']
         
 # --- Línea y Grupo de Artículo CRUD ---
 
-class LineaArticuloSerializer(serializers.ModelSerializer):
+class LineaArticuloSerializer(ExpandibleMixin, serializers.ModelSerializer):
     class Meta:
         model = LineaArticulo
         fields = ['id', 'nombre']
 
 
-class GrupoArticuloSerializer(serializers.ModelSerializer):
-    linea = LineaArticuloSerializer(read_only=True)
+class GrupoArticuloSerializer(ExpandibleMixin, serializers.ModelSerializer):
     linea_id = serializers.PrimaryKeyRelatedField(
-        queryset=LineaArticulo.objects.all(), source='linea', write_only=True, allow_null=True
+        queryset=LineaArticulo.objects.all(), source='linea', allow_null=True
     )
+    expandibles = {'linea': (LineaArticuloSerializer, 'linea')}
 
     class Meta:
         model = GrupoArticulo
@@ -65,11 +235,13 @@ class GrupoArticuloSerializer(serializers.ModelSerializer):
 
 
 # --- ListaPrecio CRUD ---
-class ListaPrecioSerializer(serializers.ModelSerializer):
-    empresa = EmpresaSerializer(read_only=True)
-    empresa_id = serializers.PrimaryKeyRelatedField(queryset=Empresa.objects.all(), source='empresa', write_only=True)
-    sucursal = SucursalSerializer(read_only=True)
-    sucursal_id = serializers.PrimaryKeyRelatedField(queryset=Sucursal.objects.all(), source='sucursal', write_only=True)
+class ListaPrecioSerializer(ExpandibleMixin, serializers.ModelSerializer):
+    empresa_id = serializers.PrimaryKeyRelatedField(queryset=Empresa.objects.all(), source='empresa')
+    sucursal_id = serializers.PrimaryKeyRelatedField(queryset=Sucursal.objects.all(), source='sucursal')
+    expandibles = {
+        'empresa': (EmpresaSerializer, 'empresa'),
+        'sucursal': (SucursalSerializer, 'sucursal'),
+    }
 
     class Meta:
         model = ListaPrecio
@@ -80,36 +252,57 @@ class ListaPrecioSerializer(serializers.ModelSerializer):
         read_only_fields = ['creado_por', 'creado_en']
 
     def validate(self, data):
-        # delegar validaciones de dominio al modelo: fecha_fin >= fecha_inicio, solapamiento, etc.
-        # Creamos instancia temporal para validar clean()
-        inst = ListaPrecio(**{**(self.instance.__dict__ if self.instance else {}), **data})
-        # eliminar atributos internos
-        if hasattr(inst, '_state'):
-            inst._state = getattr(inst, '_state')
+        # reglas de dominio de ListaPrecio.clean (fechas; el solapamiento solo fuera de PostgreSQL,
+        # donde lo impide la restricción de exclusión al guardar). La unicidad ya la valida DRF.
+        valores = {f.attname: getattr(self.instance, f.attname)
+                   for f in ListaPrecio._meta.concrete_fields} if self.instance else {}
+        inst = ListaPrecio(**valores)
+        for campo, valor in data.items():
+            setattr(inst, campo, valor)
         try:
-            inst.full_clean()
-        except Exception as e:
-            raise serializers.ValidationError(e)
+            inst.clean()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
         return data
 
     def create(self, validated_data):
         request = self.context.get('request')
         if request and request.user and request.user.is_authenticated:
             validated_data['creado_por'] = request.user
-        instance = super().create(validated_data)
+        # en PostgreSQL el solapamiento se detecta al guardar (restricción de exclusión)
+        try:
+            with solape_como_validacion():
+                return super().create(validated_data)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
+
+    def update(self, instance, validated_data):
+        for campo, valor in validated_data.items():
+            setattr(instance, campo, valor)
+        try:
+            with solape_como_validacion():
+                # solo los campos recibidos: una instancia leída antes de un cambio de reglas
+                # no debe devolver `version` a su valor anterior
+                instance.save(update_fields=list(validated_data))
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
         return instance
 
 # --- PrecioArticulo CRUD ---
-class PrecioArticuloSerializer(serializers.ModelSerializer):
-    lista = ListaPrecioSerializer(read_only=True)
-    lista_id = serializers.PrimaryKeyRelatedField(queryset=ListaPrecio.objects.all(), source='lista', write_only=True)
-    articulo = ArticuloSerializer(read_only=True)
-    articulo_id = serializers.PrimaryKeyRelatedField(queryset=Articulo.objects.all(), source='articulo', write_only=True)
+class PrecioArticuloSerializer(ExpandibleMixin, serializers.ModelSerializer):
+    lista_id = serializers.PrimaryKeyRelatedField(queryset=ListaPrecio.objects.all(), source='lista')
+    articulo_id = serializers.PrimaryKeyRelatedField(queryset=Articulo.objects.all(), source='articulo')
+    expandibles = {
+        'lista': (ListaPrecioSerializer, 'lista'),
+        'articulo': (ArticuloSerializer, 'articulo'),
+    }
 
     class Meta:
         model = PrecioArticulo
         fields = ['id', 'lista', 'lista_id', 'articulo', 'articulo_id',
-                  'precio_base', 'autorizado_bajo_costo', 'motivo_bajo_costo', 'actualizado_en']
+                  'precio_base', 'autorizado_bajo_costo', 'motivo_bajo_costo', 'pendiente_autorizacion',
+                  'actualizado_en']
+        read_only_fields = ['pendiente_autorizacion']
 
     def validate(self, data):
         # validación ligera y delegar la validación de negocio a full_clean
@@ -121,9 +314,9 @@ class PrecioArticuloSerializer(serializers.ModelSerializer):
         return data
 
 # --- ReglaPrecio CRUD ---
-class ReglaPrecioSerializer(serializers.ModelSerializer):
-    lista = ListaPrecioSerializer(read_only=True)
-    lista_id = serializers.PrimaryKeyRelatedField(queryset=ListaPrecio.objects.all(), source='lista', write_only=True)
+class ReglaPrecioSerializer(ExpandibleMixin, serializers.ModelSerializer):
+    lista_id = serializers.PrimaryKeyRelatedField(queryset=ListaPrecio.objects.all(), source='lista')
+    expandibles = {'lista': (ListaPrecioSerializer, 'lista')}
 
     class Meta:
         model = ReglaPrecio
@@ -138,20 +331,23 @@ class ReglaPrecioSerializer(serializers.ModelSerializer):
         return data
 
 # --- CombinacionProducto CRUD ---
-class CombinacionProductoSerializer(serializers.ModelSerializer):
-    lista = ListaPrecioSerializer(read_only=True)
-    lista_id = serializers.PrimaryKeyRelatedField(queryset=ListaPrecio.objects.all(), source='lista', write_only=True)
+class CombinacionProductoSerializer(ExpandibleMixin, serializers.ModelSerializer):
+    lista_id = serializers.PrimaryKeyRelatedField(queryset=ListaPrecio.objects.all(), source='lista')
+    expandibles = {'lista': (ListaPrecioSerializer, 'lista')}
     articulos = serializers.PrimaryKeyRelatedField(queryset=Articulo.objects.all(), many=True)
 
     class Meta:
         model = CombinacionProducto
-        fields = ['id', 'lista', 'lista_id', 'nombre', 'articulos', 'porcentaje_descuento', 'minimo_por_articulo', 'tipo_aplicacion', 'activo']
+        fields = ['id', 'lista', 'lista_id', 'nombre', 'articulos', 'porcentaje_descuento', 'precio_fijo', 'minimo_por_articulo', 'tipo_aplicacion', 'activo']
 
     def validate(self, data):
         articulos = data.get('articulos') or []
         # si es creación: articulos viene en validated_data
         if not self.instance and len(articulos) < 2:
             raise serializers.ValidationError('La combinación debe contener al menos 2 artículos.')
+        tipo = data.get('tipo_aplicacion', getattr(self.instance, 'tipo_aplicacion', None))
+        if tipo == 'precio_fijo' and data.get('precio_fijo', getattr(self.instance, 'precio_fijo', None)) is None:
+            raise serializers.ValidationError({'precio_fijo': 'Indique el precio fijo por artículo.'})
 
         # si es actualización y articulos no está en data, no hacemos la comprobación aquí
         return data
@@ -1,16 +1,31 @@
 # listas/services.py
-from decimal import Decimal, ROUND_HALF_UP, getcontext
+import asyncio
+from asgiref.sync import sync_to_async
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
 from django.db import transaction
 from django.db.models import Q, Sum
 from django.utils import timezone
 from .models import (
     Empresa, Sucursal, Articulo, ListaPrecio, PrecioArticulo,
-    ReglaPrecio, CombinacionProducto
+    ReglaPrecio, CombinacionProducto, PrecioFinalMaterializado
 )
+from .reglas import obtener_reglas, aobtener_reglas
+from .cache import CacheLRU
+from .aritmetica import a_centavos, a_decimal, descuento, minimo_permitido
+from .metricas import medir
+from .historial import HistorialService
 
-getcontext().prec = 28
 CENTS = Decimal('0.01')
 
+# (empresa_id, sucursal_id, canal, fecha) -> ListaPrecio | None. Un acierto no consulta la BD:
+# este proceso descarta las entradas al guardar una lista o cambiar su versión (signals.py); los
+# cambios hechos por otros procesos se ven al caducar la entrada (PRECIOS_CACHE_LISTAS_SEGUNDOS).
+_listas_vigentes = CacheLRU(
+    getattr(settings, 'PRECIOS_CACHE_LISTAS_TAMANO', 1024),
+    segundos=getattr(settings, 'PRECIOS_CACHE_LISTAS_SEGUNDOS', 30),
+)
+
 
 class PrecioService:
     """
@@ -28,23 +43,68 @@ class PrecioService:
         if fecha is None:
             fecha = timezone.now().date()
 
-        qs = ListaPrecio.objects.filter(
+        clave = (getattr(empresa, 'pk', empresa), getattr(sucursal, 'pk', sucursal), canal or None, fecha)
+        lista = _listas_vigentes.obtener(clave, default=False)
+        if lista is not False:
+            return lista
+
+        candidatas = list(ListaPrecio.objects.filter(
             empresa=empresa,
             sucursal=sucursal,
             estado='vigente',
-            fecha_inicio__lte=fecha,
-            fecha_fin__gte=fecha
-        )
+        ).vigentes_en(fecha).order_by('-fecha_inicio'))
 
+        lista = PrecioService._elegir_lista(candidatas, canal)
+        _listas_vigentes.guardar(clave, lista)
+        return lista
+
+    @staticmethod
+    def _elegir_lista(candidatas, canal):
+        """Prefiere la lista del canal pedido; si no hay, la de inicio más reciente."""
+        lista = None
         if canal:
-            qs_canal = qs.filter(canal=canal)
-            if qs_canal.exists():
-                return qs_canal.order_by('-fecha_inicio').first()
+            lista = next((lp for lp in candidatas if lp.canal == canal), None)
+        if lista is None and candidatas:
+            lista = candidatas[0]
+        return lista
+
+    @staticmethod
+    async def aobtener_lista_vigente(empresa_id, sucursal_id, canal=None, fecha=None):
+        """Versión async de obtener_lista_vigente; comparte su caché."""
+        if fecha is None:
+            fecha = timezone.now().date()
+
+        clave = (empresa_id, sucursal_id, canal or None, fecha)
+        lista = _listas_vigentes.obtener(clave, default=False)
+        if lista is not False:
+            return lista
+
+        candidatas = [lp async for lp in ListaPrecio.objects.filter(
+            empresa_id=empresa_id,
+            sucursal_id=sucursal_id,
+            estado='vigente',
+        ).vigentes_en(fecha).order_by('-fecha_inicio')]
+
+        lista = PrecioService._elegir_lista(candidatas, canal)
+        _listas_vigentes.guardar(clave, lista)
+        return lista
 
-        if qs.exists():
-            return qs.order_by('-fecha_inicio').first()
+    @staticmethod
+    def invalidar_listas_vigentes(lista_ids=None):
+        """
+        Descarta resoluciones en caché de este proceso (todas, o las que devolvieron alguna de
+        lista_ids); en los demás procesos las corrige la caducidad.
+        """
+        if lista_ids is None:
+            _listas_vigentes.limpiar()
+        else:
+            lista_ids = set(lista_ids)
+            _listas_vigentes.descartar_si(lambda clave, lista: lista is not None and lista.pk in lista_ids)
 
-        return None
+    @staticmethod
+    def info_cache_listas():
+        """Aciertos, fallos y tamaño de la caché de listas vigentes."""
+        return _listas_vigentes.info()
 
     @staticmethod
     def calcular_precio(empresa, sucursal, articulo, canal=None,
@@ -53,21 +113,8 @@ class PrecioService:
         """Calcula el precio de un artículo aplicando reglas."""
         if fecha is None:
             fecha = timezone.now().date()
-        if monto_pedido is None:
-            monto_pedido = Decimal('0.00')
-        else:
-            monto_pedido = Decimal(monto_pedido)
 
-        result = {
-            'precio_base': None,
-            'precio_final': None,
-            'lista_usada': None,
-            'reglas_aplicadas': [],
-            'autorizado_bajo_costo': False,
-            'razon_bajo_costo': None,
-            'descuento_total': Decimal('0.00'),
-            'combinacion_aplicada': None,
-        }
+        result = PrecioService._resultado_vacio()
 
         lista = PrecioService.obtener_lista_vigente(empresa, sucursal, canal, fecha)
         if not lista:
@@ -76,68 +123,235 @@ class PrecioService:
 
         result['lista_usada'] = {'id': lista.id, 'nombre': lista.nombre, 'canal': lista.canal}
 
+        if fecha < timezone.now().date():
+            # fecha pasada: precio y costo salen del historial, no de los valores actuales
+            precio_articulo = HistorialService.precio_en(lista, articulo, fecha)
+            if precio_articulo is None:
+                result['razon_bajo_costo'] = 'Artículo no tiene precio en la lista'
+                return result
+            return PrecioService._evaluar(
+                result, lista, precio_articulo, HistorialService.articulo_en(articulo, fecha), canal,
+                cantidad, monto_pedido, carrito_articulos
+            )
+
+        reglas = obtener_reglas(lista)
+        if reglas.independiente_del_contexto(cantidad, monto_pedido, carrito_articulos):
+            try:
+                fila = PrecioFinalMaterializado.objects.get(
+                    lista=lista, articulo=articulo, canal=reglas.clave_canal(canal)
+                )
+                return PrecioMaterializadoService.como_resultado(fila, result)
+            except PrecioFinalMaterializado.DoesNotExist:
+                pass
+
         try:
             precio_articulo = PrecioArticulo.objects.get(lista=lista, articulo=articulo)
         except PrecioArticulo.DoesNotExist:
             result['razon_bajo_costo'] = 'Artículo no tiene precio en la lista'
             return result
 
-        precio_base = Decimal(precio_articulo.precio_base)
-        precio_base = PrecioService._quantize(precio_base)
-        result['precio_base'] = precio_base
+        return PrecioService._evaluar(
+            result, lista, precio_articulo, articulo, canal,
+            cantidad, monto_pedido, carrito_articulos
+        )
+
+    @staticmethod
+    async def acalcular_precio(empresa_id, sucursal_id, articulo_id, canal=None,
+                               cantidad=1, monto_pedido=None, fecha=None,
+                               carrito_articulos=None):
+        """
+        Versión async de calcular_precio que recibe ids. Empresa, sucursal, artículo y lista
+        vigente se buscan a la vez; lanza DoesNotExist si alguno de los tres primeros no existe.
+        """
+        if fecha is None:
+            fecha = timezone.now().date()
+
+        empresa, sucursal, articulo, lista = await asyncio.gather(
+            Empresa.objects.aget(pk=empresa_id),
+            Sucursal.objects.aget(pk=sucursal_id),
+            Articulo.objects.aget(pk=articulo_id),
+            PrecioService.aobtener_lista_vigente(empresa_id, sucursal_id, canal, fecha),
+        )
+
+        result = PrecioService._resultado_vacio()
+        if not lista:
+            result['razon_bajo_costo'] = 'No existe lista vigente'
+            return result
+
+        result['lista_usada'] = {'id': lista.id, 'nombre': lista.nombre, 'canal': lista.canal}
+
+        reglas = await aobtener_reglas(lista)
+        if fecha < timezone.now().date():
+            # fecha pasada: precio y costo salen del historial, igual que en calcular_precio
+            precio_articulo = await sync_to_async(HistorialService.precio_en)(lista, articulo, fecha)
+            if precio_articulo is None:
+                result['razon_bajo_costo'] = 'Artículo no tiene precio en la lista'
+                return result
+            return PrecioService._evaluar(
+                result, lista, precio_articulo, await sync_to_async(HistorialService.articulo_en)(articulo, fecha),
+                canal, cantidad, monto_pedido, carrito_articulos, reglas=reglas
+            )
+
+        if reglas.independiente_del_contexto(cantidad, monto_pedido, carrito_articulos):
+            try:
+                fila = await PrecioFinalMaterializado.objects.aget(
+                    lista=lista, articulo=articulo, canal=reglas.clave_canal(canal)
+                )
+                return PrecioMaterializadoService.como_resultado(fila, result)
+            except PrecioFinalMaterializado.DoesNotExist:
+                pass
+
+        try:
+            precio_articulo = await PrecioArticulo.objects.aget(lista=lista, articulo=articulo)
+        except PrecioArticulo.DoesNotExist:
+            result['razon_bajo_costo'] = 'Artículo no tiene precio en la lista'
+            return result
+
+        return PrecioService._evaluar(
+            result, lista, precio_articulo, articulo, canal,
+            cantidad, monto_pedido, carrito_articulos, reglas=reglas
+        )
+
+    @staticmethod
+    @medir('calcular_precios_lote')
+    def calcular_precios_lote(empresa, sucursal, lineas, canal=None,
+                              monto_pedido=None, fecha=None):
+        """
+        Calcula el precio de todas las líneas de un carrito con un número fijo de consultas.
+        `lineas` es una lista de dicts con 'articulo_id' y 'cantidad'; el carrito completo
+        se usa para las combinaciones. Si no se indica monto_pedido se toma el monto
+        base del carrito.
+        """
+        if fecha is None:
+            fecha = timezone.now().date()
+
+        resultado = {'lista_usada': None, 'lineas': [], 'totales': None}
+        lista = PrecioService.obtener_lista_vigente(empresa, sucursal, canal, fecha)
+
+        precios = {}
+        if lista:
+            resultado['lista_usada'] = {'id': lista.id, 'nombre': lista.nombre, 'canal': lista.canal}
+            ids = {int(li['articulo_id']) for li in lineas}
+            if fecha < timezone.now().date():
+                precios = HistorialService.precios_en(lista, ids, fecha)
+                costos = HistorialService.costos_en(ids, fecha)
+                for articulo in Articulo.objects.filter(pk__in=list(precios)):
+                    articulo.ultimo_costo = costos.get(articulo.pk, articulo.ultimo_costo)
+                    precios[articulo.pk].articulo = articulo
+            else:
+                precios = {
+                    pa.articulo_id: pa
+                    for pa in PrecioArticulo.objects.filter(lista=lista, articulo_id__in=ids).select_related('articulo')
+                }
+
+        if monto_pedido is None:
+            monto_pedido = sum(
+                (precios[int(li['articulo_id'])].precio_base * int(li.get('cantidad', 1))
+                 for li in lineas if int(li['articulo_id']) in precios),
+                Decimal('0.00')
+            )
+
+        total_bruto = Decimal('0.00')
+        total_descuento = Decimal('0.00')
+        total = Decimal('0.00')
+        for li in lineas:
+            articulo_id = int(li['articulo_id'])
+            cantidad = int(li.get('cantidad', 1))
+            res = PrecioService._resultado_vacio()
+            res['lista_usada'] = resultado['lista_usada']
+            precio_articulo = precios.get(articulo_id)
+            if not lista:
+                res['razon_bajo_costo'] = 'No existe lista vigente'
+            elif precio_articulo is None:
+                res['razon_bajo_costo'] = 'Artículo no tiene precio en la lista'
+            else:
+                res = PrecioService._evaluar(
+                    res, lista, precio_articulo, precio_articulo.articulo, canal,
+                    cantidad, monto_pedido, lineas
+                )
+            res['articulo_id'] = articulo_id
+            res['cantidad'] = cantidad
+            res['subtotal'] = None
+            if res['precio_final'] is not None:
+                res['subtotal'] = PrecioService._quantize(res['precio_final'] * cantidad)
+                total_bruto += res['precio_base'] * cantidad
+                total_descuento += res['descuento_total'] * cantidad
+                total += res['subtotal']
+            resultado['lineas'].append(res)
+
+        resultado['totales'] = {
+            'total_bruto': PrecioService._quantize(total_bruto),
+            'descuento_total': PrecioService._quantize(total_descuento),
+            'total': PrecioService._quantize(total),
+        }
+        return resultado
+
+    @staticmethod
+    def _resultado_vacio():
+        return {
+            'precio_base': None,
+            'precio_final': None,
+            'lista_usada': None,
+            'reglas_aplicadas': [],
+            'autorizado_bajo_costo': False,
+            'razon_bajo_costo': None,
+            'descuento_total': Decimal('0.00'),
+            'combinacion_aplicada': None,
+        }
+
+    @staticmethod
+    def _evaluar(result, lista, precio_articulo, articulo, canal,
+                 cantidad, monto_pedido, carrito_articulos, reglas=None):
+        """Aplica reglas y control de costo sobre un PrecioArticulo ya cargado (no consulta la BD si recibe reglas)."""
+        if monto_pedido is None:
+            monto_pedido = Decimal('0.00')
+        else:
+            monto_pedido = Decimal(monto_pedido)
+
+        precio_base = a_centavos(precio_articulo.precio_base)
+        costo = a_centavos(articulo.ultimo_costo)
+        result['precio_base'] = a_decimal(precio_base)
 
+        if reglas is None:
+            reglas = obtener_reglas(lista)
         try:
-            PrecioService.validar_costo(precio_articulo, articulo)
+            PrecioService.validar_costo(precio_articulo, articulo, reglas=reglas)
         except ValueError as e:
             result['autorizado_bajo_costo'] = False
             result['razon_bajo_costo'] = str(e)
 
-        reglas_aplicadas = PrecioService.aplicar_reglas(
-            lista=lista,
-            articulo=articulo,
-            canal=canal,
-            cantidad=cantidad,
-            monto_pedido=monto_pedido,
-            carrito_articulos=carrito_articulos
+        aplicables = PrecioService._reglas_aplicables(
+            reglas, articulo, canal, cantidad, monto_pedido, carrito_articulos
         )
-        result['reglas_aplicadas'] = reglas_aplicadas
+        result['reglas_aplicadas'] = [origen.como_dict(regla) for origen, regla in aplicables]
 
         precio = precio_base
-        detalle_descuento_total = Decimal('0.00')
-        precio_fijo_aplicado = False
-
-        for r in reglas_aplicadas:
-            if r.get('tipo') == 'combinacion' and r.get('accion') == 'precio_fijo':
-                try:
-                    precio = Decimal(r.get('valor'))
-                    precio = PrecioService._quantize(precio)
-                    result['combinacion_aplicada'] = r.get('combo_id') or r.get('regla_id')
-                    precio_fijo_aplicado = True
-                    break
-                except Exception:
-                    precio_fijo_aplicado = False
-
-        if not precio_fijo_aplicado:
-            for r in reglas_aplicadas:
-                pct = Decimal(r.get('porcentaje_descuento', '0')) / Decimal('100')
-                if pct == 0:
+        descuento_total = 0
+
+        fijo = next((origen for origen, _ in aplicables if origen.tipo == 'combinacion'
+                     and origen.precio_fijo_centavos is not None), None)
+        if fijo is not None:
+            precio = fijo.precio_fijo_centavos
+            result['combinacion_aplicada'] = fijo.id
+        else:
+            for origen, _ in aplicables:
+                if origen.puntos_base == 0:
                     continue
-                descuento = (precio * pct).quantize(CENTS, rounding=ROUND_HALF_UP)
-                precio = (precio - descuento).quantize(CENTS, rounding=ROUND_HALF_UP)
-                detalle_descuento_total += descuento
-                if r.get('tipo') == 'combinacion' and r.get('combo_id'):
-                    result['combinacion_aplicada'] = r.get('combo_id')
+                monto_descuento = descuento(precio, origen.puntos_base)
+                precio -= monto_descuento
+                descuento_total += monto_descuento
+                if origen.tipo == 'combinacion':
+                    result['combinacion_aplicada'] = origen.id
 
-        result['precio_final'] = PrecioService._quantize(precio)
-        result['descuento_total'] = PrecioService._quantize(detalle_descuento_total)
+        result['precio_final'] = a_decimal(precio)
+        result['descuento_total'] = a_decimal(descuento_total)
 
-        if result['precio_final'] < Decimal(articulo.ultimo_costo):
+        if precio < costo:
             result['autorizado_bajo_costo'] = bool(precio_articulo.autorizado_bajo_costo)
             if result['autorizado_bajo_costo']:
                 result['razon_bajo_costo'] = precio_articulo.motivo_bajo_costo or "Autorizado manualmente (bajo costo)"
             else:
-                dp_rules = ReglaPrecio.objects.filter(lista=lista, tipo='descuento_proveedor', activo=True)
-                if dp_rules.exists():
+                if reglas.de_tipo('descuento_proveedor', articulo):
                     result['razon_bajo_costo'] = 'Bajo costo sin autorización explícita; existe regla de reconocimiento de proveedor'
                 else:
                     result['razon_bajo_costo'] = 'Precio final inferior al último costo y no autorizado (bajo costo)'
@@ -147,76 +361,41 @@ class PrecioService:
     @staticmethod
     def aplicar_reglas(lista, articulo, canal, cantidad, monto_pedido, carrito_articulos=None):
         """Evalúa las reglas activas de la lista en orden de prioridad."""
+        aplicables = PrecioService._reglas_aplicables(
+            obtener_reglas(lista), articulo, canal, cantidad, monto_pedido, carrito_articulos
+        )
+        return [origen.como_dict(regla) for origen, regla in aplicables]
+
+    @staticmethod
+    def _reglas_aplicables(reglas, articulo, canal, cantidad, monto_pedido, carrito_articulos=None):
+        """
+        Pares (origen, regla) que aplican, en orden de prioridad: origen es la ReglaCompilada
+        o, para reglas de combinación, el ComboCompilado que cumplió el carrito.
+        """
         aplicado = []
-        reglas = ReglaPrecio.objects.filter(lista=lista, activo=True).order_by('prioridad')
-
-        for regla in reglas:
-            aplica = False
-
-            if regla.tipo == 'canal':
-                if regla.canal and canal and regla.canal == canal:
-                    aplica = True
-
-            elif regla.tipo == 'escala_unidades':
-                if regla.min_unidades and regla.max_unidades:
-                    if regla.min_unidades <= cantidad <= regla.max_unidades:
-                        aplica = True
-                elif regla.min_unidades and cantidad >= regla.min_unidades:
-                    aplica = True
-
-            elif regla.tipo == 'escala_monto':
-                if regla.min_monto and regla.max_monto:
-                    if regla.min_monto <= monto_pedido <= regla.max_monto:
-                        aplica = True
-                elif regla.min_monto and monto_pedido >= regla.min_monto:
-                    aplica = True
-
-            elif regla.tipo == 'monto_pedido':
-                if regla.min_monto and monto_pedido >= regla.min_monto:
-                    aplica = True
-
-            elif regla.tipo == 'combinacion':
-                combos = CombinacionProducto.objects.filter(lista=lista, activo=True)
-                for combo in combos:
-                    articulos_combo = list(combo.articulos.values_list('id', flat=True))
-                    if articulo.id not in articulos_combo:
-                        continue
-                    if carrito_articulos:
-                        carrito_ids = [int(a.get('articulo_id')) for a in carrito_articulos]
-                        if all(aid in carrito_ids for aid in articulos_combo):
-                            aplica = True
-                            aplicado.append({
-                                'regla_id': regla.id,
-                                'tipo': 'combinacion',
-                                'descripcion': f'Combinación #{combo.id} - {combo.nombre or "sin nombre"}',
-                                'porcentaje_descuento': str(combo.descuento_pct or '0'),
-                                'accion': 'precio_fijo' if combo.precio_fijo else 'descuento_pct',
-                                'valor': str(combo.precio_fijo or combo.descuento_pct or '0'),
-                                'combo_id': combo.id
-                            })
-                            break
-
-            elif regla.tipo == 'descuento_proveedor':
-                aplica = True
-
-            if aplica and regla.tipo != 'combinacion':
-                aplicado.append({
-                    'regla_id': regla.id,
-                    'tipo': regla.tipo,
-                    'descripcion': f'Regla {regla.tipo} prio {regla.prioridad}',
-                    'porcentaje_descuento': str(regla.porcentaje_descuento or '0'),
-                    'accion': 'descuento_pct',
-                    'valor': str(regla.porcentaje_descuento or '0'),
-                    'combo_id': None
-                })
+        carrito_ids = None
+
+        for regla in reglas.candidatas(articulo):
+            if regla.tipo == 'combinacion':
+                if not carrito_articulos:
+                    continue
+                if carrito_ids is None:
+                    carrito_ids = {int(a.get('articulo_id')) for a in carrito_articulos}
+                for combo in reglas.combos_de(articulo.id):
+                    if combo.articulos <= carrito_ids:
+                        aplicado.append((combo, regla))
+                        break
+
+            elif regla.aplica(canal, cantidad, monto_pedido):
+                aplicado.append((regla, regla))
 
         return aplicado
 
     @staticmethod
-    def validar_costo(precio_articulo, articulo):
+    def validar_costo(precio_articulo, articulo, reglas=None):
         """Valida que el precio_base no sea inferior al costo salvo reglas."""
-        precio = Decimal(precio_articulo.precio_base)
-        costo = Decimal(articulo.ultimo_costo)
+        precio = a_centavos(precio_articulo.precio_base)
+        costo = a_centavos(articulo.ultimo_costo)
 
         if precio >= costo:
             return True
@@ -224,12 +403,12 @@ class PrecioService:
         if precio_articulo.autorizado_bajo_costo:
             return True
 
-        reglas_dp = ReglaPrecio.objects.filter(lista=precio_articulo.lista, tipo='descuento_proveedor', activo=True)
-        if reglas_dp.exists():
+        if reglas is None:
+            reglas = obtener_reglas(precio_articulo.lista)
+        reglas_dp = reglas.de_tipo('descuento_proveedor', articulo)
+        if reglas_dp:
             for r in reglas_dp:
-                pct = (Decimal(r.porcentaje_descuento) / Decimal('100')) if r.porcentaje_descuento else Decimal('0')
-                precio_min_permitido = (costo * (Decimal('1') - pct)).quantize(CENTS, rounding=ROUND_HALF_UP)
-                if precio >= precio_min_permitido:
+                if precio >= minimo_permitido(costo, r.puntos_base):
                     return True
             raise ValueError('Precio por debajo del último costo (bajo costo) sin reconocimiento suficiente del proveedor.')
         raise ValueError('Precio por debajo del último costo (bajo costo) y no autorizado.')
@@ -249,10 +428,126 @@ class PrecioService:
             regla.save()
 
         precio_articulo.autorizado_bajo_costo = True
+        precio_articulo.pendiente_autorizacion = False
         precio_articulo.motivo_bajo_costo = (
             f"Autorizado por reconocimiento proveedor {porcentaje_reconocido}% "
             f"por {getattr(autorizado_por, 'username', str(autorizado_por))}"
         )
-        precio_articulo.save(update_fields=['autorizado_bajo_costo', 'motivo_bajo_costo', 'actualizado_en'])
+        precio_articulo.save(update_fields=['autorizado_bajo_costo', 'pendiente_autorizacion',
+                                            'motivo_bajo_costo', 'actualizado_en'])
 
         return precio_articulo
+
+
+
+class PrecioMaterializadoService:
+    """
+    Mantiene PrecioFinalMaterializado: el resultado de calcular_precio sin carrito,
+    con cantidad=1 y monto_pedido=0, para cada canal que distingan las reglas de la lista.
+    """
+
+    TAMANO_LOTE = 2000
+
+    @staticmethod
+    def como_resultado(fila, result):
+        result.update({
+            'precio_base': fila.precio_base,
+            'precio_final': fila.precio_final,
+            'descuento_total': fila.descuento_total,
+            'reglas_aplicadas': fila.reglas_aplicadas,
+            'autorizado_bajo_costo': fila.autorizado_bajo_costo,
+            'razon_bajo_costo': fila.razon_bajo_costo,
+        })
+        return result
+
+    CAMPOS_MATERIALIZADOS = [
+        'precio_base', 'precio_final', 'descuento_total', 'autorizado_bajo_costo',
+        'razon_bajo_costo', 'reglas_aplicadas', 'actualizado_en',
+    ]
+
+    @staticmethod
+    def _escribir(filas):
+        """Upsert por (lista, articulo, canal): dos refrescos simultáneos no chocan en la clave única."""
+        PrecioFinalMaterializado.objects.bulk_create(
+            filas, update_conflicts=True, unique_fields=['lista', 'articulo', 'canal'],
+            update_fields=PrecioMaterializadoService.CAMPOS_MATERIALIZADOS,
+        )
+        return len(filas)
+
+    @staticmethod
+    @transaction.atomic
+    def refrescar(lista_id, articulo_ids=None):
+        """Recalcula las filas de la lista (o solo de articulo_ids). Devuelve cuántas escribió."""
+        lista = ListaPrecio.objects.filter(pk=lista_id).first()
+        if lista is None:
+            return 0
+        reglas = obtener_reglas(lista)
+        canales = [''] + sorted(reglas.canales)
+
+        existentes = PrecioFinalMaterializado.objects.filter(lista=lista)
+        precios = PrecioArticulo.objects.filter(lista=lista).select_related('articulo')
+        if articulo_ids is not None:
+            existentes = existentes.filter(articulo_id__in=articulo_ids)
+            precios = precios.filter(articulo_id__in=articulo_ids)
+
+        filas = []
+        escritas = 0
+        for precio_articulo in precios.iterator(chunk_size=PrecioMaterializadoService.TAMANO_LOTE):
+            for canal in canales:
+                res = PrecioService._evaluar(
+                    PrecioService._resultado_vacio(), lista, precio_articulo,
+                    precio_articulo.articulo, canal or None, 1, None, None
+                )
+                filas.append(PrecioFinalMaterializado(
+                    lista=lista,
+                    articulo_id=precio_articulo.articulo_id,
+                    canal=canal,
+                    precio_base=res['precio_base'],
+                    precio_final=res['precio_final'],
+                    descuento_total=res['descuento_total'],
+                    autorizado_bajo_costo=res['autorizado_bajo_costo'],
+                    razon_bajo_costo=res['razon_bajo_costo'],
+                    reglas_aplicadas=res['reglas_aplicadas'],
+                ))
+            if len(filas) >= PrecioMaterializadoService.TAMANO_LOTE:
+                escritas += PrecioMaterializadoService._escribir(filas)
+                filas = []
+        if filas:
+            escritas += PrecioMaterializadoService._escribir(filas)
+        # sobran las filas de artículos que ya no tienen precio y las de canales sin regla propia
+        existentes.exclude(
+            canal__in=canales, articulo_id__in=PrecioArticulo.objects.filter(lista=lista).values('articulo_id')
+        ).delete()
+        return escritas
+
+    @staticmethod
+    def refrescar_alcance(lista_id, alcances):
+        """
+        Recalcula solo los artículos que alcanza alguna regla: `alcances` son dicts con
+        tipo, articulo_id, grupo_id y linea_id (p.ej. la regla antes y después de editarla).
+        Una regla de toda la lista o de canal (cambia las filas por canal) recalcula la lista entera.
+        """
+        filtro = Q(pk__in=[])
+        for alcance in alcances:
+            # mismos filtros que ReglaCompilada.alcanza: el artículo debe cumplirlos todos
+            campos = {
+                campo: alcance[clave]
+                for clave, campo in (('articulo_id', 'pk'), ('grupo_id', 'grupo_id'), ('linea_id', 'linea_id'))
+                if alcance.get(clave)
+            }
+            if not campos or alcance.get('tipo') == 'canal':
+                return PrecioMaterializadoService.refrescar(lista_id)
+            filtro |= Q(**campos)
+        return PrecioMaterializadoService.refrescar(lista_id, Articulo.objects.filter(filtro).values('pk'))
+
+    @staticmethod
+    def refrescar_articulos(articulo_ids):
+        """Recalcula las filas de los artículos en todas las listas donde tienen precio."""
+        articulo_ids = list(articulo_ids)
+        por_lista = {}
+        for lista_id, articulo_id in PrecioArticulo.objects.filter(
+            articulo_id__in=articulo_ids
+        ).values_list('lista_id', 'articulo_id'):
+            por_lista.setdefault(lista_id, []).append(articulo_id)
+        for lista_id, ids in por_lista.items():
+            PrecioMaterializadoService.refrescar(lista_id, ids)
@@ -0,0 +1,248 @@
+# listas/signals.py
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver, Signal
+from .models import (
+    Empresa, Sucursal, Articulo, ListaPrecio, PrecioArticulo, ReglaPrecio, CombinacionProducto,
+    PrecioFinalMaterializado, Orden, LineaArticulo, GrupoArticulo
+)
+from . import contadores, versiones
+from .historial import HistorialService
+from .bajo_costo import DeteccionBajoCostoService
+from .reglas import invalidar_reglas
+from .replicas import marcar_escritura
+from .services import PrecioService, PrecioMaterializadoService
+
+# Se envía con articulo_ids cuando cambia Articulo.ultimo_costo (uno a uno o en bloque)
+costo_actualizado = Signal()
+
+
+def incrementar_version(lista_ids):
+    """Avanza la versión de las listas para que las reglas compiladas se reconstruyan."""
+    lista_ids = set(lista_ids)
+    if not lista_ids:
+        return
+    ListaPrecio.objects.filter(pk__in=lista_ids).update(version=F('version') + 1)
+    # las instancias en caché llevan la versión anterior
+    PrecioService.invalidar_listas_vigentes(lista_ids)
+    for lista_id in lista_ids:
+        invalidar_reglas(lista_id)
+
+
+@receiver(post_save, sender=ListaPrecio)
+@receiver(post_delete, sender=ListaPrecio)
+def lista_cambiada(sender, instance, **kwargs):
+    # cambiar fechas, estado, canal o empresa/sucursal puede alterar cualquier resolución
+    PrecioService.invalidar_listas_vigentes()
+    # alta (el pk puede reutilizarse) o baja: descartar reglas compiladas
+    if kwargs.get('created', True):
+        invalidar_reglas(instance.pk)
+
+
+@receiver(post_save, sender=ReglaPrecio)
+@receiver(post_delete, sender=ReglaPrecio)
+@receiver(post_save, sender=CombinacionProducto)
+@receiver(post_delete, sender=CombinacionProducto)
+def reglas_cambiadas(sender, instance, **kwargs):
+    incrementar_version([instance.lista_id])
+
+
+@receiver(m2m_changed, sender=CombinacionProducto.articulos.through)
+def articulos_combinacion_cambiados(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            incrementar_version([instance.lista_id])
+    elif action in ('post_add', 'post_remove'):
+        incrementar_version(
+            CombinacionProducto.objects.filter(pk__in=pk_set).values_list('lista_id', flat=True)
+        )
+    elif action == 'pre_clear':
+        # articulo.combinaciones.clear(): después ya no sabríamos qué listas cambiaron
+        incrementar_version(instance.combinaciones.values_list('lista_id', flat=True))
+
+
+CAMPOS_ALCANCE = ('tipo', 'articulo_id', 'grupo_id', 'linea_id')
+
+
+@receiver(pre_save, sender=ReglaPrecio)
+def recordar_alcance_regla(sender, instance, raw=False, **kwargs):
+    """Alcance previo de la regla: al cambiarlo hay que recalcular también los artículos que deja."""
+    instance._alcance_previo = None
+    if not raw and not instance._state.adding and instance.pk:
+        instance._alcance_previo = ReglaPrecio.objects.filter(pk=instance.pk).values(*CAMPOS_ALCANCE).first()
+
+
+@receiver(post_save, sender=ReglaPrecio)
+@receiver(post_delete, sender=ReglaPrecio)
+def rematerializar_alcance_regla(sender, instance, **kwargs):
+    lista_id = instance.lista_id
+    alcances = [{campo: getattr(instance, campo) for campo in CAMPOS_ALCANCE}]
+    if getattr(instance, '_alcance_previo', None):
+        alcances.append(instance._alcance_previo)
+    transaction.on_commit(lambda: PrecioMaterializadoService.refrescar_alcance(lista_id, alcances))
+
+
+@receiver(post_save, sender=PrecioArticulo)
+def rematerializar_precio(sender, instance, **kwargs):
+    lista_id, articulo_id = instance.lista_id, instance.articulo_id
+    transaction.on_commit(lambda: PrecioMaterializadoService.refrescar(lista_id, [articulo_id]))
+
+
+@receiver(post_delete, sender=PrecioArticulo)
+def descartar_precio_materializado(sender, instance, **kwargs):
+    PrecioFinalMaterializado.objects.filter(lista_id=instance.lista_id, articulo_id=instance.articulo_id).delete()
+
+
+@receiver(pre_save, sender=Articulo)
+def detectar_cambio_costo(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Una lectura de los valores previos: costo y grupo/línea (alcance de las reglas)."""
+    instance._costo_cambiado = instance._alcance_cambiado = False
+    if raw or instance._state.adding or not instance.pk:
+        return
+    campos = {'ultimo_costo': 'ultimo_costo', 'grupo': 'grupo_id', 'linea': 'linea_id'}
+    if update_fields is not None:
+        campos = {nombre: c for nombre, c in campos.items() if nombre in update_fields or c in update_fields}
+    if not campos:
+        return
+    anterior = Articulo.objects.filter(pk=instance.pk).values(*campos.values()).first()
+    if anterior is None:
+        return
+    instance._costo_cambiado = 'ultimo_costo' in anterior and anterior['ultimo_costo'] != instance.ultimo_costo
+    instance._alcance_cambiado = any(
+        anterior[c] != getattr(instance, c) for c in ('grupo_id', 'linea_id') if c in anterior
+    )
+
+
+@receiver(post_save, sender=Articulo)
+def notificar_cambio_costo(sender, instance, **kwargs):
+    if getattr(instance, '_costo_cambiado', False):
+        costo_actualizado.send(sender=Articulo, articulo_ids=[instance.pk])
+    elif getattr(instance, '_alcance_cambiado', False):
+        # las reglas por grupo/línea que le aplican pueden ser otras (el cambio de costo ya rematerializa)
+        articulo_ids = [instance.pk]
+        transaction.on_commit(lambda: PrecioMaterializadoService.refrescar_articulos(articulo_ids))
+
+
+@receiver(costo_actualizado)
+def rematerializar_por_costo(sender, articulo_ids, **kwargs):
+    articulo_ids = list(articulo_ids)
+    transaction.on_commit(lambda: PrecioMaterializadoService.refrescar_articulos(articulo_ids))
+
+
+# ---------- Historial de precios y costos ----------
+@receiver(post_save, sender=PrecioArticulo)
+def registrar_historial_precio(sender, instance, raw=False, **kwargs):
+    if not raw:
+        HistorialService.registrar_precios([instance])
+
+
+@receiver(post_delete, sender=PrecioArticulo)
+def cerrar_historial_precio(sender, instance, **kwargs):
+    HistorialService.cerrar_precio(instance.lista_id, instance.articulo_id)
+
+
+@receiver(post_save, sender=Articulo)
+def registrar_costo_inicial(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        HistorialService.registrar_costos([instance.pk])
+
+
+@receiver(costo_actualizado)
+def registrar_historial_costo(sender, articulo_ids, **kwargs):
+    HistorialService.registrar_costos(articulo_ids)
+
+
+# ---------- Hallazgos de precios bajo costo ----------
+@receiver(costo_actualizado)
+def revisar_bajo_costo_por_costo(sender, articulo_ids, **kwargs):
+    DeteccionBajoCostoService.revisar(articulo_ids)
+
+
+@receiver(post_save, sender=PrecioArticulo)
+def revisar_bajo_costo_por_precio(sender, instance, raw=False, **kwargs):
+    if not raw:
+        DeteccionBajoCostoService.revisar([instance.articulo_id], lista_id=instance.lista_id)
+
+
+# ---------- Contadores del dashboard ----------
+@receiver(pre_save, sender=ListaPrecio)
+@receiver(pre_save, sender=ReglaPrecio)
+@receiver(pre_save, sender=Orden)
+def recordar_estado_contado(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Guarda los valores previos de los campos que filtran algún contador (estado, activo)."""
+    instance._valores_contados = None
+    if raw or instance._state.adding or not instance.pk:
+        return
+    campos = contadores.campos_filtrados(sender)
+    if update_fields is not None and not set(campos) & set(update_fields):
+        return
+    instance._valores_contados = sender.objects.filter(pk=instance.pk).values(*campos).first()
+
+
+@receiver(post_save, sender=Empresa)
+@receiver(post_save, sender=Sucursal)
+@receiver(post_save, sender=Articulo)
+@receiver(post_save, sender=ListaPrecio)
+@receiver(post_save, sender=PrecioArticulo)
+@receiver(post_save, sender=ReglaPrecio)
+@receiver(post_save, sender=CombinacionProducto)
+@receiver(post_save, sender=Orden)
+def contar_alta_o_cambio(sender, instance, created, **kwargs):
+    filtros = contadores.contadores_de(sender)
+    actuales = {campo: getattr(instance, campo) for campo in contadores.campos_filtrados(sender)}
+    if created:
+        contadores.ajustar({clave: 1 for clave, filtro in filtros.items() if contadores.cumple(actuales, filtro)})
+        return
+    previos = getattr(instance, '_valores_contados', None)
+    if previos is None:
+        return
+    contadores.ajustar({
+        clave: int(contadores.cumple(actuales, filtro)) - int(contadores.cumple(previos, filtro))
+        for clave, filtro in filtros.items() if filtro
+    })
+
+
+@receiver(post_delete, sender=Empresa)
+@receiver(post_delete, sender=Sucursal)
+@receiver(post_delete, sender=Articulo)
+@receiver(post_delete, sender=ListaPrecio)
+@receiver(post_delete, sender=PrecioArticulo)
+@receiver(post_delete, sender=ReglaPrecio)
+@receiver(post_delete, sender=CombinacionProducto)
+@receiver(post_delete, sender=Orden)
+def contar_baja(sender, instance, **kwargs):
+    actuales = {campo: getattr(instance, campo) for campo in contadores.campos_filtrados(sender)}
+    contadores.ajustar({
+        clave: -1 for clave, filtro in contadores.contadores_de(sender).items()
+        if contadores.cumple(actuales, filtro)
+    })
+
+
+# ---------- Versiones de recursos de la API (ETag / Last-Modified) ----------
+@receiver(post_save, sender=Empresa)
+@receiver(post_save, sender=Sucursal)
+@receiver(post_save, sender=Articulo)
+@receiver(post_save, sender=LineaArticulo)
+@receiver(post_save, sender=GrupoArticulo)
+@receiver(post_save, sender=ListaPrecio)
+@receiver(post_save, sender=PrecioArticulo)
+@receiver(post_delete, sender=Empresa)
+@receiver(post_delete, sender=Sucursal)
+@receiver(post_delete, sender=Articulo)
+@receiver(post_delete, sender=LineaArticulo)
+@receiver(post_delete, sender=GrupoArticulo)
+@receiver(post_delete, sender=ListaPrecio)
+@receiver(post_delete, sender=PrecioArticulo)
+def incrementar_version_recurso(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versiones.incrementar(versiones.recursos_de(instance))
+
+
+# ---------- Réplicas: la petición que escribe lee después de la primaria ----------
+@receiver(post_save)
+@receiver(post_delete)
+@receiver(m2m_changed)
+def escritura_en_peticion(sender, raw=False, **kwargs):
+    if not raw and kwargs.get('action', 'post_').startswith('post_'):
+        marcar_escritura()
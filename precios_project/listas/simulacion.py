@@ -0,0 +1,119 @@
+# listas/simulacion.py
+from decimal import Decimal
+import numpy as np
+from .models import PrecioArticulo, ReglaPrecio
+from .reglas import ReglaCompilada
+from .aritmetica import PUNTOS_BASE, a_decimal
+
+
+def _redondear_division(numerador, divisor):
+    """Versión vectorizada de aritmetica.dividir_redondeando."""
+    signo = np.sign(numerador)
+    return signo * ((np.abs(numerador) + divisor // 2) // divisor)
+
+
+def _centavos_a_texto(centavos):
+    return np.char.mod('%.2f', centavos / 100).tolist()
+
+
+class SimulacionService:
+    """
+    Evalúa una lista completa de una sola vez con arreglos NumPy: precios y costos en
+    centavos (int64) y descuentos en puntos básicos, aplicando las reglas en orden de
+    prioridad con el mismo redondeo por paso que PrecioService.calcular_precio.
+    Las combinaciones no se simulan (dependen de un carrito).
+    """
+
+    @staticmethod
+    def _cargar(lista):
+        filas = list(PrecioArticulo.objects.filter(lista=lista).values_list(
+            'articulo_id', 'precio_base', 'autorizado_bajo_costo',
+            'articulo__ultimo_costo', 'articulo__grupo_id', 'articulo__linea_id',
+        ))
+        n = len(filas)
+        columnas = list(zip(*filas)) if filas else [()] * 6
+        return {
+            'articulo_id': np.fromiter(columnas[0], dtype=np.int64, count=n),
+            'precio_base': np.fromiter((int(p * 100) for p in columnas[1]), dtype=np.int64, count=n),
+            'autorizado': np.fromiter(columnas[2], dtype=bool, count=n),
+            'costo': np.fromiter((int(c * 100) for c in columnas[3]), dtype=np.int64, count=n),
+            'grupo_id': np.fromiter((g or 0 for g in columnas[4]), dtype=np.int64, count=n),
+            'linea_id': np.fromiter((li or 0 for li in columnas[5]), dtype=np.int64, count=n),
+        }
+
+    @staticmethod
+    def _reglas(lista, ajustes):
+        """Reglas de la lista con los cambios simulados: {regla_id: {'porcentaje_descuento', 'activo'}}."""
+        reglas = []
+        for regla in ReglaPrecio.objects.filter(lista=lista).exclude(tipo='combinacion'):
+            cambio = ajustes.get(regla.id, {})
+            if 'porcentaje_descuento' in cambio:
+                regla.porcentaje_descuento = Decimal(cambio['porcentaje_descuento'])
+            if 'activo' in cambio:
+                regla.activo = cambio['activo']
+            if regla.activo:
+                reglas.append(ReglaCompilada(regla))
+        return sorted(reglas, key=lambda r: (r.prioridad, r.id))
+
+    @staticmethod
+    def simular_lista(lista, canal=None, cantidad=1, monto_pedido=None, ajustes=None):
+        """
+        Devuelve un dict de arreglos (centavos) por artículo: precio_base, precio_final,
+        descuento_total, costo, margen, más las máscaras bajo_costo y autorizado.
+        """
+        monto_pedido = Decimal(monto_pedido or '0.00')
+        datos = SimulacionService._cargar(lista)
+        precio = datos['precio_base'].copy()
+        descuento_total = np.zeros_like(precio)
+
+        for regla in SimulacionService._reglas(lista, ajustes or {}):
+            if not regla.aplica(canal, cantidad, monto_pedido):
+                continue
+            if regla.puntos_base == 0:
+                continue
+            mascara = np.ones(precio.shape, dtype=bool)
+            if regla.articulo_id:
+                mascara &= datos['articulo_id'] == regla.articulo_id
+            if regla.grupo_id:
+                mascara &= datos['grupo_id'] == regla.grupo_id
+            if regla.linea_id:
+                mascara &= datos['linea_id'] == regla.linea_id
+            descuento = np.where(mascara, _redondear_division(precio * regla.puntos_base, PUNTOS_BASE), 0)
+            precio -= descuento
+            descuento_total += descuento
+
+        datos['precio_final'] = precio
+        datos['descuento_total'] = descuento_total
+        datos['margen'] = precio - datos['costo']
+        datos['bajo_costo'] = precio < datos['costo']
+        return datos
+
+    @staticmethod
+    def resumen(datos, detalle=False):
+        """Totales de la simulación; con detalle=True incluye los vectores por artículo."""
+        precio_final = datos['precio_final']
+        bajo_costo = datos['bajo_costo']
+        con_precio = precio_final != 0
+        margen_pct = np.divide(
+            datos['margen'] * 100.0, precio_final,
+            out=np.zeros(precio_final.shape, dtype=float), where=con_precio
+        )
+        resultado = {
+            'articulos': int(precio_final.size),
+            'total_base': str(a_decimal(int(datos['precio_base'].sum()))),
+            'total_final': str(a_decimal(int(precio_final.sum()))),
+            'descuento_total': str(a_decimal(int(datos['descuento_total'].sum()))),
+            'margen_promedio_pct': round(float(margen_pct.mean()), 2) if precio_final.size else None,
+            'bajo_costo': int(bajo_costo.sum()),
+            'bajo_costo_no_autorizado': int((bajo_costo & ~datos['autorizado']).sum()),
+        }
+        if detalle:
+            resultado['detalle'] = {
+                'articulo_id': datos['articulo_id'].tolist(),
+                'precio_base': _centavos_a_texto(datos['precio_base']),
+                'precio_final': _centavos_a_texto(precio_final),
+                'margen': _centavos_a_texto(datos['margen']),
+                'margen_pct': np.round(margen_pct, 2).tolist(),
+                'bajo_costo': bajo_costo.tolist(),
+            }
+        return resultado
@@ -1,12 +1,14 @@
-from django.test import TestCase, Client
+from django.test import TestCase, SimpleTestCase, Client, override_settings
 from django.urls import reverse
 from rest_framework.test import APIClient
-from .models import Empresa, Sucursal, Articulo, ListaPrecio, PrecioArticulo, ReglaPrecio, Orden, LineaOrden, CombinacionProducto
-from .services import PrecioService
+from .models import Empresa, Sucursal, Articulo, LineaArticulo, GrupoArticulo, ListaPrecio, PrecioArticulo, ReglaPrecio, Orden, LineaOrden, CombinacionProducto, PrecioFinalMaterializado
+from .services import PrecioService, PrecioMaterializadoService
 from django.utils import timezone
 from decimal import Decimal
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 
 class PrecioAPITestCase(TestCase):
@@ -206,4 +208,1339 @@ class CombinacionAplicacionTest(TestCase):
         self.assertIsNotNone(res['precio_final'])
         self.assertLess(Decimal(res['precio_final']), Decimal(res['precio_base']))
         # comprobamos que la combinacion fue reportada
-        self.assertIsNotNone(res.get('combinacion_aplicada'))
\ No newline at end of file
+        self.assertIsNotNone(res.get('combinacion_aplicada'))
+
+    def test_combinacion_precio_fijo_usa_su_campo(self):
+        from django.core.exceptions import ValidationError
+        from .reglas import ComboCompilado
+        combo = CombinacionProducto(lista=self.lista, nombre='Fijo', tipo_aplicacion='precio_fijo',
+                                    porcentaje_descuento=Decimal('5.00'))
+        with self.assertRaises(ValidationError):
+            combo.clean()
+        combo.precio_fijo = Decimal('1500.00')  # no cabría en porcentaje_descuento (max 999.99)
+        combo.save()
+        combo.articulos.set([self.a1, self.a2])
+        compilado = ComboCompilado(combo)
+        self.assertEqual(compilado.precio_fijo_centavos, 150000)
+        self.assertEqual(compilado.como_dict(combo)['valor'], '1500.00')
+
+class ReglasCompiladasTest(TestCase):
+    def setUp(self):
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        self.a1 = Articulo.objects.create(codigo='A1', nombre='Art1', ultimo_costo=10)
+        hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L',
+                                                tipo='normal', canal='web', fecha_inicio=hoy,
+                                                fecha_fin=hoy.replace(year=hoy.year + 1), estado='vigente')
+        PrecioArticulo.objects.create(lista=self.lista, articulo=self.a1, precio_base=20)
+        ReglaPrecio.objects.create(lista=self.lista, tipo='canal', canal='web', prioridad=2,
+                                   porcentaje_descuento=Decimal('10.00'))
+        ReglaPrecio.objects.create(lista=self.lista, tipo='escala_unidades', prioridad=1,
+                                   min_unidades=5, porcentaje_descuento=Decimal('5.00'))
+
+    def test_reglas_en_caliente_sin_consultas(self):
+        self.lista.refresh_from_db()
+        PrecioService.aplicar_reglas(self.lista, self.a1, 'web', 10, Decimal('0'))
+        with self.assertNumQueries(0):
+            aplicadas = PrecioService.aplicar_reglas(self.lista, self.a1, 'web', 10, Decimal('0'))
+        self.assertEqual([r['tipo'] for r in aplicadas], ['escala_unidades', 'canal'])
+
+    def test_guardar_regla_invalida_compilado(self):
+        self.lista.refresh_from_db()
+        version = self.lista.version
+        PrecioService.aplicar_reglas(self.lista, self.a1, 'web', 1, Decimal('0'))
+        ReglaPrecio.objects.create(lista=self.lista, tipo='descuento_proveedor', prioridad=999,
+                                   porcentaje_descuento=Decimal('3.00'))
+        self.lista.refresh_from_db()
+        self.assertGreater(self.lista.version, version)
+        aplicadas = PrecioService.aplicar_reglas(self.lista, self.a1, 'web', 1, Decimal('0'))
+        self.assertEqual([r['tipo'] for r in aplicadas], ['canal', 'descuento_proveedor'])
+
+    def test_serializer_de_lista_no_retrocede_version(self):
+        from .serializers import ListaPrecioSerializer
+        antigua = ListaPrecio.objects.get(pk=self.lista.pk)
+        ReglaPrecio.objects.filter(lista=self.lista).first().delete()
+        serializer = ListaPrecioSerializer(antigua, data={'nombre': 'L2'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.lista.refresh_from_db()
+        self.assertGreater(self.lista.version, antigua.version)
+        self.assertEqual(self.lista.nombre, 'L2')
+
+
+class CalcularPrecioLoteTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.user = User.objects.create_user(username='tester', password='test1234')
+        self.client.force_authenticate(self.user)
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L',
+                                                tipo='normal', canal='web', fecha_inicio=hoy,
+                                                fecha_fin=hoy.replace(year=hoy.year + 1), estado='vigente')
+        self.articulos = []
+        for i in range(6):
+            a = Articulo.objects.create(codigo=f'A{i}', nombre=f'Art{i}', ultimo_costo=5)
+            PrecioArticulo.objects.create(lista=self.lista, articulo=a, precio_base=Decimal('10.00') + i)
+            self.articulos.append(a)
+        ReglaPrecio.objects.create(lista=self.lista, tipo='escala_unidades', prioridad=1,
+                                   min_unidades=3, porcentaje_descuento=Decimal('10.00'))
+
+    def _payload(self, articulos):
+        return {
+            'empresa_id': self.e.id,
+            'sucursal_id': self.s.id,
+            'canal': 'web',
+            'lineas': [{'articulo_id': a.id, 'cantidad': 3} for a in articulos],
+        }
+
+    def test_lote_devuelve_lineas_y_totales(self):
+        url = reverse('listas:api_calcular_precio_lote')
+        resp = self.client.post(url, self._payload(self.articulos[:2]), format='json')
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(len(data['lineas']), 2)
+        # 10.00 y 11.00 con 10% → 9.00 y 9.90, por 3 unidades
+        self.assertEqual(data['lineas'][0]['precio_final'], '9.00')
+        self.assertEqual(data['lineas'][1]['subtotal'], '29.70')
+        self.assertEqual(data['totales']['total'], '56.70')
+        self.assertEqual(data['totales']['total_bruto'], '63.00')
+
+    def test_consultas_constantes(self):
+        url = reverse('listas:api_calcular_precio_lote')
+        self.client.post(url, self._payload(self.articulos), format='json')
+        with CaptureQueriesContext(connection) as pocas:
+            self.client.post(url, self._payload(self.articulos[:1]), format='json')
+        with CaptureQueriesContext(connection) as muchas:
+            self.client.post(url, self._payload(self.articulos), format='json')
+        self.assertEqual(len(pocas), len(muchas))
+
+
+class ListaVigenteCacheTest(TestCase):
+    def setUp(self):
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L',
+                                                tipo='normal', canal='web', fecha_inicio=hoy,
+                                                fecha_fin=hoy.replace(year=hoy.year + 1), estado='vigente')
+
+    def test_segunda_resolucion_sin_consultas(self):
+        PrecioService.obtener_lista_vigente(self.e, self.s, 'web')
+        info = PrecioService.info_cache_listas()
+        with self.assertNumQueries(0):
+            lista = PrecioService.obtener_lista_vigente(self.e, self.s, 'web')
+        self.assertEqual(lista, self.lista)
+        self.assertEqual(PrecioService.info_cache_listas()['aciertos'], info['aciertos'] + 1)
+
+    def test_cambio_de_version_invalida(self):
+        PrecioService.obtener_lista_vigente(self.e, self.s, 'web')
+        ReglaPrecio.objects.create(lista=self.lista, tipo='canal', canal='web', prioridad=1,
+                                   porcentaje_descuento=Decimal('5.00'))
+        lista = PrecioService.obtener_lista_vigente(self.e, self.s, 'web')
+        self.assertEqual(lista.version, self.lista.version + 1)
+
+    def test_cambio_sin_senales_visible_al_caducar(self):
+        # update() no envía señales: equivale a un cambio hecho por otro proceso
+        from unittest import mock
+        with mock.patch('listas.cache.time.monotonic', return_value=100.0):
+            PrecioService.obtener_lista_vigente(self.e, self.s, 'web')
+        ListaPrecio.objects.filter(pk=self.lista.pk).update(estado='inactiva')
+        with mock.patch('listas.cache.time.monotonic', return_value=101.0):
+            self.assertEqual(PrecioService.obtener_lista_vigente(self.e, self.s, 'web'), self.lista)
+        with mock.patch('listas.cache.time.monotonic', return_value=131.0):
+            self.assertIsNone(PrecioService.obtener_lista_vigente(self.e, self.s, 'web'))
+
+    def test_entradas_caducan(self):
+        from unittest import mock
+        from .cache import CacheLRU
+        cache = CacheLRU(tamano_maximo=2, segundos=30)
+        with mock.patch('listas.cache.time.monotonic', return_value=100.0):
+            cache.guardar('a', None)
+            self.assertIsNone(cache.obtener('a', default=False))
+        with mock.patch('listas.cache.time.monotonic', return_value=131.0):
+            self.assertIs(cache.obtener('a', default=False), False)
+
+    def test_guardar_lista_invalida(self):
+        self.assertEqual(PrecioService.obtener_lista_vigente(self.e, self.s, 'web'), self.lista)
+        self.lista.estado = 'inactiva'
+        self.lista.save()
+        self.assertIsNone(PrecioService.obtener_lista_vigente(self.e, self.s, 'web'))
+
+    def test_desalojo_lru(self):
+        from .cache import CacheLRU
+        cache = CacheLRU(tamano_maximo=2)
+        cache.guardar('a', 1)
+        cache.guardar('b', 2)
+        cache.obtener('a')
+        cache.guardar('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertIn('a', cache)
+        self.assertEqual(cache.info()['aciertos'], 1)
+
+
+class IndiceCombinacionesTest(TestCase):
+    def setUp(self):
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L',
+                                                tipo='promocion', canal='otro', fecha_inicio=hoy,
+                                                fecha_fin=hoy.replace(year=hoy.year + 1), estado='vigente')
+        self.a1, self.a2, self.a3 = [
+            Articulo.objects.create(codigo=f'A{i}', nombre=f'Art{i}', ultimo_costo=1) for i in range(3)
+        ]
+        self.combo12 = CombinacionProducto.objects.create(lista=self.lista, nombre='12', porcentaje_descuento=10)
+        self.combo12.articulos.set([self.a1, self.a2])
+        self.combo23 = CombinacionProducto.objects.create(lista=self.lista, nombre='23', porcentaje_descuento=20)
+        self.combo23.articulos.set([self.a2, self.a3])
+        ReglaPrecio.objects.create(lista=self.lista, tipo='combinacion', prioridad=1)
+        self.lista.refresh_from_db()
+
+    def test_indice_por_articulo(self):
+        from .reglas import obtener_reglas
+        reglas = obtener_reglas(self.lista)
+        self.assertEqual([c.id for c in reglas.combos_de(self.a2.id)], [self.combo12.id, self.combo23.id])
+        self.assertEqual([c.id for c in reglas.combos_de(self.a3.id)], [self.combo23.id])
+        self.assertEqual(reglas.combos_de(999999), ())
+
+    def test_combo_aplica_solo_con_carrito_completo(self):
+        carrito = [{'articulo_id': self.a2.id}, {'articulo_id': self.a3.id}]
+        aplicadas = PrecioService.aplicar_reglas(self.lista, self.a2, None, 1, Decimal('0'), carrito)
+        self.assertEqual([r['combo_id'] for r in aplicadas], [self.combo23.id])
+        aplicadas = PrecioService.aplicar_reglas(self.lista, self.a1, None, 1, Decimal('0'), carrito)
+        self.assertEqual(aplicadas, [])
+
+
+class AlcanceReglasTest(TestCase):
+    def setUp(self):
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L',
+                                                tipo='normal', canal='web', fecha_inicio=hoy,
+                                                fecha_fin=hoy.replace(year=hoy.year + 1), estado='vigente')
+        self.linea = LineaArticulo.objects.create(nombre='Bebidas')
+        self.grupo = GrupoArticulo.objects.create(nombre='Gaseosas', linea=self.linea)
+        self.gaseosa = Articulo.objects.create(codigo='G1', nombre='Gaseosa', linea=self.linea,
+                                               grupo=self.grupo, ultimo_costo=1)
+        self.agua = Articulo.objects.create(codigo='W1', nombre='Agua', linea=self.linea, ultimo_costo=1)
+        self.pan = Articulo.objects.create(codigo='P1', nombre='Pan', ultimo_costo=1)
+        ReglaPrecio.objects.create(lista=self.lista, tipo='canal', canal='web', prioridad=1)
+        ReglaPrecio.objects.create(lista=self.lista, tipo='escala_unidades', prioridad=2,
+                                   min_unidades=1, linea=self.linea)
+        ReglaPrecio.objects.create(lista=self.lista, tipo='escala_unidades', prioridad=3,
+                                   min_unidades=1, grupo=self.grupo)
+        ReglaPrecio.objects.create(lista=self.lista, tipo='escala_unidades', prioridad=4,
+                                   min_unidades=1, articulo=self.pan)
+        self.lista.refresh_from_db()
+
+    def _prioridades(self, articulo):
+        aplicadas = PrecioService.aplicar_reglas(self.lista, articulo, 'web', 1, Decimal('0'))
+        return [int(r['descripcion'].rsplit(' ', 1)[1]) for r in aplicadas]
+
+    def test_reglas_filtradas_por_articulo_grupo_linea(self):
+        self.assertEqual(self._prioridades(self.gaseosa), [1, 2, 3])
+        self.assertEqual(self._prioridades(self.agua), [1, 2])
+        self.assertEqual(self._prioridades(self.pan), [1, 4])
+
+    def test_candidatas_acotadas(self):
+        from .reglas import invalidar_reglas, obtener_reglas
+        with override_settings(PRECIOS_CACHE_CANDIDATAS_TAMANO=2):
+            invalidar_reglas(self.lista.pk)
+            reglas = obtener_reglas(self.lista)
+        for articulo in (self.gaseosa, self.agua, self.pan):
+            reglas.candidatas(articulo)
+        self.assertEqual(reglas._candidatas.info()['tamano'], 2)
+        self.assertEqual([r.prioridad for r in reglas.candidatas(self.gaseosa)], [1, 2, 3])
+
+
+class PrecioMaterializadoTest(TestCase):
+    def setUp(self):
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L',
+                                                tipo='normal', canal='web', fecha_inicio=hoy,
+                                                fecha_fin=hoy.replace(year=hoy.year + 1), estado='vigente')
+        self.a1 = Articulo.objects.create(codigo='A1', nombre='Art1', ultimo_costo=Decimal('8.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.precio = PrecioArticulo.objects.create(lista=self.lista, articulo=self.a1,
+                                                        precio_base=Decimal('10.00'))
+            ReglaPrecio.objects.create(lista=self.lista, tipo='canal', canal='web', prioridad=1,
+                                       porcentaje_descuento=Decimal('10.00'))
+            ReglaPrecio.objects.create(lista=self.lista, tipo='escala_unidades', prioridad=2,
+                                       min_unidades=10, porcentaje_descuento=Decimal('50.00'))
+
+    def test_filas_por_canal(self):
+        filas = dict(PrecioFinalMaterializado.objects.filter(lista=self.lista)
+                     .values_list('canal', 'precio_final'))
+        self.assertEqual(filas, {'': Decimal('10.00'), 'web': Decimal('9.00')})
+
+    def test_refrescar_es_upsert(self):
+        # la fila escrita por otro refresco concurrente se actualiza en lugar de chocar
+        fila = PrecioFinalMaterializado.objects.get(lista=self.lista, articulo=self.a1, canal='')
+        PrecioFinalMaterializado.objects.filter(pk=fila.pk).update(precio_final=Decimal('1.00'))
+        PrecioFinalMaterializado.objects.create(lista=self.lista, articulo=self.a1, canal='tienda',
+                                                precio_base=Decimal('1.00'), precio_final=Decimal('1.00'))
+        self.assertEqual(PrecioMaterializadoService.refrescar(self.lista.pk), 2)
+        filas = dict(PrecioFinalMaterializado.objects.filter(lista=self.lista).values_list('canal', 'pk'))
+        self.assertEqual(filas[''], fila.pk)
+        self.assertNotIn('tienda', filas)  # canal sin regla propia
+        self.assertEqual(PrecioFinalMaterializado.objects.get(pk=fila.pk).precio_final, Decimal('10.00'))
+
+    def test_lectura_materializada_dos_consultas(self):
+        PrecioService.calcular_precio(self.e, self.s, self.a1, canal='web')
+        # la lista sale de la caché: solo la fila materializada
+        with self.assertNumQueries(1):
+            res = PrecioService.calcular_precio(self.e, self.s, self.a1, canal='web')
+        self.assertEqual(res['precio_final'], Decimal('9.00'))
+        self.assertEqual(res['lista_usada']['id'], self.lista.id)
+
+    def test_cantidad_con_escala_evalua_completo(self):
+        res = PrecioService.calcular_precio(self.e, self.s, self.a1, canal='web', cantidad=10)
+        self.assertEqual(res['precio_final'], Decimal('4.50'))
+
+    def test_refresco_por_cambio_de_costo(self):
+        self.a1.ultimo_costo = Decimal('9.50')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.a1.save()
+        fila = PrecioFinalMaterializado.objects.get(lista=self.lista, articulo=self.a1, canal='web')
+        self.assertIn('bajo costo', fila.razon_bajo_costo)
+
+    def test_cambio_de_grupo_y_regla_de_grupo(self):
+        grupo = GrupoArticulo.objects.create(nombre='G')
+        otro = Articulo.objects.create(codigo='A2', nombre='Art2', ultimo_costo=Decimal('1.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            PrecioArticulo.objects.create(lista=self.lista, articulo=otro, precio_base=Decimal('10.00'))
+            ReglaPrecio.objects.create(lista=self.lista, tipo='escala_unidades', prioridad=3, min_unidades=1,
+                                       grupo=grupo, porcentaje_descuento=Decimal('20.00'))
+        filas_otro = set(PrecioFinalMaterializado.objects.filter(articulo=otro).values_list('id', flat=True))
+        final = lambda: PrecioFinalMaterializado.objects.get(lista=self.lista, articulo=self.a1, canal='').precio_final
+        self.assertEqual(final(), Decimal('10.00'))
+        self.a1.grupo = grupo
+        with self.captureOnCommitCallbacks(execute=True):
+            self.a1.save()
+        self.assertEqual(final(), Decimal('8.00'))
+        # editar la regla de grupo solo recalcula los artículos del grupo
+        regla = ReglaPrecio.objects.get(grupo=grupo)
+        regla.porcentaje_descuento = Decimal('30.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            regla.save()
+        self.assertEqual(final(), Decimal('7.00'))
+        self.assertEqual(set(PrecioFinalMaterializado.objects.filter(articulo=otro).values_list('id', flat=True)),
+                         filas_otro)
+
+
+class SimulacionListaTest(TestCase):
+    def setUp(self):
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L',
+                                                tipo='normal', canal='web', fecha_inicio=hoy,
+                                                fecha_fin=hoy.replace(year=hoy.year + 1), estado='vigente')
+        self.linea = LineaArticulo.objects.create(nombre='Bebidas')
+        self.articulos = []
+        for i, (precio, costo) in enumerate([('10.05', '9.00'), ('19.99', '5.00'), ('3.33', '3.10')]):
+            a = Articulo.objects.create(codigo=f'A{i}', nombre=f'Art{i}', ultimo_costo=Decimal(costo),
+                                        linea=self.linea if i else None)
+            PrecioArticulo.objects.create(lista=self.lista, articulo=a, precio_base=Decimal(precio))
+            self.articulos.append(a)
+        self.regla_canal = ReglaPrecio.objects.create(lista=self.lista, tipo='canal', canal='web', prioridad=1,
+                                                      porcentaje_descuento=Decimal('7.50'))
+        ReglaPrecio.objects.create(lista=self.lista, tipo='escala_unidades', prioridad=2, min_unidades=5,
+                                   linea=self.linea, porcentaje_descuento=Decimal('12.35'))
+
+    def test_coincide_con_calcular_precio(self):
+        from .simulacion import SimulacionService
+        datos = SimulacionService.simular_lista(self.lista, canal='web', cantidad=6)
+        finales = dict(zip(datos['articulo_id'].tolist(), datos['precio_final'].tolist()))
+        for a in self.articulos:
+            res = PrecioService.calcular_precio(self.e, self.s, a, canal='web', cantidad=6)
+            self.assertEqual(Decimal(finales[a.id]).scaleb(-2), res['precio_final'])
+
+    def test_api_simular_con_ajuste(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(username='u', password='p'))
+        url = reverse('listas:listas-simular', kwargs={'pk': self.lista.pk})
+        payload = {'canal': 'web', 'ajustes': [{'regla_id': self.regla_canal.id, 'porcentaje_descuento': '50.00'}]}
+        resp = client.post(url, payload, format='json')
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data['articulos'], 3)
+        self.assertEqual(data['bajo_costo'], 2)
+        self.assertNotIn('detalle', data)
+
+
+class AritmeticaPuntoFijoTest(TestCase):
+    """El motor en centavos/puntos básicos debe coincidir con el cálculo Decimal original."""
+
+    @staticmethod
+    def _referencia_decimal(precio, porcentajes):
+        from decimal import ROUND_HALF_UP
+        cents = Decimal('0.01')
+        precio = Decimal(precio).quantize(cents, rounding=ROUND_HALF_UP)
+        total = Decimal('0.00')
+        for p in porcentajes:
+            pct = Decimal(p) / Decimal('100')
+            if pct == 0:
+                continue
+            descuento = (precio * pct).quantize(cents, rounding=ROUND_HALF_UP)
+            precio = (precio - descuento).quantize(cents, rounding=ROUND_HALF_UP)
+            total += descuento
+        return precio, total
+
+    def test_descuentos_sucesivos_aleatorios(self):
+        import random
+        from .aritmetica import a_centavos, a_puntos_base, a_decimal, descuento
+        rnd = random.Random(20251031)
+        for _ in range(5000):
+            precio = Decimal(rnd.randint(0, 10_000_000)).scaleb(-2)
+            porcentajes = [Decimal(rnd.randint(0, 10000)).scaleb(-2) for _ in range(rnd.randint(0, 6))]
+            esperado, esperado_total = self._referencia_decimal(precio, porcentajes)
+            centavos, total = a_centavos(precio), 0
+            for p in porcentajes:
+                d = descuento(centavos, a_puntos_base(p))
+                centavos -= d
+                total += d
+            self.assertEqual(a_decimal(centavos), esperado, (precio, porcentajes))
+            self.assertEqual(a_decimal(total), esperado_total)
+
+    def test_minimo_permitido_empates(self):
+        from decimal import ROUND_HALF_UP
+        from .aritmetica import a_centavos, a_puntos_base, a_decimal, minimo_permitido
+        casos = [
+            ('1.00', '0.50', '1.00'),    # 0.995 -> 1.00
+            ('3.00', '2.50', '2.93'),    # 2.925 -> 2.93
+            ('10.00', '0.05', '10.00'),  # 9.995 -> 10.00
+            ('0.01', '50.00', '0.01'),   # 0.005 -> 0.01
+            ('5.00', '10.00', '4.50'),
+            ('1.00', '150.00', '-0.50'),
+        ]
+        for costo, pct, esperado in casos:
+            referencia = (Decimal(costo) * (1 - Decimal(pct) / 100)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            self.assertEqual(referencia, Decimal(esperado))
+            self.assertEqual(a_decimal(minimo_permitido(a_centavos(costo), a_puntos_base(pct))),
+                             Decimal(esperado), (costo, pct))
+
+    def test_redondeo_medio_centavo(self):
+        from .aritmetica import a_centavos, descuento
+        # 0.05 * 10% = 0.005 -> 0.01 (ROUND_HALF_UP)
+        self.assertEqual(descuento(5, 1000), 1)
+        self.assertEqual(a_centavos(Decimal('2.345')), 235)
+        self.assertEqual(a_centavos('-2.345'), -235)
+
+
+class ConfirmarOrdenLoteTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L',
+                                                tipo='mayoreo', canal='otro', fecha_inicio=hoy,
+                                                fecha_fin=hoy.replace(year=hoy.year + 1), estado='vigente')
+        self.articulos = []
+        for i in range(6):
+            a = Articulo.objects.create(codigo=f'A{i}', nombre=f'Art{i}', ultimo_costo=1)
+            PrecioArticulo.objects.create(lista=self.lista, articulo=a, precio_base=Decimal('10.00') + i)
+            self.articulos.append(a)
+
+    def _orden(self, articulos):
+        orden = Orden.objects.create(empresa=self.e, sucursal=self.s, canal='otro')
+        for a in articulos:
+            LineaOrden.objects.create(orden=orden, articulo=a, cantidad=2)
+        return orden
+
+    def _confirmar(self, orden):
+        url = reverse('listas:confirmar_orden', kwargs={'orden_id': orden.id})
+        return self.client.post(url, content_type='application/json')
+
+    def test_confirma_precios_y_total(self):
+        orden = self._orden(self.articulos[:3])
+        resp = self._confirmar(orden)
+        self.assertEqual(resp.json(), {'ok': True})
+        orden.refresh_from_db()
+        self.assertEqual(orden.estado, 'confirmada')
+        self.assertEqual(orden.total_bruto, Decimal('66.00'))
+        self.assertEqual(sorted(orden.lineas.values_list('precio_unitario', flat=True)),
+                         [Decimal('10.00'), Decimal('11.00'), Decimal('12.00')])
+
+    def test_solo_confirma_borradores(self):
+        orden = self._orden(self.articulos[:2])
+        self.assertEqual(self._confirmar(orden).status_code, 200)
+        # un precio nuevo no reprecia una orden ya confirmada (y quizá acumulada)
+        PrecioArticulo.objects.filter(articulo=self.articulos[0]).update(precio_base=Decimal('99.00'))
+        resp = self._confirmar(orden)
+        self.assertEqual(resp.status_code, 409)
+        self.assertFalse(resp.json()['ok'])
+        self.assertNotIn(Decimal('99.00'), orden.lineas.values_list('precio_unitario', flat=True))
+        anulada = self._orden(self.articulos[:1])
+        Orden.objects.filter(pk=anulada.pk).update(estado='anulada')
+        self.assertEqual(self._confirmar(anulada).status_code, 409)
+        anulada.refresh_from_db()
+        self.assertEqual(anulada.estado, 'anulada')
+
+    def test_consultas_independientes_del_numero_de_lineas(self):
+        self._confirmar(self._orden(self.articulos[:1]))
+        corta, larga = self._orden(self.articulos[:1]), self._orden(self.articulos)
+        with CaptureQueriesContext(connection) as pocas:
+            self._confirmar(corta)
+        with CaptureQueriesContext(connection) as muchas:
+            self._confirmar(larga)
+        self.assertEqual(len(pocas), len(muchas))
+
+
+@override_settings(PRECIOS_METRICAS_ACTIVAS=True)
+class MetricasTest(TestCase):
+    def setUp(self):
+        from .metricas import registro
+        registro.reiniciar()
+        User = get_user_model()
+        self.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        self.a = Articulo.objects.create(codigo='A', nombre='A', ultimo_costo=1)
+
+    def test_resumen_por_vista_y_servicio(self):
+        payload = {'empresa_id': self.e.id, 'sucursal_id': self.s.id, 'articulo_id': self.a.id}
+        self.client.post(reverse('listas:api_calcular_precio'), payload, format='json')
+        lote = {'empresa_id': self.e.id, 'sucursal_id': self.s.id,
+                'lineas': [{'articulo_id': self.a.id, 'cantidad': 1}]}
+        self.client.post(reverse('listas:api_calcular_precio_lote'), lote, format='json')
+        data = self.client.get(reverse('listas:api_metricas')).json()['metricas']
+        self.assertEqual(data['vista:listas:api_calcular_precio']['llamadas'], 1)
+        self.assertGreater(data['vista:listas:api_calcular_precio']['consultas'], 0)
+        # el cálculo unitario es el camino caliente: solo se mide la vista
+        self.assertNotIn('servicio:calcular_precio', data)
+        self.assertEqual(data['servicio:calcular_precios_lote']['llamadas'], 1)
+
+    def test_desactivadas_por_defecto(self):
+        from .metricas import registro
+        with override_settings(PRECIOS_METRICAS_ACTIVAS=False):
+            self.client.get(reverse('listas:empresas-list'))
+        self.assertEqual(registro.resumen(), {})
+
+    def test_cabeceras_y_log_de_lentas(self):
+        import json
+        import tempfile
+        from pathlib import Path
+        with tempfile.TemporaryDirectory() as tmp:
+            log = Path(tmp) / 'lentas.jsonl'
+            with override_settings(PRECIOS_METRICAS_CABECERAS=True, PRECIOS_METRICAS_UMBRAL_MS=0,
+                                   PRECIOS_METRICAS_LOG=log):
+                resp = self.client.get(reverse('listas:empresas-list'))
+                with override_settings(PRECIOS_METRICAS_GUARDAR_SQL=True):
+                    self.client.get(reverse('listas:empresas-list'))
+            self.assertIn('X-Consultas-SQL', resp)
+            sin_sql, con_sql = (json.loads(linea) for linea in log.read_text().splitlines())
+            self.assertEqual(sin_sql['vista'], 'listas:empresas-list')
+            self.assertEqual(sin_sql['sql_repetido'], [])
+            self.assertIn('sql_repetido', con_sql)
+
+    def test_solo_staff(self):
+        self.client.force_authenticate(get_user_model().objects.create_user(username='u', password='x'))
+        self.assertEqual(self.client.get(reverse('listas:api_metricas')).status_code, 403)
+
+    def test_rutas_sin_resolver_comparten_clave(self):
+        from .metricas import registro
+        for ruta in ('/no-existe/1/', '/no-existe/2/', '/wp-admin.php'):
+            self.client.get(ruta)
+        claves = [k for k in registro.resumen() if k.startswith('vista:')]
+        self.assertEqual(claves, ['vista:<sin_resolver>'])
+        self.assertEqual(registro.resumen()['vista:<sin_resolver>']['llamadas'], 3)
+
+
+class BenchmarkComandosTest(TestCase):
+    def test_generar_y_medir(self):
+        import json
+        import tempfile
+        from io import StringIO
+        from pathlib import Path
+        from django.core.management import call_command
+        call_command('generar_datos_prueba', empresas=1, sucursales=2, articulos=30, periodos=3,
+                     combinaciones=3, materializar=True, stdout=StringIO())
+        self.assertEqual(ListaPrecio.objects.count(), 6)
+        self.assertEqual(PrecioArticulo.objects.count(), 180)
+        self.assertTrue(PrecioFinalMaterializado.objects.exists())
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = Path(tmp) / 'bench.json'
+            call_command('benchmark_precios', llamadas=20, salida=str(ruta), stdout=StringIO())
+            call_command('benchmark_precios', llamadas=20, comparar=str(ruta), stdout=StringIO())
+            datos = json.loads(ruta.read_text(encoding='utf-8'))
+        for escenario in ('obtener_lista_vigente', 'aplicar_reglas', 'calcular_precio'):
+            self.assertEqual(datos['resultados'][escenario]['llamadas'], 20)
+            self.assertIn('p99_ms', datos['resultados'][escenario])
+        self.assertEqual(datos['resultados']['obtener_lista_vigente']['consultas_por_llamada'], 0)
+
+
+class ImportacionPreciosTest(TestCase):
+    def setUp(self):
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L',
+                                                tipo='normal', canal='web', fecha_inicio=hoy,
+                                                fecha_fin=hoy.replace(year=hoy.year + 1), estado='vigente')
+        self.a1 = Articulo.objects.create(codigo='A1', nombre='Art1', ultimo_costo=Decimal('8.00'))
+        self.a2 = Articulo.objects.create(codigo='A2', nombre='Art2', ultimo_costo=Decimal('5.00'))
+        PrecioArticulo.objects.create(lista=self.lista, articulo=self.a1, precio_base=Decimal('9.00'))
+
+    def test_upsert_y_reporte_de_errores(self):
+        import io
+        from .importacion import ImportacionPreciosService
+        archivo = io.StringIO(
+            'codigo,precio_base,autorizado_bajo_costo\n'
+            'A1,12.50,\n'
+            'A2,4.00,\n'
+            'A2,4.00,si\n'
+            'NOEXISTE,3.00,\n'
+            'A1,abc,\n'
+        )
+        resumen = ImportacionPreciosService.importar_csv(self.lista, archivo, tamano_lote=10)
+        self.assertEqual((resumen['filas'], resumen['importadas'], resumen['con_error']), (5, 2, 3))
+        self.assertEqual([e['fila'] for e in resumen['errores']], [6, 3, 5])
+        precios = dict(PrecioArticulo.objects.filter(lista=self.lista).values_list('articulo__codigo', 'precio_base'))
+        self.assertEqual(precios, {'A1': Decimal('12.50'), 'A2': Decimal('4.00')})
+        self.assertEqual(
+            PrecioFinalMaterializado.objects.get(lista=self.lista, articulo=self.a1, canal='').precio_final,
+            Decimal('12.50')
+        )
+
+    def test_importar_sobre_el_costo_quita_pendiente(self):
+        import io
+        from .importacion import ImportacionPreciosService
+        PrecioArticulo.objects.filter(lista=self.lista, articulo=self.a1).update(
+            precio_base=Decimal('7.00'), pendiente_autorizacion=True
+        )
+        ImportacionPreciosService.importar_csv(self.lista, io.StringIO('codigo,precio_base\nA1,9.50\n'))
+        self.assertFalse(PrecioArticulo.objects.get(lista=self.lista, articulo=self.a1).pendiente_autorizacion)
+
+    def test_api_importar(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(username='u', password='x'))
+        archivo = SimpleUploadedFile('precios.csv', 'codigo;precio_base\nA2;7,00\n'.encode('utf-8'))
+        resp = client.post(reverse('listas:precios-articulo-importar'),
+                           {'lista_id': self.lista.id, 'archivo': archivo, 'delimitador': ';'},
+                           format='multipart')
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertEqual(resp.json()['importadas'], 1)
+        self.assertEqual(PrecioArticulo.objects.get(lista=self.lista, articulo=self.a2).precio_base, Decimal('7.00'))
+
+
+class ExportacionPreciosTest(TestCase):
+    def setUp(self):
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L',
+                                                tipo='normal', canal='web', fecha_inicio=hoy,
+                                                fecha_fin=hoy.replace(year=hoy.year + 1), estado='vigente')
+        self.a1 = Articulo.objects.create(codigo='A1', nombre='Art, uno', ultimo_costo=Decimal('8.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            PrecioArticulo.objects.create(lista=self.lista, articulo=self.a1, precio_base=Decimal('10.00'))
+            ReglaPrecio.objects.create(lista=self.lista, tipo='descuento_proveedor', prioridad=1,
+                                       porcentaje_descuento=Decimal('10.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='u', password='x'))
+
+    def test_csv_en_streaming(self):
+        resp = self.client.get(reverse('listas:listas-exportar', args=[self.lista.id]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        contenido = b''.join(resp.streaming_content).decode()
+        self.assertEqual(contenido.splitlines(), [
+            'codigo,nombre,ultimo_costo,precio_base,precio_final,autorizado_bajo_costo',
+            'A1,"Art, uno",8.00,10.00,9.00,False',
+        ])
+
+    def test_jsonl(self):
+        import json
+        resp = self.client.get(reverse('listas:listas-exportar', args=[self.lista.id]), {'formato': 'jsonl'})
+        filas = [json.loads(linea) for linea in b''.join(resp.streaming_content).decode().splitlines()]
+        self.assertEqual(filas[0]['codigo'], 'A1')
+        self.assertEqual(filas[0]['precio_final'], '9.00')
+        self.assertEqual(self.client.get(reverse('listas:listas-exportar', args=[self.lista.id]),
+                                         {'formato': 'xml'}).status_code, 400)
+
+    def test_sin_materializar_calcula_el_precio(self):
+        from .exportacion import ExportacionPreciosService
+        PrecioFinalMaterializado.objects.filter(lista=self.lista).delete()
+        fila = next(ExportacionPreciosService.filas(self.lista))
+        self.assertEqual(fila[4], Decimal('9.00'))
+
+
+class VigenciaListaTest(TestCase):
+    def setUp(self):
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        self.hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L',
+                                                fecha_inicio=self.hoy, fecha_fin=self.hoy + timezone.timedelta(days=9),
+                                                estado='vigente')
+
+    def test_vigentes_en_incluye_extremos(self):
+        fin = self.lista.fecha_fin
+        self.assertEqual(list(ListaPrecio.objects.vigentes_en(self.hoy)), [self.lista])
+        self.assertEqual(list(ListaPrecio.objects.vigentes_en(fin)), [self.lista])
+        self.assertFalse(ListaPrecio.objects.vigentes_en(fin + timezone.timedelta(days=1)).exists())
+
+    def test_api_rechaza_solapamiento(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(username='u', password='x'))
+        payload = {'nombre': 'L2', 'empresa_id': self.e.id, 'sucursal_id': self.s.id,
+                   'fecha_inicio': self.lista.fecha_fin, 'fecha_fin': self.lista.fecha_fin + timezone.timedelta(days=5)}
+        self.assertEqual(client.post(reverse('listas:listas-list'), payload, format='json').status_code, 400)
+        payload['fecha_inicio'] = self.lista.fecha_fin + timezone.timedelta(days=1)
+        self.assertEqual(client.post(reverse('listas:listas-list'), payload, format='json').status_code, 201)
+
+    def test_serializer_valida_solape_una_vez(self):
+        from .serializers import ListaPrecioSerializer
+        datos = {'nombre': 'L', 'fecha_fin': self.lista.fecha_fin + timezone.timedelta(days=1)}
+        serializer = ListaPrecioSerializer(self.lista, data=datos, partial=True)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        # SQLite: la unicidad de DRF y el solapamiento de clean(), sin repetir ninguno
+        self.assertLessEqual(len(ctx.captured_queries), 2)
+        invalido = ListaPrecioSerializer(self.lista, data={'fecha_fin': self.hoy - timezone.timedelta(days=1)},
+                                         partial=True)
+        self.assertFalse(invalido.is_valid())
+
+
+class CalcularPrecioAsyncTest(TestCase):
+    def setUp(self):
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L',
+                                                tipo='normal', canal='web', fecha_inicio=hoy,
+                                                fecha_fin=hoy.replace(year=hoy.year + 1), estado='vigente')
+        self.a1 = Articulo.objects.create(codigo='A1', nombre='Art1', ultimo_costo=Decimal('8.00'))
+        PrecioArticulo.objects.create(lista=self.lista, articulo=self.a1, precio_base=Decimal('10.00'))
+        ReglaPrecio.objects.create(lista=self.lista, tipo='escala_unidades', prioridad=1,
+                                   min_unidades=5, porcentaje_descuento=Decimal('10.00'))
+        user = get_user_model().objects.create_user(username='u', password='x')
+        self.token = Token.objects.create(user=user)
+        PrecioService.invalidar_listas_vigentes()
+
+    async def test_mismo_resultado_que_sincrono(self):
+        from asgiref.sync import sync_to_async
+        payload = {'empresa_id': self.e.id, 'sucursal_id': self.s.id, 'articulo_id': self.a1.id, 'cantidad': 5}
+        resp = await self.async_client.post(reverse('listas:api_calcular_precio_async'), payload,
+                                            content_type='application/json',
+                                            headers={'Authorization': f'Token {self.token.key}'})
+        self.assertEqual(resp.status_code, 200)
+        esperado = await sync_to_async(PrecioService.calcular_precio)(self.e, self.s, self.a1, cantidad=5)
+        self.assertEqual(resp.json()['precio_final'], str(esperado['precio_final']))
+        self.assertEqual(resp.json()['precio_final'], '9.00')
+
+    async def test_autenticacion_y_404(self):
+        url = reverse('listas:api_calcular_precio_async')
+        payload = {'empresa_id': self.e.id, 'sucursal_id': self.s.id, 'articulo_id': 999}
+        resp = await self.async_client.post(url, payload, content_type='application/json')
+        self.assertEqual(resp.status_code, 401)
+        resp = await self.async_client.post(url, payload, content_type='application/json',
+                                            headers={'Authorization': f'Token {self.token.key}'})
+        self.assertEqual(resp.status_code, 404)
+
+
+class PaginacionCursorTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='u', password='x'))
+        self.ids = [Articulo.objects.create(codigo=f'P{i}', nombre=f'P{i}').id for i in range(5)]
+
+    def test_recorrido_estable_con_inserciones(self):
+        url = reverse('listas:articulos-list') + '?page_size=2'
+        vistos = []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                data = self.client.get(url).json()
+            self.assertFalse(any('OFFSET' in q['sql'] for q in ctx.captured_queries))
+            vistos += [a['id'] for a in data['results']]
+            if len(vistos) == 2:
+                self.ids.append(Articulo.objects.create(codigo='NUEVO', nombre='Nuevo').id)
+            url = data['next']
+        self.assertEqual(vistos, self.ids)
+
+
+class SerializadoresExpandiblesTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='u', password='x'))
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L', fecha_inicio=hoy,
+                                                fecha_fin=hoy.replace(year=hoy.year + 1), estado='vigente')
+        for i in range(5):
+            a = Articulo.objects.create(codigo=f'X{i}', nombre=f'X{i}', ultimo_costo=1)
+            PrecioArticulo.objects.create(lista=self.lista, articulo=a, precio_base=Decimal('2.00'))
+        self.url = reverse('listas:precios-articulo-list')
+
+    def test_plano_por_defecto(self):
+        # la página en una consulta, más la de VersionRecurso para ETag/Last-Modified
+        with self.assertNumQueries(2):
+            fila = self.client.get(self.url).json()['results'][0]
+        self.assertEqual(fila['lista_id'], self.lista.id)
+        self.assertNotIn('lista', fila)
+        self.assertNotIn('articulo', fila)
+
+    def test_expand_anidado_sin_n_mas_1(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(self.url, {'expand': 'lista.sucursal.empresa,articulo'}).json()
+        self.assertEqual(len(ctx.captured_queries), 2)  # página + VersionRecurso
+        fila = data['results'][0]
+        self.assertEqual(fila['lista']['sucursal']['empresa']['nombre'], 'E')
+        self.assertNotIn('empresa', fila['lista'])
+        self.assertEqual(fila['articulo']['codigo'], 'X0')
+
+    def test_fields(self):
+        fila = self.client.get(self.url, {'fields': 'id,precio_base'}).json()['results'][0]
+        self.assertEqual(set(fila), {'id', 'precio_base'})
+
+
+class ContadoresDashboardTest(TestCase):
+    def setUp(self):
+        from . import contadores
+        self.contadores = contadores
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        contadores.reconciliar()
+        hoy = timezone.now().date()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L', fecha_inicio=hoy,
+                                                    fecha_fin=hoy.replace(year=hoy.year + 1), estado='borrador')
+
+    def test_altas_cambios_y_bajas(self):
+        leer = self.contadores.leer
+        self.assertEqual((leer()['total_listas'], leer()['listas_vigentes']), (1, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lista.estado = 'vigente'
+            self.lista.save()
+            self.assertEqual(leer()['listas_vigentes'], 0)  # el contador se ajusta al confirmar
+        self.assertEqual(leer()['listas_vigentes'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lista.nombre = 'Otro'
+            self.lista.save()
+        self.assertEqual(leer()['listas_vigentes'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            a = Articulo.objects.create(codigo='C1', nombre='C1')
+            PrecioArticulo.objects.create(lista=self.lista, articulo=a, precio_base=1)
+        self.assertEqual(leer()['total_precios_articulo'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lista.delete()  # borra en cascada el precio
+        valores = leer()
+        self.assertEqual((valores['total_listas'], valores['listas_vigentes'], valores['total_precios_articulo']), (0, 0, 0))
+        self.assertEqual(self.contadores.reconciliar(), {})
+
+    def test_borrado_por_conjuntos(self):
+        from .borrado import BorradoPreciosService
+        from .models import HistorialPrecio, VersionRecurso
+        hoy = timezone.now().date()
+        with self.captureOnCommitCallbacks(execute=True):
+            listas = [self.lista, ListaPrecio.objects.create(
+                empresa=self.e, sucursal=self.s, nombre='L2', fecha_inicio=hoy.replace(year=hoy.year + 2),
+                fecha_fin=hoy.replace(year=hoy.year + 3))]
+            articulos = [Articulo.objects.create(codigo=f'D{i}', nombre=f'D{i}', ultimo_costo=5) for i in range(20)]
+            for lista, cuantos in zip(listas, (2, 20)):
+                for a in articulos[:cuantos]:
+                    PrecioArticulo.objects.create(lista=lista, articulo=a, precio_base=1)  # con hallazgo
+        # historial cerrado, materializado descartado y versión avanzada
+        version = VersionRecurso.objects.get(recurso=f'precios-articulo:{listas[1].pk}').version
+        with self.captureOnCommitCallbacks(execute=True):
+            BorradoPreciosService.borrar(PrecioArticulo.objects.filter(lista=listas[1], articulo__in=articulos[:5]))
+        self.assertFalse(PrecioFinalMaterializado.objects.filter(lista=listas[1], articulo__in=articulos[:5]).exists())
+        self.assertFalse(HistorialPrecio.objects.filter(lista=listas[1], articulo__in=articulos[:5],
+                                                        vigente_hasta__isnull=True).exists())
+        self.assertEqual(VersionRecurso.objects.get(recurso=f'precios-articulo:{listas[1].pk}').version, version + 1)
+        # borrar una lista no cuesta consultas por precio
+        consultas = []
+        for lista in listas:
+            with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+                BorradoPreciosService.borrar_listas(ListaPrecio.objects.filter(pk=lista.pk))
+            consultas.append(len(ctx.captured_queries))
+        self.assertEqual(consultas[0], consultas[1])
+        self.assertEqual(self.contadores.reconciliar(), {})
+
+    def test_queryset_delete_conserva_senales(self):
+        from django.db.models.signals import post_delete
+        recibidos = []
+        receptor = lambda sender, instance, **kwargs: recibidos.append(instance.pk)
+        post_delete.connect(receptor, sender=PrecioArticulo)
+        self.addCleanup(post_delete.disconnect, receptor, sender=PrecioArticulo)
+        a = Articulo.objects.create(codigo='S1', nombre='S1', ultimo_costo=1)
+        precio = PrecioArticulo.objects.create(lista=self.lista, articulo=a, precio_base=2)
+        PrecioArticulo.objects.filter(pk=precio.pk).delete()
+        self.assertEqual(recibidos, [precio.pk])
+
+    def test_reconciliar_corrige_deriva(self):
+        Empresa.objects.bulk_create([Empresa(nombre='X'), Empresa(nombre='Y')])
+        self.assertEqual(self.contadores.reconciliar(['total_empresas']), {'total_empresas': (1, 3)})
+
+    def test_dashboard_lee_contadores(self):
+        client = Client()
+        client.force_login(get_user_model().objects.create_user(username='u', password='x'))
+        client.get(reverse('listas:dashboard'))
+        with CaptureQueriesContext(connection) as ctx:
+            resp = client.get(reverse('listas:dashboard'))
+        self.assertEqual(resp.context['total_listas'], 1)
+        self.assertEqual(sum('COUNT(' in q['sql'] for q in ctx.captured_queries), 0)
+
+
+class HistorialPrecioTest(TestCase):
+    def setUp(self):
+        from .historial import HistorialService
+        from .models import HistorialPrecio, HistorialCosto
+        self.servicio = HistorialService
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        hoy = timezone.now().date()
+        self.ayer = hoy - timezone.timedelta(days=1)
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L', estado='vigente',
+                                                fecha_inicio=hoy - timezone.timedelta(days=10),
+                                                fecha_fin=hoy + timezone.timedelta(days=10))
+        self.a = Articulo.objects.create(codigo='H1', nombre='H1', ultimo_costo=Decimal('50.00'))
+        self.pa = PrecioArticulo.objects.create(lista=self.lista, articulo=self.a, precio_base=Decimal('100.00'))
+        # las versiones iniciales pasan a ser de hace 5 días
+        hace_cinco = timezone.now() - timezone.timedelta(days=5)
+        HistorialPrecio.objects.update(vigente_desde=hace_cinco)
+        HistorialCosto.objects.update(vigente_desde=hace_cinco)
+        self.pa.precio_base = Decimal('120.00')
+        self.pa.save()
+        self.a.ultimo_costo = Decimal('110.00')
+        self.a.save()
+
+    def test_solo_versiona_cambios(self):
+        from .models import HistorialPrecio
+        self.pa.save()
+        self.assertEqual(HistorialPrecio.objects.filter(lista=self.lista, articulo=self.a).count(), 2)
+        self.assertEqual(HistorialPrecio.objects.filter(vigente_hasta__isnull=True).count(), 1)
+
+    def test_precio_en_fecha_pasada(self):
+        pasado = PrecioService.calcular_precio(self.e, self.s, self.a, fecha=self.ayer)
+        actual = PrecioService.calcular_precio(self.e, self.s, self.a)
+        self.assertEqual(pasado['precio_base'], Decimal('100.00'))
+        self.assertIsNone(pasado['razon_bajo_costo'])  # con el costo de ayer (50), no el actual (110)
+        self.assertEqual(actual['precio_base'], Decimal('120.00'))
+        lote = PrecioService.calcular_precios_lote(self.e, self.s, [{'articulo_id': self.a.id, 'cantidad': 1}],
+                                                   fecha=self.ayer)
+        self.assertEqual(lote['lineas'][0]['precio_final'], Decimal('100.00'))
+
+    async def test_precio_en_fecha_pasada_async(self):
+        from asgiref.sync import sync_to_async
+        pasado = await PrecioService.acalcular_precio(self.e.id, self.s.id, self.a.id, fecha=self.ayer)
+        esperado = await sync_to_async(PrecioService.calcular_precio)(self.e, self.s, self.a, fecha=self.ayer)
+        self.assertEqual(pasado, esperado)
+        self.assertEqual(pasado['precio_base'], Decimal('100.00'))
+
+    def test_busqueda_puntual_una_consulta(self):
+        with self.assertNumQueries(1):
+            precio = self.servicio.precio_en(self.lista, self.a, self.ayer)
+        self.assertEqual(precio.precio_base, Decimal('100.00'))
+
+    def test_fecha_anterior_al_historial_usa_la_primera_version(self):
+        # el historial se sembró desde la última modificación: antes de eso vale la primera versión
+        antes = self.ayer - timezone.timedelta(days=8)
+        self.assertEqual(self.servicio.precio_en(self.lista, self.a, antes).precio_base, Decimal('100.00'))
+        self.assertEqual(self.servicio.precios_en(self.lista, [self.a.id], antes)[self.a.id].precio_base,
+                         Decimal('100.00'))
+        pasado = PrecioService.calcular_precio(self.e, self.s, self.a, fecha=antes)
+        self.assertEqual(pasado['precio_base'], Decimal('100.00'))
+        self.assertIsNone(pasado['razon_bajo_costo'])  # costo de la primera versión (50)
+
+    def test_precio_borrado_antes_de_la_fecha(self):
+        self.pa.delete()
+        self.assertIsNone(self.servicio.precio_en(self.lista, self.a, timezone.now().date()))
+        self.assertEqual(self.servicio.precios_en(self.lista, [self.a.id], timezone.now().date()), {})
+
+
+class AjustePreciosTest(TestCase):
+    def setUp(self):
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L', fecha_inicio=hoy,
+                                                fecha_fin=hoy.replace(year=hoy.year + 1), estado='vigente')
+        self.linea = LineaArticulo.objects.create(nombre='Línea')
+        self.a1 = Articulo.objects.create(codigo='J1', nombre='J1', linea=self.linea, ultimo_costo=Decimal('5.00'))
+        self.a2 = Articulo.objects.create(codigo='J2', nombre='J2', linea=self.linea, ultimo_costo=Decimal('9.50'))
+        self.a3 = Articulo.objects.create(codigo='J3', nombre='J3', ultimo_costo=Decimal('1.00'))
+        for a in (self.a1, self.a2, self.a3):
+            PrecioArticulo.objects.create(lista=self.lista, articulo=a, precio_base=Decimal('10.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='u', password='x'))
+
+    def precios(self):
+        return dict(PrecioArticulo.objects.filter(lista=self.lista).values_list('articulo__codigo', 'precio_base'))
+
+    def test_simular_no_modifica(self):
+        from .ajustes import AjustePreciosService
+        resumen = AjustePreciosService.ajustar(self.lista, porcentaje=Decimal('-10'), linea=self.linea, simular=True)
+        self.assertEqual((resumen['seleccionados'], resumen['bajo_costo'], resumen['rechazados']), (2, 1, 1))
+        self.assertEqual(resumen['muestra'][0]['codigo'], 'J2')
+        self.assertEqual(resumen['muestra'][0]['precio_nuevo'], Decimal('9.00'))
+        self.assertEqual(set(self.precios().values()), {Decimal('10.00')})
+
+    def test_rechaza_bajo_costo_en_un_update(self):
+        from .ajustes import AjustePreciosService
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True) as callbacks:
+            AjustePreciosService.ajustar(self.lista, porcentaje=Decimal('-10'), linea=self.linea)
+            # sin commit todavía: historial y materializados esperan a on_commit
+            self.assertFalse(PrecioFinalMaterializado.objects.filter(articulo=self.a1, precio_final=Decimal('9.00')).exists())
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(sum(q['sql'].startswith('UPDATE "listas_precioarticulo"') for q in ctx.captured_queries), 1)
+        self.assertEqual(self.precios(), {'J1': Decimal('9.00'), 'J2': Decimal('10.00'), 'J3': Decimal('10.00')})
+        self.assertEqual(PrecioFinalMaterializado.objects.get(articulo=self.a1, canal='').precio_final, Decimal('9.00'))
+
+    def test_marcar_y_redondeo_por_api(self):
+        resp = self.client.post(reverse('listas:listas-ajustar', args=[self.lista.id]),
+                                {'porcentaje': '-0.05', 'redondeo': 'abajo', 'bajo_costo': 'marcar'}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['marcados'], 0)
+        self.assertEqual(set(self.precios().values()), {Decimal('9.99')})  # 9.995 al centavo inferior
+        resp = self.client.post(reverse('listas:listas-ajustar', args=[self.lista.id]),
+                                {'porcentaje': '0.05', 'redondeo': 'arriba'}, format='json')
+        self.assertEqual(set(self.precios().values()), {Decimal('10.00')})  # 9.994995 al centavo superior
+        resp = self.client.post(reverse('listas:listas-ajustar', args=[self.lista.id]),
+                                {'monto': '-0.60', 'bajo_costo': 'marcar'}, format='json')
+        self.assertEqual((resp.data['ajustados'], resp.data['marcados']), (3, 1))
+        pa = PrecioArticulo.objects.get(lista=self.lista, articulo=self.a2)
+        self.assertEqual(pa.precio_base, Decimal('9.40'))
+        self.assertIsNotNone(pa.motivo_bajo_costo)
+        self.assertFalse(pa.autorizado_bajo_costo)
+        self.assertTrue(pa.pendiente_autorizacion)
+        self.assertEqual(list(PrecioArticulo.objects.filter(pendiente_autorizacion=True)), [pa])
+        self.assertEqual(self.client.post(reverse('listas:listas-ajustar', args=[self.lista.id]),
+                                          {'porcentaje': '5', 'monto': '1'}, format='json').status_code, 400)
+
+
+    def test_marcado_se_puede_editar_y_autorizar(self):
+        from .ajustes import AjustePreciosService
+        AjustePreciosService.ajustar(self.lista, monto=Decimal('-0.60'), bajo_costo='marcar')
+        pa = PrecioArticulo.objects.get(lista=self.lista, articulo=self.a2)
+        pa.full_clean()  # pendiente de autorización: clean() lo acepta por debajo del costo
+        PrecioService.registrar_descuento_proveedor(pa, Decimal('10'), 'u')
+        pa.refresh_from_db()
+        self.assertTrue(pa.autorizado_bajo_costo)
+        self.assertFalse(pa.pendiente_autorizacion)
+        # un ajuste que lo deja por encima del costo también lo saca de pendientes
+        PrecioArticulo.objects.filter(pk=pa.pk).update(autorizado_bajo_costo=False, pendiente_autorizacion=True)
+        AjustePreciosService.ajustar(self.lista, monto=Decimal('1.00'))
+        self.assertFalse(PrecioArticulo.objects.filter(pendiente_autorizacion=True).exists())
+
+
+class ClonacionListaTest(TestCase):
+    def setUp(self):
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        self.hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='Enero', estado='vigente',
+                                                fecha_inicio=self.hoy, fecha_fin=self.hoy + timezone.timedelta(days=29))
+        self.arts = [Articulo.objects.create(codigo=f'K{i}', nombre=f'K{i}', ultimo_costo=Decimal('5.00'))
+                     for i in range(3)]
+        for a in self.arts:
+            PrecioArticulo.objects.create(lista=self.lista, articulo=a, precio_base=Decimal('10.00'))
+        ReglaPrecio.objects.create(lista=self.lista, tipo='canal', canal='web', prioridad=1,
+                                   porcentaje_descuento=Decimal('5.00'))
+        combo = CombinacionProducto.objects.create(lista=self.lista, nombre='Combo', porcentaje_descuento=Decimal('10'))
+        combo.articulos.set(self.arts[:2])
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='u', password='x'))
+
+    def test_clona_con_ajuste(self):
+        from .clonacion import ClonacionListaService
+        from .models import HistorialPrecio
+        from . import contadores
+        contadores.reconciliar()
+        inicio = self.lista.fecha_fin + timezone.timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            nueva, resumen = ClonacionListaService.clonar(self.lista, inicio, inicio + timezone.timedelta(days=29),
+                                                          nombre='Febrero', porcentaje=Decimal('10'))
+        self.assertEqual((resumen['precios'], resumen['reglas'], resumen['combinaciones']), (3, 1, 1))
+        self.assertEqual(set(nueva.precios_articulo.values_list('precio_base', flat=True)), {Decimal('11.00')})
+        self.assertEqual(nueva.combinaciones.get().articulos.count(), 2)
+        self.assertEqual(nueva.reglas.get().canal, 'web')
+        self.assertEqual(HistorialPrecio.objects.filter(lista=nueva, precio_base=Decimal('11.00')).count(), 3)
+        self.assertEqual(PrecioFinalMaterializado.objects.filter(lista=nueva, canal='').count(), 3)
+        self.assertEqual(contadores.reconciliar(), {})
+
+    def test_api_rechaza_solape(self):
+        url = reverse('listas:listas-clonar', args=[self.lista.id])
+        resp = self.client.post(url, {'fecha_inicio': self.hoy, 'fecha_fin': self.hoy}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        inicio = self.lista.fecha_fin + timezone.timedelta(days=1)
+        resp = self.client.post(url, {'nombre': 'Febrero', 'fecha_inicio': inicio, 'fecha_fin': inicio}, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data['precios'], 3)
+        self.assertEqual(ListaPrecio.objects.get(pk=resp.data['lista']['id']).estado, 'borrador')
+
+
+class ReplicaRouterTest(SimpleTestCase):
+    # sin transacción de prueba: dentro de un atomic el router siempre lee de la primaria
+    def setUp(self):
+        from django.conf import settings
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .replicas import ReplicaRouter, ReplicaMiddleware
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.HttpResponse = HttpResponse
+        self.ReplicaMiddleware = ReplicaMiddleware
+        # 'replica' como alias de la misma base: solo se comprueba el enrutado
+        self.databases_settings = {**settings.DATABASES, 'replica': settings.DATABASES['default']}
+
+    def test_lecturas_a_replica_y_primaria_fijada(self):
+        from .replicas import primaria, replica
+        with override_settings(DATABASES=self.databases_settings, PRECIOS_DB_REPLICAS=['replica']):
+            # fuera de una petición (comandos, cron) se lee de la primaria
+            self.assertEqual(self.router.db_for_read(Articulo), 'default')
+            with replica():
+                self.assertEqual(self.router.db_for_read(Articulo), 'replica')
+                with primaria():
+                    self.assertEqual(self.router.db_for_read(Articulo), 'default')
+            self.assertEqual(self.router.db_for_write(Articulo), 'default')
+        # sin réplicas configuradas todo va a la primaria
+        self.assertEqual(self.router.db_for_read(Articulo), 'default')
+
+    def test_middleware_fija_primaria_tras_escribir(self):
+        vistas = []
+
+        from .replicas import marcar_escritura
+
+        def vista(request):
+            vistas.append(self.router.db_for_read(Articulo))
+            # consultar el alias de escritura (validaciones de unicidad) no cuenta como escritura
+            self.router.db_for_write(Articulo)
+            if request.method == 'POST':
+                marcar_escritura()
+            return self.HttpResponse('ok')
+
+        middleware = self.ReplicaMiddleware(vista)
+        with override_settings(DATABASES=self.databases_settings, PRECIOS_DB_REPLICAS=['replica']):
+            resp = middleware(self.factory.get('/'))
+            self.assertNotIn('precios_primaria', resp.cookies)
+            resp = middleware(self.factory.post('/'))
+            self.assertIn('precios_primaria', resp.cookies)
+            peticion = self.factory.get('/')
+            peticion.COOKIES['precios_primaria'] = '1'
+            middleware(peticion)
+        self.assertEqual(vistas, ['replica', 'default', 'default'])
+
+    def test_post_de_precios_lee_de_replica(self):
+        from django.urls import resolve
+
+        def vista(request):
+            # el manejador de Django llama a process_view con la vista resuelta
+            middleware.process_view(request, resolve(request.path).func, (), {})
+            return self.HttpResponse(self.router.db_for_read(Articulo))
+
+        middleware = self.ReplicaMiddleware(vista)
+        rutas = [reverse('listas:api_calcular_precio'), reverse('listas:api_calcular_precio_lote'),
+                 reverse('listas:api_calcular_precio_async'), reverse('listas:listas-simular', args=[1]),
+                 reverse('listas:listas-ajustar', args=[1])]
+        with override_settings(DATABASES=self.databases_settings, PRECIOS_DB_REPLICAS=['replica']):
+            leidas = [middleware(self.factory.post(ruta)).content.decode() for ruta in rutas]
+        self.assertEqual(leidas, ['replica'] * 4 + ['default'])
+
+
+class ReplicaEscrituraTest(TestCase):
+    def test_escrituras_marcadas_por_senales_y_versiones(self):
+        from django.db import router
+        from . import versiones
+        from .replicas import _estado, replica
+        with replica():
+            # validate_constraints y otras comprobaciones consultan el alias de escritura sin escribir
+            router.db_for_write(ListaPrecio)
+            self.assertFalse(_estado.get()['escribio'])
+            Empresa.objects.create(nombre='E')
+            self.assertTrue(_estado.get()['escribio'])
+        with replica():
+            # las escrituras en bloque no disparan señales: las marca versiones.incrementar
+            versiones.incrementar(['articulos'])
+            self.assertTrue(_estado.get()['escribio'])
+
+
+class HallazgosBajoCostoTest(TestCase):
+    def setUp(self):
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        hoy = timezone.now().date()
+        self.listas = [
+            ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre=f'L{i}', estado='vigente',
+                                       fecha_inicio=hoy + timezone.timedelta(days=30 * i),
+                                       fecha_fin=hoy + timezone.timedelta(days=30 * i + 29))
+            for i in range(2)
+        ]
+        self.a = Articulo.objects.create(codigo='B1', nombre='B1', ultimo_costo=Decimal('5.00'))
+        self.otro = Articulo.objects.create(codigo='B2', nombre='B2', ultimo_costo=Decimal('5.00'))
+        PrecioArticulo.objects.create(lista=self.listas[0], articulo=self.a, precio_base=Decimal('8.00'))
+        PrecioArticulo.objects.create(lista=self.listas[1], articulo=self.a, precio_base=Decimal('12.00'))
+        PrecioArticulo.objects.create(lista=self.listas[1], articulo=self.otro, precio_base=Decimal('3.00'),
+                                      autorizado_bajo_costo=True)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='u', password='x'))
+
+    def test_cambio_de_costo_registra_y_resuelve(self):
+        from .models import HallazgoBajoCosto
+        self.assertFalse(HallazgoBajoCosto.objects.exists())
+        self.a.ultimo_costo = Decimal('10.00')
+        self.a.save()
+        hallazgo = HallazgoBajoCosto.objects.get()
+        self.assertEqual((hallazgo.lista_id, hallazgo.precio_base, hallazgo.ultimo_costo),
+                         (self.listas[0].id, Decimal('8.00'), Decimal('10.00')))
+        precio = PrecioArticulo.objects.get(lista=self.listas[0], articulo=self.a)
+        precio.autorizado_bajo_costo = True
+        precio.save()
+        self.assertFalse(HallazgoBajoCosto.objects.exists())
+
+    def test_actualizacion_masiva_y_reporte(self):
+        resp = self.client.post(reverse('listas:articulos-actualizar-costos'), [
+            {'articulo_id': self.a.id, 'ultimo_costo': '20.00'},
+            {'articulo_id': self.otro.id, 'ultimo_costo': '5.00'},
+        ], format='json')
+        self.assertEqual(resp.data, {'recibidos': 2, 'actualizados': 1})
+        resp = self.client.get(reverse('listas:hallazgos-bajo-costo-list'), {'empresa_id': self.e.id})
+        self.assertEqual(sorted(h['lista_id'] for h in resp.data['results']), [l.id for l in self.listas])
+        self.assertEqual(resp.data['results'][0]['codigo'], 'B1')
+        resp = self.client.get(reverse('listas:hallazgos-bajo-costo-list'), {'lista_id': self.listas[1].id})
+        self.assertEqual(len(resp.data['results']), 1)
+
+
+class AcumuladosVentasTest(TestCase):
+    def setUp(self):
+        from .models import DetalleOrdenCompraCliente
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        self.linea = LineaArticulo.objects.create(nombre='Línea')
+        self.a = Articulo.objects.create(codigo='V1', nombre='V1', linea=self.linea)
+        self.b = Articulo.objects.create(codigo='V2', nombre='V2')
+        for cantidad, precio in ((2, '10.00'), (3, '12.00')):
+            orden = Orden.objects.create(empresa=self.e, sucursal=self.s)
+            LineaOrden.objects.create(orden=orden, articulo=self.a, cantidad=cantidad, precio_unitario=Decimal(precio))
+            orden.estado = 'confirmada'
+            orden.save(update_fields=['estado'])
+        Orden.objects.create(empresa=self.e, sucursal=self.s).lineas.create(articulo=self.a, cantidad=100)
+        DetalleOrdenCompraCliente.objects.create(orden_id='OC-1', articulo=self.b, cantidad=4,
+                                                 precio_unitario=Decimal('5.00'))
+
+    def test_incremental_con_marca_de_agua(self):
+        from .acumulados import AcumuladosVentasService
+        from .models import VentaDiaria
+        ahora = timezone.now()
+        self.assertEqual(AcumuladosVentasService.acumular_ordenes(ahora), 1)
+        # el detalle recién insertado sigue dentro del margen: su id aún no es seguro
+        self.assertEqual(AcumuladosVentasService.acumular_compras_cliente(), 0)
+        self.assertEqual(AcumuladosVentasService.acumular_compras_cliente(ahora), 1)
+        # sin datos nuevos no se vuelve a sumar nada
+        self.assertEqual(AcumuladosVentasService.acumular_ordenes(ahora), 0)
+        self.assertEqual(AcumuladosVentasService.acumular_compras_cliente(ahora), 0)
+        # una fecha atrasada no adelanta la marca: cuenta el instante de inserción
+        from .models import DetalleOrdenCompraCliente
+        DetalleOrdenCompraCliente.objects.create(orden_id='OC-2', articulo=self.b, cantidad=1,
+                                                 precio_unitario=Decimal('5.00'),
+                                                 fecha=ahora - timezone.timedelta(days=30))
+        self.assertEqual(AcumuladosVentasService.acumular_compras_cliente(ahora), 0)
+        venta = VentaDiaria.objects.get(fuente='orden')
+        self.assertEqual((venta.unidades, venta.importe, venta.lineas, venta.sucursal_id),
+                         (5, Decimal('56.00'), 2, self.s.id))
+        orden = Orden.objects.create(empresa=self.e, sucursal=self.s)
+        orden.lineas.create(articulo=self.a, cantidad=1, precio_unitario=Decimal('14.00'))
+        orden.estado = 'confirmada'
+        orden.save()
+        AcumuladosVentasService.acumular_ordenes(timezone.now())
+        venta.refresh_from_db()
+        self.assertEqual((venta.unidades, venta.importe), (6, Decimal('70.00')))
+
+    def test_una_fila_por_clave(self):
+        from django.db import IntegrityError, transaction
+        from .models import VentaDiaria
+        hoy = timezone.now().date()
+        for sucursal in (self.s, None):
+            VentaDiaria.objects.create(fuente='orden', fecha=hoy, articulo=self.a, sucursal=sucursal)
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                VentaDiaria.objects.create(fuente='orden', fecha=hoy, articulo=self.a, sucursal=sucursal)
+
+    def test_reconstruir_y_consultar_por_api(self):
+        from django.core.management import call_command
+        from io import StringIO
+        with self.settings(PRECIOS_ACUMULADOS_MARGEN_SEGUNDOS=-5):
+            call_command('acumular_ventas', '--reconstruir', stdout=StringIO())
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(username='u', password='x'))
+        resp = client.get(reverse('listas:api_ventas_diarias'), {'agrupar': 'linea,fuente'})
+        filas = {(f['articulo__linea_id'], f['fuente']): f for f in resp.data['resultados']}
+        self.assertEqual(filas[(self.linea.id, 'orden')]['precio_promedio'], Decimal('11.20'))
+        self.assertEqual(filas[(None, 'compra_cliente')]['unidades'], 4)
+        resp = client.get(reverse('listas:api_ventas_diarias'), {'articulo_id': self.b.id, 'fuente': 'orden'})
+        self.assertEqual(resp.data['resultados'], [])
+        self.assertEqual(client.get(reverse('listas:api_ventas_diarias'), {'agrupar': 'color'}).status_code, 400)
+
+
+class GetCondicionalTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='u', password='x'))
+        self.e = Empresa.objects.create(nombre='E')
+        self.s = Sucursal.objects.create(empresa=self.e, nombre='S')
+        hoy = timezone.now().date()
+        self.lista = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='L', fecha_inicio=hoy,
+                                                fecha_fin=hoy.replace(year=hoy.year + 1), estado='vigente')
+        self.a = Articulo.objects.create(codigo='G1', nombre='G1', ultimo_costo=Decimal('1.00'))
+        self.precio = PrecioArticulo.objects.create(lista=self.lista, articulo=self.a, precio_base=Decimal('2.00'))
+        self.url = reverse('listas:precios-articulo-list')
+
+    def test_304_sin_serializar_y_cambio_invalida(self):
+        resp = self.client.get(self.url, {'lista_id': self.lista.id})
+        etag = resp['ETag']
+        self.assertIn('Last-Modified', resp)
+        with self.assertNumQueries(1):
+            resp = self.client.get(self.url, {'lista_id': self.lista.id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, b'')
+        # otra lista no cambia la versión de esta
+        otra = ListaPrecio.objects.create(empresa=self.e, sucursal=self.s, nombre='O',
+                                          fecha_inicio=self.lista.fecha_fin + timezone.timedelta(days=1),
+                                          fecha_fin=self.lista.fecha_fin + timezone.timedelta(days=2))
+        PrecioArticulo.objects.create(lista=otra, articulo=self.a, precio_base=Decimal('3.00'))
+        self.assertEqual(self.client.get(self.url, {'lista_id': self.lista.id},
+                                         HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):  # la versión avanza al confirmar
+            self.precio.precio_base = Decimal('4.00')
+            self.precio.save()
+        resp = self.client.get(self.url, {'lista_id': self.lista.id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+        self.assertEqual(resp.json()['results'][0]['precio_base'], '4.00')
+
+    def test_respuesta_en_cache_y_expand(self):
+        url = reverse('listas:articulos-list')
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            resp = self.client.get(url)
+        self.assertEqual(resp.json()['results'][0]['codigo'], 'G1')
+        etag = self.client.get(self.url, {'expand': 'articulo'})['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.a.nombre = 'Cambiado'
+            self.a.save()
+        resp = self.client.get(self.url, {'expand': 'articulo'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['results'][0]['articulo']['nombre'], 'Cambiado')
+
+    def test_expand_anidado_versiona_cada_tramo(self):
+        params = {'lista_id': self.lista.id, 'expand': 'lista.sucursal.empresa'}
+        etag = self.client.get(self.url, params)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.e.nombre = 'Empresa renombrada'
+            self.e.save()
+        resp = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+        self.assertEqual(resp.json()['results'][0]['lista']['sucursal']['empresa']['nombre'], 'Empresa renombrada')
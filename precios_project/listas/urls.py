@@ -9,6 +9,7 @@ router.register(r'listas', views.ListaPrecioViewSet, basename='listas')
 router.register(r'precios-articulo', views.PrecioArticuloViewSet, basename='precios-articulo')
 router.register(r'reglas', views.ReglaPrecioViewSet, basename='reglas')
 router.register(r'combinaciones', views.CombinacionProductoViewSet, basename='combinaciones')
+router.register(r'hallazgos-bajo-costo', views.HallazgoBajoCostoViewSet, basename='hallazgos-bajo-costo')
 
 # readonly lookup
 router.register(r'empresas', views.EmpresaViewSet, basename='empresas')
@@ -20,6 +21,10 @@ router.register(r'grupos-articulo', views.GrupoArticuloViewSet, basename='grupos
 urlpatterns = [
     path('', views.index, name='listas_index'),
     path('api/precio/calcular/', views.CalcularPrecioAPIView.as_view(), name='api_calcular_precio'),
+    path('api/precio/calcular-async/', views.calcular_precio_async, name='api_calcular_precio_async'),
+    path('api/precio/calcular-lote/', views.CalcularPrecioLoteAPIView.as_view(), name='api_calcular_precio_lote'),
+    path('api/metricas/', views.MetricasAPIView.as_view(), name='api_metricas'),
+    path('api/ventas/diarias/', views.VentasDiariasAPIView.as_view(), name='api_ventas_diarias'),
     path('api/', include(router.urls)),
     
     path('dashboard/', views.dashboard, name='dashboard'),
@@ -0,0 +1,84 @@
+# listas/versiones.py
+import hashlib
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.http import parse_http_date_safe
+from .models import (
+    Empresa, Sucursal, Articulo, LineaArticulo, GrupoArticulo, ListaPrecio, PrecioArticulo, VersionRecurso
+)
+from .replicas import marcar_escritura
+
+# modelo -> recurso de la API cuyo contenido cambia con él
+RECURSOS = {
+    Empresa: 'empresas',
+    Sucursal: 'sucursales',
+    Articulo: 'articulos',
+    LineaArticulo: 'lineas-articulo',
+    GrupoArticulo: 'grupos-articulo',
+    ListaPrecio: 'listas',
+    PrecioArticulo: 'precios-articulo',
+}
+
+
+def precios_de_lista(lista_id):
+    """Los precios de una lista se versionan aparte (?lista_id=) y también en el recurso completo."""
+    return ['precios-articulo', f'precios-articulo:{lista_id}']
+
+
+def recursos_de(instancia):
+    if isinstance(instancia, PrecioArticulo):
+        return precios_de_lista(instancia.lista_id)
+    return [RECURSOS[type(instancia)]]
+
+
+def incrementar(recursos):
+    """
+    Avanza la versión de cada recurso al confirmarse la transacción que la origina, así un
+    guardado de precios no retiene la fila de VersionRecurso hasta su commit. Hasta entonces los
+    clientes siguen recibiendo 304 con la versión anterior, que es la que ven en la BD.
+    """
+    recursos = set(recursos)
+    if recursos:
+        # las escrituras en bloque (update, bulk_create) no disparan señales pero sí pasan por aquí
+        marcar_escritura()
+        transaction.on_commit(lambda: _avanzar(recursos))
+
+
+def _avanzar(recursos):
+    ahora = timezone.now()
+    for recurso in recursos:
+        if VersionRecurso.objects.filter(recurso=recurso).update(version=F('version') + 1, modificado_en=ahora):
+            continue
+        try:
+            with transaction.atomic():
+                VersionRecurso.objects.create(recurso=recurso, version=1, modificado_en=ahora)
+        except IntegrityError:
+            VersionRecurso.objects.filter(recurso=recurso).update(version=F('version') + 1, modificado_en=ahora)
+
+
+def validadores(request, recursos):
+    """
+    (ETag, Last-Modified) de la respuesta a `request` según la versión de los recursos, en una
+    consulta. El ETag también cubre ruta, parámetros y host (los enlaces de paginación son absolutos).
+    """
+    recursos = sorted(set(recursos))
+    filas = {r: (v, m) for r, v, m in VersionRecurso.objects.filter(
+        recurso__in=recursos).values_list('recurso', 'version', 'modificado_en')}
+    firma = '|'.join([
+        request.get_host(), request.path, '&'.join(sorted(request.GET.urlencode().split('&'))),
+        *(f'{r}:{filas[r][0]}:{filas[r][1].isoformat()}' if r in filas else f'{r}:0' for r in recursos),
+    ])
+    etag = f'W/"{hashlib.sha1(firma.encode()).hexdigest()[:32]}"'
+    fechas = [m for _, m in filas.values()]
+    return etag, max(fechas) if fechas else None
+
+
+def no_modificado(request, etag, modificado):
+    """Si el cliente ya tiene esta versión (If-None-Match, o If-Modified-Since si no lo envía)."""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etiquetas = {e.strip().removeprefix('W/') for e in if_none_match.split(',')}
+        return '*' in etiquetas or etag.removeprefix('W/') in etiquetas
+    desde = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return desde is not None and modificado is not None and int(modificado.timestamp()) <= desde
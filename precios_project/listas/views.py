@@ -1,21 +1,44 @@
 # listas/views.py
+import io
+import json
+from decimal import Decimal
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import TokenAuthentication, SessionAuthentication
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.authentication import TokenAuthentication, SessionAuthentication, CSRFCheck
 from rest_framework.views import APIView
-from django.http import JsonResponse
+from rest_framework.parsers import MultiPartParser, FormParser
+from django.http import HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import http_date
 from django.db import transaction
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import ValidationError, ObjectDoesNotExist
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.authtoken.models import Token
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
 from .forms import ListaPrecioForm, ReglaPrecioForm, PrecioArticuloForm, ArticuloForm, LineaArticuloForm, GrupoArticuloForm, OrdenForm, LineaOrdenFormSet, CombinacionProductoForm
-from .models import ListaPrecio, PrecioArticulo, ReglaPrecio, CombinacionProducto, Empresa, Sucursal, Articulo , LineaArticulo, GrupoArticulo, Orden, LineaOrden   
-from .serializers import LineaArticuloSerializer, GrupoArticuloSerializer, ListaPrecioSerializer, PrecioArticuloSerializer, ReglaPrecioSerializer, CombinacionProductoSerializer, EmpresaSerializer, SucursalSerializer, ArticuloSerializer, PrecioConsultaSerializer, PrecioResultadoSerializer
+from .models import ListaPrecio, PrecioArticulo, ReglaPrecio, CombinacionProducto, Empresa, Sucursal, Articulo , LineaArticulo, GrupoArticulo, Orden, LineaOrden, HallazgoBajoCosto, solape_como_validacion
+from .serializers import LineaArticuloSerializer, GrupoArticuloSerializer, ListaPrecioSerializer, PrecioArticuloSerializer, ReglaPrecioSerializer, CombinacionProductoSerializer, EmpresaSerializer, SucursalSerializer, ArticuloSerializer, PrecioConsultaSerializer, PrecioResultadoSerializer, PrecioLoteConsultaSerializer, PrecioLoteResultadoSerializer, SimulacionConsultaSerializer, ImportacionPreciosSerializer, AjustePreciosSerializer, ClonacionListaSerializer, CostoArticuloSerializer, HallazgoBajoCostoSerializer, VentasConsultaSerializer, parametro_lista
 from .services import PrecioService
+from .simulacion import SimulacionService
+from .importacion import ImportacionPreciosService
+from .exportacion import ExportacionPreciosService
+from .ajustes import AjustePreciosService
+from .clonacion import ClonacionListaService
+from .borrado import BorradoPreciosService
+from .bajo_costo import DeteccionBajoCostoService
+from .acumulados import AcumuladosVentasService
+from .metricas import registro as registro_metricas
+from .paginacion import PaginacionCursor
+from .replicas import usar_primaria, usar_replica
+from . import contadores, versiones
 from django.contrib.auth.decorators import login_required
 
 # ---------- Vista web base ----------
@@ -54,36 +77,17 @@ def dashboard(request):
 
 @login_required
 def dashboard(request):
-    # métricas
-    total_listas = ListaPrecio.objects.count()
-    listas_vigentes = ListaPrecio.objects.filter(estado='vigente').count()
-    total_reglas = ReglaPrecio.objects.filter(activo=True).count()
-    total_combinaciones = CombinacionProducto.objects.count()
-    total_precios_articulo = PrecioArticulo.objects.count()
-    total_empresas = Empresa.objects.count()
-    total_sucursales = Sucursal.objects.count()
-    total_articulos = Articulo.objects.count()
+    # métricas: una sola lectura de ContadorDashboard (mantenido por señales)
+    metricas = contadores.leer()
 
     # últimas listas
     ultimas_listas = ListaPrecio.objects.select_related('empresa', 'sucursal') \
         .order_by('-fecha_inicio')[:5]
 
-    # órdenes pendientes (ejemplo: estado 'borrador' como pendiente)
-    from .models import Orden  # colócalo en imports al inicio si prefieres
-    pending_orders = Orden.objects.filter(estado='borrador').count()
-
     context = {
         'user': request.user,
-        'total_listas': total_listas,
-        'listas_vigentes': listas_vigentes,
-        'total_reglas': total_reglas,
-        'total_combinaciones': total_combinaciones,
-        'total_precios_articulo': total_precios_articulo,
-        'total_empresas': total_empresas,
-        'total_sucursales': total_sucursales,
-        'total_articulos': total_articulos,
+        **metricas,
         'listas': ultimas_listas,
-        'pending_orders': pending_orders,
     }
     return render(request, 'dashboard.html', context)
 
@@ -93,6 +97,7 @@ class CalcularPrecioAPIView(APIView):
     authentication_classes = [TokenAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @usar_replica
     def post(self, request, *args, **kwargs):
         serializer = PrecioConsultaSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -121,8 +126,178 @@ class CalcularPrecioAPIView(APIView):
         return Response(out_serializer.data, status=status.HTTP_200_OK)
 
 
+async def _usuario_async(request):
+    """TokenAuthentication + SessionAuthentication (con CSRF) resueltas con el ORM async."""
+    partes = request.headers.get('Authorization', '').split()
+    if partes and partes[0].lower() == 'token':
+        if len(partes) != 2:
+            return None
+        try:
+            token = await Token.objects.select_related('user').aget(key=partes[1])
+        except Token.DoesNotExist:
+            return None
+        return token.user if token.user.is_active else None
+
+    usuario = await request.auser()
+    if not usuario.is_authenticated:
+        return None
+    check = CSRFCheck(lambda req: None)
+    check.process_request(request)
+    if check.process_view(request, None, (), {}) is not None:
+        return None
+    return usuario
+
+
+@usar_replica
+@csrf_exempt
+async def calcular_precio_async(request):
+    """Misma entrada y salida que CalcularPrecioAPIView, servida sin bloquear un hilo por petición (ASGI)."""
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Método "{request.method}" no permitido.'}, status=405)
+    if await _usuario_async(request) is None:
+        return JsonResponse({'detail': 'Las credenciales de autenticación no se proveyeron.'}, status=401)
+
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'detail': 'JSON inválido.'}, status=400)
+    serializer = PrecioConsultaSerializer(data=payload)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+    data = serializer.validated_data
+
+    try:
+        res = await PrecioService.acalcular_precio(
+            empresa_id=data['empresa_id'],
+            sucursal_id=data['sucursal_id'],
+            articulo_id=data['articulo_id'],
+            canal=data.get('canal') or None,
+            cantidad=data.get('cantidad', 1),
+            monto_pedido=data.get('monto_pedido'),
+            fecha=data.get('fecha'),
+            carrito_articulos=payload.get('carrito'),
+        )
+    except ObjectDoesNotExist:
+        return JsonResponse({'detail': 'No encontrado.'}, status=404)
+
+    out_serializer = PrecioResultadoSerializer(data=res)
+    if not out_serializer.is_valid():
+        return JsonResponse(res)
+    return JsonResponse(out_serializer.data)
+
+
+class CalcularPrecioLoteAPIView(APIView):
+    """Precio de un carrito completo: una lista vigente y una consulta de precios para todas las líneas."""
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @usar_replica
+    def post(self, request, *args, **kwargs):
+        serializer = PrecioLoteConsultaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        empresa = get_object_or_404(Empresa, pk=data['empresa_id'])
+        sucursal = get_object_or_404(Sucursal, pk=data['sucursal_id'])
+
+        res = PrecioService.calcular_precios_lote(
+            empresa=empresa,
+            sucursal=sucursal,
+            lineas=data['lineas'],
+            canal=data.get('canal') or None,
+            monto_pedido=data.get('monto_pedido'),
+            fecha=data.get('fecha'),
+        )
+        return Response(PrecioLoteResultadoSerializer(res).data, status=status.HTTP_200_OK)
+
+
+class MetricasAPIView(APIView):
+    """Resumen en memoria de consultas y tiempos por vista y por método de servicio (este proceso)."""
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            'metricas': registro_metricas.resumen(),
+            'cache_listas_vigentes': PrecioService.info_cache_listas(),
+        })
+
+    def delete(self, request, *args, **kwargs):
+        registro_metricas.reiniciar()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class VentasDiariasAPIView(APIView):
+    """
+    Ventas acumuladas (VentaDiaria) agrupadas por ?agrupar=fecha,articulo,linea,grupo,sucursal,fuente
+    y filtradas por ?desde, ?hasta, ?articulo_id, ?linea_id, ?grupo_id, ?sucursal_id y ?fuente.
+    """
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params.dict()
+        params['agrupar'] = parametro_lista(request, 'agrupar') or ['articulo']
+        serializer = VentasConsultaSerializer(data=params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        filas = list(AcumuladosVentasService.consultar(
+            agrupar=data['agrupar'],
+            **{k: v for k, v in data.items() if k != 'agrupar'},
+        ))
+        return Response({'agrupar': data['agrupar'], 'resultados': filas})
+
+
 # ---------- ViewSets CRUD ----------
-class ListaPrecioViewSet(viewsets.ModelViewSet):
+class CondicionalViewSetMixin:
+    """
+    GET condicional para list/retrieve: ETag y Last-Modified salen de VersionRecurso (una
+    consulta). Si el cliente ya tiene esa versión se responde 304 sin tocar el queryset; si no,
+    los datos serializados se guardan en caché con el ETag como clave.
+    """
+    recurso = None
+
+    def recursos_condicionales(self):
+        recursos = [self.recurso]
+        serializer = self.get_serializer_class()
+        if hasattr(serializer, 'modelos'):
+            # cada tramo de ?expand=lista.empresa aporta su recurso (lista y empresa)
+            recursos += sorted(versiones.RECURSOS[m] for m in serializer.modelos(parametro_lista(self.request, 'expand')))
+        return recursos
+
+    def _condicional(self, request, generar):
+        etag, modificado = versiones.validadores(request, self.recursos_condicionales())
+        if versiones.no_modificado(request, etag, modificado):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            clave = f'precios:respuesta:{etag}'
+            datos = cache.get(clave)
+            if datos is None:
+                datos = generar().data
+                cache.set(clave, datos, getattr(settings, 'PRECIOS_CACHE_RESPUESTAS_SEGUNDOS', 600))
+            response = Response(datos)
+        response['ETag'] = etag
+        if modificado:
+            response['Last-Modified'] = http_date(modificado.timestamp())
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._condicional(request, lambda: super(CondicionalViewSetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._condicional(request, lambda: super(CondicionalViewSetMixin, self).retrieve(request, *args, **kwargs))
+
+
+class ExpandibleViewSetMixin:
+    """Une al queryset solo las relaciones que pide ?expand= (ver ExpandibleMixin)."""
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        relaciones = self.get_serializer_class().relaciones(parametro_lista(self.request, 'expand'))
+        return qs.select_related(*relaciones) if relaciones else qs
+
+
+class ListaPrecioViewSet(ExpandibleViewSetMixin, viewsets.ModelViewSet):
     queryset = ListaPrecio.objects.all().order_by('-fecha_inicio')
     serializer_class = ListaPrecioSerializer
     authentication_classes = [TokenAuthentication, SessionAuthentication]
@@ -138,12 +313,105 @@ class ListaPrecioViewSet(viewsets.ModelViewSet):
             qs = qs.filter(sucursal_id=sucursal)
         return qs
 
+    def perform_destroy(self, instance):
+        # los precios por conjuntos (listas/borrado.py), no fila a fila en la cascada
+        BorradoPreciosService.borrar_listas(ListaPrecio.objects.filter(pk=instance.pk))
+
+    @usar_replica
+    @action(detail=True, methods=['post'])
+    def simular(self, request, pk=None):
+        """Evalúa toda la lista con otro canal/cantidad/monto o con reglas modificadas."""
+        lista = self.get_object()
+        serializer = SimulacionConsultaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        ajustes = {
+            a['regla_id']: {k: v for k, v in a.items() if k != 'regla_id'}
+            for a in data['ajustes']
+        }
+        datos = SimulacionService.simular_lista(
+            lista,
+            canal=data.get('canal') or None,
+            cantidad=data['cantidad'],
+            monto_pedido=data['monto_pedido'],
+            ajustes=ajustes,
+        )
+        return Response(SimulacionService.resumen(datos, detalle=data['detalle']), status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'])
+    def exportar(self, request, pk=None):
+        """Descarga en streaming los precios de la lista (?formato=csv|jsonl)."""
+        lista = self.get_object()
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in ExportacionPreciosService.FORMATOS:
+            return Response({'detail': 'formato debe ser csv o jsonl'}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(
+            ExportacionPreciosService.lineas(lista, formato),
+            content_type=ExportacionPreciosService.FORMATOS[formato],
+        )
+        response['Content-Disposition'] = f'attachment; filename="lista_{lista.pk}.{formato}"'
+        return response
+
+    @action(detail=True, methods=['post'])
+    def ajustar(self, request, pk=None):
+        """Ajuste masivo de precios (porcentaje o monto) en un UPDATE; simular=true solo previsualiza."""
+        lista = self.get_object()
+        serializer = AjustePreciosSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        resumen = AjustePreciosService.ajustar(
+            lista,
+            porcentaje=data.get('porcentaje'),
+            monto=data.get('monto'),
+            redondeo=data['redondeo'],
+            bajo_costo=data['bajo_costo'],
+            linea=data.get('linea'),
+            grupo=data.get('grupo'),
+            articulo_ids=data.get('articulo_ids'),
+            simular=data['simular'],
+        )
+        return Response(resumen, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'])
+    def clonar(self, request, pk=None):
+        """Copia la lista (precios, reglas y combinaciones) a un nuevo periodo, con ajuste opcional."""
+        origen = self.get_object()
+        serializer = ClonacionListaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            nueva, resumen = ClonacionListaService.clonar(
+                origen,
+                fecha_inicio=data['fecha_inicio'],
+                fecha_fin=data['fecha_fin'],
+                nombre=data.get('nombre'),
+                estado=data['estado'],
+                creado_por=request.user,
+                porcentaje=data.get('porcentaje'),
+                monto=data.get('monto'),
+                redondeo=data['redondeo'],
+                bajo_costo=data['bajo_costo'],
+            )
+        except ValidationError as e:
+            return Response({'detail': e.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'lista': ListaPrecioSerializer(nueva).data, **resumen}, status=status.HTTP_201_CREATED)
+
 
-class PrecioArticuloViewSet(viewsets.ModelViewSet):
-    queryset = PrecioArticulo.objects.select_related('lista', 'articulo').all()
+class PrecioArticuloViewSet(CondicionalViewSetMixin, ExpandibleViewSetMixin, viewsets.ModelViewSet):
+    queryset = PrecioArticulo.objects.all()
     serializer_class = PrecioArticuloSerializer
     authentication_classes = [TokenAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionCursor
+    recurso = 'precios-articulo'
+
+    def recursos_condicionales(self):
+        recursos = super().recursos_condicionales()
+        lista = self.request.query_params.get('lista_id')
+        if self.action == 'list' and lista and lista.isdigit():
+            # solo los precios de esa lista: su versión propia en lugar de la de todo el recurso
+            recursos[0] = versiones.precios_de_lista(int(lista))[1]
+        return recursos
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -155,12 +423,26 @@ class PrecioArticuloViewSet(viewsets.ModelViewSet):
             qs = qs.filter(articulo_id=articulo)
         return qs
 
+    @action(detail=False, methods=['post'], url_path='importar', parser_classes=[MultiPartParser, FormParser])
+    def importar(self, request):
+        """Upsert masivo desde CSV (codigo, precio_base[, autorizado_bajo_costo, motivo_bajo_costo])."""
+        serializer = ImportacionPreciosSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        archivo = io.TextIOWrapper(data['archivo'].file, encoding='utf-8-sig', newline='')
+        try:
+            resumen = ImportacionPreciosService.importar_csv(data['lista'], archivo, data['delimitador'])
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(resumen, status=status.HTTP_200_OK)
+
 
-class ReglaPrecioViewSet(viewsets.ModelViewSet):
-    queryset = ReglaPrecio.objects.select_related('lista').all().order_by('prioridad')
+class ReglaPrecioViewSet(ExpandibleViewSetMixin, viewsets.ModelViewSet):
+    queryset = ReglaPrecio.objects.all()
     serializer_class = ReglaPrecioSerializer
     authentication_classes = [TokenAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionCursor
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -170,11 +452,12 @@ class ReglaPrecioViewSet(viewsets.ModelViewSet):
         return qs
 
 
-class CombinacionProductoViewSet(viewsets.ModelViewSet):
+class CombinacionProductoViewSet(ExpandibleViewSetMixin, viewsets.ModelViewSet):
     queryset = CombinacionProducto.objects.prefetch_related('articulos').all()
     serializer_class = CombinacionProductoSerializer
     authentication_classes = [TokenAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionCursor
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -184,37 +467,70 @@ class CombinacionProductoViewSet(viewsets.ModelViewSet):
         return qs
 
 
-class EmpresaViewSet(viewsets.ModelViewSet):
+class EmpresaViewSet(CondicionalViewSetMixin, viewsets.ModelViewSet):
     queryset = Empresa.objects.all()
     serializer_class = EmpresaSerializer
     authentication_classes = [TokenAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
+    recurso = 'empresas'
 
-class SucursalViewSet(viewsets.ModelViewSet):
+class SucursalViewSet(CondicionalViewSetMixin, ExpandibleViewSetMixin, viewsets.ModelViewSet):
     queryset = Sucursal.objects.all()
     serializer_class = SucursalSerializer
     authentication_classes = [TokenAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
+    recurso = 'sucursales'
 
-class ArticuloViewSet(viewsets.ModelViewSet):
+class ArticuloViewSet(CondicionalViewSetMixin, viewsets.ModelViewSet):
     queryset = Articulo.objects.all()
     serializer_class = ArticuloSerializer
     authentication_classes = [TokenAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionCursor
+    recurso = 'articulos'
+
+    @action(detail=False, methods=['post'], url_path='actualizar-costos')
+    def actualizar_costos(self, request):
+        """Actualiza ultimo_costo en bloque ([{articulo_id, ultimo_costo}]) y revisa los precios afectados."""
+        serializer = CostoArticuloSerializer(data=request.data, many=True, allow_empty=False)
+        serializer.is_valid(raise_exception=True)
+        costos = {c['articulo_id']: c['ultimo_costo'] for c in serializer.validated_data}
+        actualizados = DeteccionBajoCostoService.actualizar_costos(costos)
+        return Response({'recibidos': len(costos), 'actualizados': actualizados}, status=status.HTTP_200_OK)
+
+
+class HallazgoBajoCostoViewSet(viewsets.ReadOnlyModelViewSet):
+    """Informe de precios por debajo del costo sin autorización (?lista_id, ?empresa_id, ?sucursal_id, ?articulo_id)."""
+    queryset = HallazgoBajoCosto.objects.select_related('lista', 'articulo')
+    serializer_class = HallazgoBajoCostoSerializer
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionCursor
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        for parametro, campo in (('lista_id', 'lista_id'), ('empresa_id', 'lista__empresa_id'),
+                                 ('sucursal_id', 'lista__sucursal_id'), ('articulo_id', 'articulo_id')):
+            valor = self.request.query_params.get(parametro)
+            if valor:
+                qs = qs.filter(**{campo: valor})
+        return qs
 
 
-class LineaArticuloViewSet(viewsets.ModelViewSet):
+class LineaArticuloViewSet(CondicionalViewSetMixin, viewsets.ModelViewSet):
     queryset = LineaArticulo.objects.all()
     serializer_class = LineaArticuloSerializer
     authentication_classes = [TokenAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
+    recurso = 'lineas-articulo'
 
 
-class GrupoArticuloViewSet(viewsets.ModelViewSet):
+class GrupoArticuloViewSet(CondicionalViewSetMixin, ExpandibleViewSetMixin, viewsets.ModelViewSet):
     queryset = GrupoArticulo.objects.all()
     serializer_class = GrupoArticuloSerializer
     authentication_classes = [TokenAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
+    recurso = 'grupos-articulo'
 
 # CRUD web para ListaPrecio (no-admin)
 class ListaPrecioListView(LoginRequiredMixin, ListView):
@@ -231,14 +547,26 @@ class ListaPrecioDetailView(LoginRequiredMixin, DetailView):
     context_object_name = 'lista'
 
 
-class ListaPrecioCreateView(LoginRequiredMixin, CreateView):
+class VigenciaFormMixin:
+    """Muestra en el formulario el solapamiento que PostgreSQL rechaza al guardar."""
+
+    def form_valid(self, form):
+        try:
+            with solape_como_validacion():
+                return super().form_valid(form)
+        except ValidationError as e:
+            form.add_error(None, e)
+            return self.form_invalid(form)
+
+
+class ListaPrecioCreateView(LoginRequiredMixin, VigenciaFormMixin, CreateView):
     model = ListaPrecio
     form_class = ListaPrecioForm
     template_name = 'listas/lista_form.html'
     success_url = reverse_lazy('listas:lista_list')
 
 
-class ListaPrecioUpdateView(LoginRequiredMixin, UpdateView):
+class ListaPrecioUpdateView(LoginRequiredMixin, VigenciaFormMixin, UpdateView):
     model = ListaPrecio
     form_class = ListaPrecioForm
     template_name = 'listas/lista_form.html'
@@ -250,6 +578,11 @@ class ListaPrecioDeleteView(LoginRequiredMixin, DeleteView):
     template_name = 'listas/lista_confirm_delete.html'
     success_url = reverse_lazy('listas:lista_list')
 
+    def form_valid(self, form):
+        # los precios por conjuntos (listas/borrado.py), no fila a fila en la cascada
+        BorradoPreciosService.borrar_listas(ListaPrecio.objects.filter(pk=self.object.pk))
+        return HttpResponseRedirect(self.get_success_url())
+
 # CRUD web para ReglaPrecio (añadir al final de listas/views.py)
 class ReglaPrecioListView(LoginRequiredMixin, ListView):
     model = ReglaPrecio
@@ -478,46 +811,57 @@ class OrdenDeleteView(DeleteView):
     template_name = 'listas/orden_confirm_delete.html'
     success_url = reverse_lazy('listas:orden_list')
 
-# Confirmar orden (acción POST)
+# Confirmar orden (acción POST): precios y escritura contra la primaria
+@usar_primaria
 def confirmar_orden(request, orden_id):
     if request.method != 'POST':
         return JsonResponse({'ok': False, 'error': 'Método no permitido'}, status=405)
 
-    orden = get_object_or_404(Orden, pk=orden_id)
-    empresa = orden.empresa
-    sucursal = orden.sucursal
-    canal = getattr(orden, 'canal', None)
-    carrito = [{'articulo_id': li.articulo_id, 'cantidad': li.cantidad} for li in orden.lineas.all()]
+    es_api = (request.headers.get('x-requested-with') == 'XMLHttpRequest'
+              or request.content_type == 'application/json')
 
-    errores = []
+    errores, conflicto = [], False
     with transaction.atomic():
-        for linea in orden.lineas.select_related('articulo'):
-            res = PrecioService.calcular_precio(
-                empresa=empresa,
-                sucursal=sucursal,
-                articulo=linea.articulo,
-                canal=canal,
-                cantidad=linea.cantidad,
+        # orden y líneas bloqueadas hasta el commit: dos confirmaciones simultáneas, o una edición
+        # de líneas entre el precio y la escritura, no pueden pisarse
+        orden = get_object_or_404(
+            Orden.objects.select_for_update(of=('self',)).select_related('empresa', 'sucursal'), pk=orden_id
+        )
+        if orden.estado != 'borrador':
+            # una orden confirmada ya puede estar en los acumulados de ventas: no se reprecia
+            conflicto = True
+            errores.append(f"La orden está {orden.get_estado_display().lower()}; solo se confirman borradores.")
+        else:
+            lineas = list(orden.lineas.select_for_update(of=('self',)).select_related('articulo'))
+            # un solo cálculo para todo el carrito
+            precios = PrecioService.calcular_precios_lote(
+                empresa=orden.empresa,
+                sucursal=orden.sucursal,
+                lineas=[{'articulo_id': li.articulo_id, 'cantidad': li.cantidad} for li in lineas],
+                canal=orden.canal or None,
                 monto_pedido=orden.total_bruto,
-                carrito_articulos=carrito
             )
-            if res.get('precio_final') is None:
-                errores.append(f"{linea.articulo.codigo}: {res.get('razon_bajo_costo')}")
-                continue
-            if 'bajo costo' in (res.get('razon_bajo_costo') or '') and not res.get('autorizado_bajo_costo'):
-                errores.append(f"{linea.articulo.codigo}: precio por debajo del costo sin autorización.")
-            linea.precio_unitario = res['precio_final']
-            linea.save(update_fields=['precio_unitario'])
-        if errores:
-            transaction.set_rollback(True)
-            # si viene de browser, mostrar mensajes y redirigir; si es API, devolver JSON
-            if request.is_ajax() or request.content_type == 'application/json':
-                return JsonResponse({'ok': False, 'errors': errores}, status=400)
-            messages.error(request, "No se pudo confirmar la orden: " + "; ".join(errores))
-            return redirect('listas:orden_detail', pk=orden.pk)
-        orden.estado = 'confirmada'
-        orden.save()
-    if request.is_ajax() or request.content_type == 'application/json':
+            for linea, res in zip(lineas, precios['lineas']):
+                if res.get('precio_final') is None:
+                    errores.append(f"{linea.articulo.codigo}: {res.get('razon_bajo_costo')}")
+                    continue
+                if 'bajo costo' in (res.get('razon_bajo_costo') or '') and not res.get('autorizado_bajo_costo'):
+                    errores.append(f"{linea.articulo.codigo}: precio por debajo del costo sin autorización.")
+                linea.precio_unitario = res['precio_final']
+
+        if not errores:
+            orden.total_bruto = sum((li.cantidad * li.precio_unitario for li in lineas), Decimal('0.00'))
+            orden.estado = 'confirmada'
+            LineaOrden.objects.bulk_update(lineas, ['precio_unitario'])
+            orden.save(update_fields=['total_bruto', 'estado'])
+
+    if errores:
+        # si viene de browser, mostrar mensajes y redirigir; si es API, devolver JSON
+        if es_api:
+            return JsonResponse({'ok': False, 'errors': errores}, status=409 if conflicto else 400)
+        messages.error(request, "No se pudo confirmar la orden: " + "; ".join(errores))
+        return redirect('listas:orden_detail', pk=orden.pk)
+    if es_api:
         return JsonResponse({'ok': True})
     messages.success(request, 'Orden confirmada correctamente.')
     return redirect('listas:orden_detail', pk=orden.pk)
@@ -2,6 +2,7 @@
 Django settings for precios_project project.
 """
 
+import os
 from pathlib import Path
 
 # -------------------------------------------------
@@ -41,12 +42,14 @@ INSTALLED_APPS = [
 # -------------------------------------------------
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'listas.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'listas.metricas.MetricasMiddleware',
 ]
 
 # -------------------------------------------------
@@ -89,6 +92,22 @@ DATABASES = {
     }
 }
 
+# Réplicas de solo lectura para precios y consultas (listas/replicas.py). PRECIOS_DB_REPLICAS_HOSTS
+# es una lista separada por comas; cada host hereda el resto de la configuración de 'default'.
+# En local, PRECIOS_DB_REPLICA_SQLITE apunta a un archivo SQLite que hace de réplica.
+PRECIOS_DB_REPLICAS = []
+for _i, _host in enumerate(h.strip() for h in os.environ.get('PRECIOS_DB_REPLICAS_HOSTS', '').split(',') if h.strip()):
+    DATABASES[f'replica_{_i + 1}'] = {**DATABASES['default'], 'HOST': _host, 'TEST': {'MIRROR': 'default'}}
+    PRECIOS_DB_REPLICAS.append(f'replica_{_i + 1}')
+if os.environ.get('PRECIOS_DB_REPLICA_SQLITE'):
+    DATABASES['replica_sqlite'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['PRECIOS_DB_REPLICA_SQLITE'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    PRECIOS_DB_REPLICAS.append('replica_sqlite')
+DATABASE_ROUTERS = ['listas.replicas.ReplicaRouter']
+
 # -------------------------------------------------
 # PASSWORD VALIDATION
 # -------------------------------------------------
@@ -133,4 +152,39 @@ REST_FRAMEWORK = {
 
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/listas/dashboard/'
-LOGOUT_REDIRECT_URL = '/login/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/login/'
+
+# -------------------------------------------------
+# MOTOR DE PRECIOS
+# -------------------------------------------------
+# Entradas máximas de la caché LRU de listas vigentes (empresa, sucursal, canal, fecha)
+PRECIOS_CACHE_LISTAS_TAMANO = 1024
+# Caducidad de cada resolución: plazo máximo para ver en este proceso una lista creada o cambiada por otro
+PRECIOS_CACHE_LISTAS_SEGUNDOS = 30
+# Reglas candidatas memorizadas por (artículo, grupo, línea) en cada lista compilada (listas/reglas.py)
+PRECIOS_CACHE_CANDIDATAS_TAMANO = 4096
+
+# Respuestas GET del catálogo guardadas en la caché de Django por ETag (listas/versiones.py)
+PRECIOS_CACHE_RESPUESTAS_SEGUNDOS = 600
+
+# Paginación por cursor de las colecciones grandes de la API (listas/paginacion.py)
+PRECIOS_PAGINA_TAMANO = 100
+PRECIOS_PAGINA_MAXIMA = 1000                # tope de ?page_size=
+
+# Instrumentación por petición y por método de PrecioService (listas/metricas.py). Apagada por
+# defecto: se activa para diagnosticar. El SQL de las peticiones lentas solo se guarda con
+# PRECIOS_METRICAS_GUARDAR_SQL (copia cada sentencia de cada petición medida)
+PRECIOS_METRICAS_ACTIVAS = False
+PRECIOS_METRICAS_CABECERAS = False          # X-Consultas-SQL, X-Tiempo-DB-ms, X-Tiempo-Total-ms
+PRECIOS_METRICAS_UMBRAL_MS = 500
+PRECIOS_METRICAS_LOG = BASE_DIR / 'logs' / 'peticiones_lentas.jsonl'
+PRECIOS_METRICAS_GUARDAR_SQL = False
+
+# Enrutado de lecturas a réplicas (listas/replicas.py): tras escribir, el cliente lee de la
+# primaria durante este margen (retraso de replicación tolerado)
+PRECIOS_DB_PRIMARIA_SEGUNDOS = 5
+PRECIOS_DB_COOKIE = 'precios_primaria'
+
+# Acumulados diarios de ventas (listas/acumulados.py, manage.py acumular_ventas): las órdenes
+# confirmadas en los últimos segundos se dejan para la siguiente pasada
+PRECIOS_ACUMULADOS_MARGEN_SEGUNDOS = 60